@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import logging
+import asyncio
+
+import database as db
+from config import WORKER_ID, QUEUE_VISIBILITY_TIMEOUT, DELIVERY_BATCH_SIZE, DELIVERY_POLL_INTERVAL
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+async def send_summary(bot, summary):
+    """
+    Отправка суммаризации пользователю
+
+    Args:
+        bot: Объект бота
+        summary (dict): Суммаризация (user_id, text, images)
+    """
+    user_id = summary['user_id']
+    message_text = summary['text']
+
+    if summary['images']:
+        # Если есть изображения, отправляем их с текстом
+        for image_path in summary['images']:
+            with open(image_path, 'rb') as photo:
+                await bot.send_photo(
+                    chat_id=user_id,
+                    photo=photo,
+                    caption=message_text if image_path == summary['images'][0] else None
+                )
+    else:
+        # Если нет изображений, отправляем только текст
+        await bot.send_message(
+            chat_id=user_id,
+            text=message_text
+        )
+
+async def deliver_summaries(bot, limit=DELIVERY_BATCH_SIZE):
+    """
+    Отправка суммаризаций из очереди доставки
+
+    Задачи арендуются пакетом и подтверждаются после отправки; если процесс упадет
+    до подтверждения, суммаризация будет отправлена после истечения аренды.
+    Неудачная отправка повторяется, после QUEUE_MAX_ATTEMPTS попыток задача
+    переносится в очередь недоставленных.
+
+    Args:
+        bot: Объект бота
+        limit (int): Максимальное количество суммаризаций за один проход
+
+    Returns:
+        int: Количество обработанных задач доставки
+    """
+    tasks = db.lease_tasks('deliver', WORKER_ID, QUEUE_VISIBILITY_TIMEOUT, limit=limit)
+    sent = 0
+
+    for task in tasks:
+        summary = db.get_summary(task['payload'])
+        if not summary:
+            db.ack_tasks([task['task_id']], WORKER_ID)
+            continue
+
+        try:
+            await send_summary(bot, summary)
+        except Exception as e:
+            logger.error(f"Ошибка при отправке суммаризации пользователю {summary['user_id']}: {e}")
+            if db.fail_tasks([task['task_id']], WORKER_ID, e):
+                logger.warning(f"Суммаризация {summary['summary_id']} перенесена в очередь недоставленных")
+            continue
+
+        # Подтверждаем сразу после отправки, чтобы при сбое процесса не отправить повторно весь пакет
+        db.ack_tasks([task['task_id']], WORKER_ID)
+        sent += 1
+        logger.info(f"Суммаризация отправлена пользователю {summary['user_id']}")
+
+    if sent:
+        logger.info(f"Отправлено {sent} суммаризаций")
+
+    return len(tasks)
+
+async def schedule_delivery(bot):
+    """
+    Периодическая отправка суммаризаций из очереди доставки
+
+    Args:
+        bot: Объект бота для отправки сообщений
+    """
+    while True:
+        try:
+            # Если очередь не исчерпана, продолжаем без паузы
+            if await deliver_summaries(bot) >= DELIVERY_BATCH_SIZE:
+                continue
+
+        except Exception as e:
+            logger.error(f"Ошибка при доставке суммаризаций: {e}")
+
+        await asyncio.sleep(DELIVERY_POLL_INTERVAL)
@@ -4,10 +4,13 @@ from aiogram.types import Message, CallbackQuery
 from aiogram.filters import Command, CommandStart
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
+import asyncio
 import re
 
 import database as db
-from bot.utils import extract_channel_info
+from bot.utils import extract_channel_info, extract_username
+from channel_manager.metadata import get_channel_metadata, normalize_source
+from config import BULK_IMPORT_MAX_LINKS, BULK_IMPORT_MAX_FILE_SIZE
 
 router = Router()
 
@@ -15,6 +18,9 @@ router = Router()
 class AddChannelStates(StatesGroup):
     waiting_for_channel = State()
 
+class ImportChannelsStates(StatesGroup):
+    waiting_for_links = State()
+
 # Обработчик команды /start
 @router.message(CommandStart())
 async def cmd_start(message: Message):
@@ -35,6 +41,7 @@ async def cmd_start(message: Message):
         "суммаризированную информацию из них.\n\n"
         "Доступные команды:\n"
         "/add_channel - Добавить канал для отслеживания\n"
+        "/import_channels - Добавить сразу несколько каналов (список ссылок или текстовый файл)\n"
         "/list_channels - Показать список отслеживаемых каналов\n"
         "/remove_channel - Удалить канал из отслеживаемых\n\n"
         "Чтобы начать, добавьте канал с помощью команды /add_channel."
@@ -88,6 +95,140 @@ async def process_channel_url(message: Message, channel_url: str):
         f"Я буду периодически проверять новые сообщения в этом канале и отправлять вам суммаризированную информацию."
     )
 
+# Обработчик команды /import_channels
+@router.message(Command("import_channels"))
+async def cmd_import_channels(message: Message, state: FSMContext):
+    """Обработчик команды /import_channels (ссылки в тексте команды или в приложенном файле)"""
+    command_args = (message.text or message.caption or '').split(maxsplit=1)
+    
+    if len(command_args) > 1 or message.document:
+        await process_import_message(message)
+    else:
+        await message.answer(
+            "Отправьте ссылки на каналы одним сообщением (через пробел или с новой строки) "
+            "или текстовым файлом.\n"
+            "Например: https://t.me/channel_name @another_channel"
+        )
+        await state.set_state(ImportChannelsStates.waiting_for_links)
+
+# Обработчик списка ссылок для импорта
+@router.message(ImportChannelsStates.waiting_for_links)
+async def process_import_input(message: Message, state: FSMContext):
+    """Обработчик ввода ссылок для импорта"""
+    await state.clear()
+    await process_import_message(message)
+
+async def read_import_text(message: Message):
+    """
+    Текст со ссылками из сообщения: содержимое приложенного файла или текст сообщения
+
+    Returns:
+        str: Текст или None, если файл слишком большой или не читается
+    """
+    if not message.document:
+        text = message.text or ''
+        # Сама команда не является ссылкой
+        if text.startswith('/'):
+            parts = text.split(maxsplit=1)
+            text = parts[1] if len(parts) > 1 else ''
+        return text
+    
+    if message.document.file_size and message.document.file_size > BULK_IMPORT_MAX_FILE_SIZE:
+        return None
+    
+    try:
+        content = await message.bot.download(message.document)
+        return content.read().decode('utf-8', errors='ignore')
+    except Exception:
+        return None
+
+def parse_channel_links(text):
+    """
+    Нормализация и удаление повторов ссылок на каналы
+
+    Args:
+        text (str): Ссылки через пробелы, запятые или переводы строк
+
+    Returns:
+        tuple: (username каналов в порядке появления, неподдерживаемые ссылки)
+    """
+    usernames = {}
+    invalid = []
+    
+    for link in re.split(r'[\s,;]+', text):
+        if not link:
+            continue
+        username = extract_username(link)
+        if not username:
+            invalid.append(link)
+        elif normalize_source(username) not in usernames:
+            usernames[normalize_source(username)] = username
+    
+    return list(usernames.values()), invalid
+
+async def process_import_message(message: Message):
+    """Массовое добавление каналов из ссылок в сообщении или файле"""
+    user_id = message.from_user.id
+    
+    text = await read_import_text(message)
+    if text is None:
+        await message.answer(
+            f"Не удалось прочитать файл. Отправьте текстовый файл размером до {BULK_IMPORT_MAX_FILE_SIZE // 1024} КБ."
+        )
+        return
+    
+    usernames, invalid = parse_channel_links(text)
+    
+    if not usernames:
+        await message.answer(
+            "Не найдено ни одной ссылки на канал.\n"
+            "Формат ссылки должен быть: https://t.me/channel_name или @channel_name"
+        )
+        return
+    
+    skipped = usernames[BULK_IMPORT_MAX_LINKS:]
+    usernames = usernames[:BULK_IMPORT_MAX_LINKS]
+    
+    # Каналы, которые пользователь уже отслеживает, не проверяются повторно
+    tracked = {normalize_source(channel['channel_url']) for channel in db.get_channels(user_id)}
+    already_tracked = [username for username in usernames if normalize_source(username) in tracked]
+    usernames = [username for username in usernames if normalize_source(username) not in tracked]
+    
+    # Метаданные известных каналов берутся из кэша, новые каналы проверяются
+    # одновременно (число запросов к Telegram ограничено общим ограничителем)
+    results = await asyncio.gather(*[get_channel_metadata(username) for username in usernames])
+    
+    found = [(metadata['title'], username) for username, metadata in zip(usernames, results) if metadata]
+    not_found = [username for username, metadata in zip(usernames, results) if not metadata]
+    
+    # Все подписки добавляются в одной транзакции
+    try:
+        db.add_channels(user_id, found)
+    except Exception:
+        await message.answer("Не удалось сохранить каналы. Пожалуйста, попробуйте снова.")
+        return
+    
+    report = f"Импорт каналов завершен.\n\nДобавлено: {len(found)}\n"
+    for title, username in found:
+        report += f"✅ {title} (@{username})\n"
+    
+    if already_tracked:
+        report += f"\nУже отслеживаются: {len(already_tracked)}\n"
+        report += "".join(f"• @{username}\n" for username in already_tracked)
+    
+    if not_found:
+        report += f"\nНе найдены: {len(not_found)}\n"
+        report += "".join(f"❌ @{username}\n" for username in not_found)
+    
+    if invalid:
+        report += f"\nНеподдерживаемые ссылки: {len(invalid)}\n"
+        report += "".join(f"❌ {link}\n" for link in invalid)
+    
+    if skipped:
+        report += f"\nПропущено сверх лимита {BULK_IMPORT_MAX_LINKS} ссылок: {len(skipped)}\n"
+    
+    await message.answer(report[:MAX_MESSAGE_LENGTH])
+
 # Обработчик команды /list_channels
 @router.message(Command("list_channels"))
 async def cmd_list_channels(message: Message):
@@ -138,29 +279,41 @@ async def cmd_remove_channel(message: Message):
     # Сохраняем список каналов в состоянии пользователя для последующего использования
     await message.answer(channels_text)
 
+# Максимальная длина текста сообщения Telegram
+MAX_MESSAGE_LENGTH = 4096
+
 # Обработчик команды /summarize
 @router.message(Command("summarize"))
 async def cmd_summarize(message: Message):
-    """Обработчик команды /summarize"""
+    """
+    Обработчик команды /summarize
+
+    Ответ собирается из заранее вычисленных данных фонового конвейера: суммаризаций,
+    доставленных пользователю за последний час, и суммаризаций открытых кластеров
+    с сообщениями из его каналов. Суммаризация во время запроса не выполняется.
+    """
     user_id = message.from_user.id
     
-    # Получаем сообщения за последний час
-    messages = db.get_messages_last_hour()
+    summary_lines = [f"- {summary['summary_text']}\n" for summary in db.get_user_summaries_since(user_id, hours=1)]
+    
+    # Для кластеров, суммаризация которых еще не готова, показываем первое
+    # сообщение кластера (все такие сообщения загружаются одним запросом)
+    clusters = db.get_user_open_clusters(user_id)
+    missing = db.get_messages_by_ids([
+        cluster['first_message_id'] for cluster in clusters if cluster['summary_text'] is None
+    ])
+    
+    for cluster in clusters:
+        if cluster['summary_text'] is not None:
+            summary_lines.append(f"- {cluster['summary_text']}\n")
+        elif cluster['first_message_id'] in missing:
+            summary_lines.append(f"- {missing[cluster['first_message_id']]['message_text']}\n")
     
-    if not messages:
+    if not summary_lines:
         await message.answer("Нет новых сообщений за последний час.")
         return
     
-    # Удаляем дублирующийся контент
-    from summarizer.deduplicator import find_similar_messages
-    unique_messages = find_similar_messages(messages)
-    
     # Формируем итоговую суммаризацию
-    summary_text = "Суммаризация за последний час:\n\n"
-    for group in unique_messages:
-        for msg_id in group:
-            message = db.get_message_by_id(msg_id)
-            if message:
-                summary_text += f"- {message['message_text']}\n"
-    
-    await message.answer(summary_text)
+    summary_text = "Суммаризация за последний час:\n\n" + "".join(summary_lines)
+    
+    await message.answer(summary_text[:MAX_MESSAGE_LENGTH])
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import logging
+import time
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage
+
+import database as db
+from config import FSM_STATE_TTL
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+class SQLiteStorage(BaseStorage):
+    """
+    Хранилище состояний FSM в SQLite
+
+    Состояния переживают перезапуск и доступны всем процессам бота. Кэша в
+    процессе нет: каждое чтение обращается к базе, поэтому процессы за одним
+    балансировщиком сразу видят изменения друг друга. Запросы к базе выполняются
+    в отдельном потоке и не блокируют цикл событий. Состояния, не изменявшиеся
+    state_ttl секунд, считаются устаревшими и удаляются.
+    """
+
+    def __init__(self, state_ttl=FSM_STATE_TTL):
+        self.state_ttl = state_ttl
+
+    @staticmethod
+    def make_key(key):
+        """Строковый ключ записи по StorageKey aiogram"""
+        thread_id = key.thread_id if key.thread_id is not None else ''
+        return f"{key.bot_id}:{key.chat_id}:{key.user_id}:{thread_id}:{key.destiny}"
+
+    def _expire(self, storage_key):
+        """Удаление устаревшей записи ключа"""
+        if self.state_ttl:
+            db.delete_fsm_records(time.time() - self.state_ttl, storage_key)
+
+    def _load(self, storage_key):
+        """Получение записи из базы данных (устаревшее состояние сбрасывается)"""
+        record = db.get_fsm_record(storage_key)
+
+        if record is not None and self.state_ttl and time.time() - record['updated_at'] > self.state_ttl:
+            self._expire(storage_key)
+            record = None
+
+        return record or {'state': None, 'data': {}}
+
+    def _save_state(self, storage_key, state):
+        """Сохранение состояния (данные устаревшей записи не сохраняются)"""
+        self._expire(storage_key)
+        db.set_fsm_state(storage_key, state, time.time())
+
+    def _save_data(self, storage_key, data):
+        """Сохранение данных (состояние устаревшей записи не сохраняется)"""
+        self._expire(storage_key)
+        db.set_fsm_data(storage_key, data, time.time())
+
+    async def set_state(self, key, state=None):
+        state = state.state if isinstance(state, State) else state
+        await asyncio.to_thread(self._save_state, self.make_key(key), state)
+
+    async def get_state(self, key):
+        record = await asyncio.to_thread(self._load, self.make_key(key))
+        return record['state']
+
+    async def set_data(self, key, data):
+        await asyncio.to_thread(self._save_data, self.make_key(key), dict(data))
+
+    async def get_data(self, key):
+        record = await asyncio.to_thread(self._load, self.make_key(key))
+        return dict(record['data'])
+
+    def cleanup(self):
+        """
+        Удаление всех устаревших состояний из базы данных
+
+        Returns:
+            int: Количество удаленных записей
+        """
+        try:
+            return db.delete_fsm_records(time.time() - self.state_ttl)
+        except Exception as e:
+            logger.error(f"Ошибка при удалении устаревших состояний FSM: {e}")
+            return 0
+
+    async def close(self):
+        pass
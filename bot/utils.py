@@ -1,12 +1,12 @@
 # -*- coding: utf-8 -*-
 import asyncio
 import re
+import threading
+import time
 from telethon import TelegramClient
-from telethon.tl.functions.channels import GetFullChannelRequest, JoinChannelRequest
-from telethon.tl.types import Channel, Chat
 import logging
 
-from config import API_ID, API_HASH
+from config import API_ID, API_HASH, TELEGRAM_API_CONCURRENCY, TELEGRAM_API_MIN_INTERVAL
 
 # Настройка клиента Telegram API
 api_client = None
@@ -33,53 +33,103 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Клиент Telethon для работы с API Telegram
+# Клиенты Telethon для работы с API Telegram: клиент работает только в цикле
+# событий, в котором запущен, поэтому у каждого цикла свой клиент
+clients = {}
 
-user_client = None
+# Одновременные первые вызовы в одном цикле (например, проверка каналов при импорте)
+# ждут один запуск клиента; блокировка asyncio тоже создается для каждого цикла
+client_locks = {}
 
-async def get_user_client(phone_number: str = "+79996559005"):
-    """Получение или создание клиента Telethon для пользователя"""
-    global user_client
-    
-    if user_client is None:
-        try:
-            loop = asyncio.get_event_loop()
-            user_client = TelegramClient('user_session', API_ID, API_HASH, loop=loop)
-            logger.info(f"Попытка авторизации с номером: {phone_number}")
-            logger.info(f"Попытка авторизации с номером {phone_number}")
-            await user_client.connect()
-            if not await user_client.is_user_authorized():
-                await user_client.send_code_request(phone_number)
-                logger.info("Код подтверждения отправлен. Введите код:")
-                code = input("Введите код подтверждения (например, 12345): ")
-                if not code:
-                    logger.error("Код подтверждения не был введен.")
-                    return None
-                try:
-                    await user_client.sign_in(phone_number, code)
-                except Exception as e:
-                    logger.error(f"Ошибка при вводе кода подтверждения: {e}")
-                    return None
-        except Exception as e:
-            logger.error(f"Ошибка при создании клиента пользователя Telethon: {e}")
-            return None
-    
-    return user_client
-client = None
+# Словари клиентов и блокировок изменяются из потоков разных циклов
+clients_lock = threading.Lock()
 
 async def get_telethon_client():
-    """Получение или создание клиента Telethon"""
-    global client
+    """Получение или создание клиента Telethon текущего цикла событий (возвращается только запущенный клиент)"""
+    loop = asyncio.get_running_loop()
     
-    if client is None:
-        try:
-            client = TelegramClient('channel_fetcher_session', API_ID, API_HASH)
-            await client.start()
-        except Exception as e:
-            logger.error(f"Ошибка при создании клиента Telethon: {e}")
-            return None
+    client = clients.get(loop)
+    if client is not None:
+        return client
+    
+    with clients_lock:
+        # Клиенты и блокировки завершенных циклов (asyncio.run) больше не понадобятся
+        for closed_loop in [other for other in client_locks if other.is_closed()]:
+            client_locks.pop(closed_loop)
+            clients.pop(closed_loop, None)
+        
+        lock = client_locks.setdefault(loop, asyncio.Lock())
+    
+    async with lock:
+        if loop not in clients:
+            try:
+                new_client = TelegramClient('channel_fetcher_session', API_ID, API_HASH)
+                await new_client.start()
+                clients[loop] = new_client
+            except Exception as e:
+                logger.error(f"Ошибка при создании клиента Telethon: {e}")
+                return None
     
-    return client
+    return clients[loop]
+
+class TelegramRateLimiter:
+    """
+    Ограничение запросов к Telegram API
+
+    Не больше concurrency одновременных запросов и не чаще одного запроса
+    в min_interval секунд. Используется как асинхронный контекстный менеджер.
+    """
+
+    def __init__(self, concurrency=TELEGRAM_API_CONCURRENCY, min_interval=TELEGRAM_API_MIN_INTERVAL):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.lock = asyncio.Lock()
+        self.min_interval = min_interval
+        self.last_request = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        try:
+            async with self.lock:
+                delay = self.last_request + self.min_interval - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                self.last_request = time.monotonic()
+        except BaseException:
+            self.semaphore.release()
+            raise
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.semaphore.release()
+
+# Общий ограничитель запросов клиента Telethon
+telegram_rate_limiter = TelegramRateLimiter()
+
+def extract_username(channel_url):
+    """
+    Извлечение username канала из ссылки
+
+    Args:
+        channel_url (str): Ссылка в формате https://t.me/channel_name или @channel_name
+
+    Returns:
+        str: Username канала или None, если ссылка не поддерживается
+    """
+    channel_url = channel_url.strip()
+
+    # Проверяем формат @username
+    if channel_url.startswith('@'):
+        return channel_url[1:] or None
+
+    # Приватные ссылки-приглашения https://t.me/+... не поддерживаются
+    if re.match(r'https?://t\.me/\+', channel_url):
+        return None
+
+    # Проверяем формат https://t.me/username
+    match = re.match(r'https?://t\.me/([a-zA-Z0-9_]+)', channel_url)
+    if match:
+        return match.group(1)
+
+    return None
 
 async def extract_channel_info(channel_url):
     """
@@ -92,58 +142,31 @@ async def extract_channel_info(channel_url):
         dict: Словарь с информацией о канале (title, username) или None в случае ошибки
     """
     # Извлекаем username из ссылки
-    username = None
-    
-    # Проверяем формат @username
-    if channel_url.startswith('@'):
-        username = channel_url[1:]
-    
-    # Проверяем формат https://t.me/username
-    elif re.match(r'https?://t\.me/\+', channel_url):
-        logger.warning(f"Ссылка {channel_url} не поддерживается ботом.")
-        return None
-    else:
-        match = re.match(r'https?://t\.me/([a-zA-Z0-9_]+)', channel_url)
-        if match:
-            username = match.group(1)
+    username = extract_username(channel_url)
     
     if not username:
         logger.warning(f"Не удалось извлечь username из ссылки: {channel_url}")
         return None
     
-    # Получаем информацию о канале через Telethon
-    try:
-        client = await get_telethon_client()
-        if not client:
-            return None
-        
-        # Получаем информацию о канале
-        entity = await client.get_entity(username)
-        
-        # Проверяем, что это канал или группа
-        if isinstance(entity, (Channel, Chat)):
-            # Получаем полную информацию о канале
-            full_channel = await client(GetFullChannelRequest(entity))
-            
-            return {
-                'title': entity.title,
-                'username': username,
-                'id': entity.id,
-                'participants_count': getattr(full_channel.full_chat, 'participants_count', 0),
-                'about': getattr(full_channel.full_chat, 'about', None)
-            }
-        else:
-            logger.warning(f"Сущность {username} не является каналом или группой")
-            return None
+    # Метаданные канала берутся из кэша; Telegram API вызывается только для нового канала
+    # (импорт внутри функции: модуль кэша сам использует клиента из этого модуля)
+    from channel_manager.metadata import get_channel_metadata
     
-    except Exception as e:
-        logger.error(f"Ошибка при получении информации о канале {username}: {e}")
+    metadata = await get_channel_metadata(username)
+    if not metadata:
         return None
+    
+    return {
+        'title': metadata['title'],
+        'username': username,
+        'id': metadata['id'],
+        'participants_count': metadata['participants_count'],
+        'about': metadata['about']
+    }
 
 async def close_telethon_client():
-    """Закрытие клиента Telethon"""
-    global client
+    """Закрытие клиента Telethon текущего цикла событий"""
+    client = clients.pop(asyncio.get_running_loop(), None)
     
     if client:
         await client.disconnect()
-        client = None
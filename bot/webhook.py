@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import logging
+import asyncio
+import hmac
+from aiohttp import web
+from aiogram.types import Update
+
+from config import (
+    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT, WEBHOOK_MAX_WORKERS
+)
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Заголовок, в котором Telegram передает секрет вебхука
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+class WebhookHandler:
+    """
+    Прием обновлений от Telegram через вебхук
+
+    Обновление подтверждается сразу после постановки в обработку, обработка
+    выполняется в фоне. Количество одновременно обрабатываемых обновлений
+    ограничено семафором: при перегрузке прием новых запросов ожидает
+    освобождения обработчика, и Telegram повторяет доставку позже.
+    """
+
+    def __init__(self, dp, bot, secret=WEBHOOK_SECRET, max_workers=WEBHOOK_MAX_WORKERS):
+        self.dp = dp
+        self.bot = bot
+        self.secret = secret
+        self.semaphore = asyncio.Semaphore(max_workers)
+        self.tasks = set()
+
+    async def handle(self, request):
+        """Обработчик POST-запроса с обновлением"""
+        if self.secret and not hmac.compare_digest(request.headers.get(SECRET_HEADER, ''), self.secret):
+            return web.Response(status=401)
+
+        try:
+            update = Update.model_validate(await request.json(), context={'bot': self.bot})
+        except Exception as e:
+            logger.warning(f"Получено некорректное обновление: {e}")
+            return web.Response(status=400)
+
+        await self.semaphore.acquire()
+
+        task = asyncio.create_task(self.process(update))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+        return web.Response()
+
+    async def process(self, update):
+        """Обработка обновления диспетчером"""
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception as e:
+            logger.error(f"Ошибка при обработке обновления {update.update_id}: {e}")
+        finally:
+            self.semaphore.release()
+
+    async def wait_closed(self):
+        """Ожидание завершения обрабатываемых обновлений"""
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+def create_webhook_app(dp, bot, path=WEBHOOK_PATH):
+    """
+    Создание приложения aiohttp для приема обновлений
+
+    Args:
+        dp: Диспетчер aiogram
+        bot: Объект бота
+        path (str): Путь вебхука
+
+    Returns:
+        aiohttp.web.Application: Приложение с обработчиком вебхука
+    """
+    handler = WebhookHandler(dp, bot)
+
+    app = web.Application()
+    app['webhook_handler'] = handler
+    app.router.add_post(path, handler.handle)
+
+    async def on_cleanup(app):
+        await handler.wait_closed()
+
+    app.on_cleanup.append(on_cleanup)
+
+    return app
+
+async def run_webhook(dp, bot):
+    """
+    Запуск сервера вебхука (вместо long polling)
+
+    Несколько процессов бота могут работать за одним балансировщиком:
+    все они регистрируют один и тот же адрес вебхука.
+    """
+    app = create_webhook_app(dp, bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, WEBHOOK_HOST, WEBHOOK_PORT)
+    await site.start()
+    logger.info(f"Сервер вебхука запущен на {WEBHOOK_HOST}:{WEBHOOK_PORT}{WEBHOOK_PATH}")
+
+    try:
+        if WEBHOOK_URL:
+            await bot.set_webhook(f"{WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}", secret_token=WEBHOOK_SECRET)
+            logger.info("Вебхук зарегистрирован в Telegram")
+        else:
+            logger.warning("WEBHOOK_URL не задан, вебхук нужно зарегистрировать вручную")
+
+        # Работаем до отмены задачи
+        await asyncio.Event().wait()
+
+    finally:
+        await runner.cleanup()
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import logging
 from telethon import TelegramClient
+from telethon import errors
 from telethon.tl.types import MessageMediaPhoto, MessageMediaDocument
 from telethon.tl.functions.channels import JoinChannelRequest
 import os
@@ -8,8 +9,12 @@ from datetime import datetime
 import asyncio
 
 import database as db
-from bot.utils import get_telethon_client
-from config import MAX_IMAGES_PER_POST
+from channel_manager.session_pool import session_pool, ACCOUNT_ERRORS
+from config import MAX_IMAGES_PER_POST, ONLINE_CLUSTERING_ENABLED, FETCH_PAGE_SIZE, NEW_CHANNEL_BACKFILL_LIMIT
+from summarizer.minhash import index_message
+from summarizer.vectorizer import vectorize_for_storage, counts_to_json
+from summarizer.clustering import assign_message
+from summarizer.preprocessing import preprocess_text, document_counts, store_document
 
 # Настройка логирования
 logging.basicConfig(
@@ -36,20 +41,25 @@ async def fetch_new_messages(channel_id, channel_url, last_message_id=0):
     Returns:
         list: Список новых сообщений
     """
+    # Извлекаем username из URL
+    username = channel_url
+    if channel_url.startswith('@'):
+        username = channel_url[1:]
+    
+    # Канал обслуживает аккаунт, назначенный ему в пуле сессий
+    session_name, client = await session_pool.get_client(username)
+    if not client:
+        return []
+    
+    processed_messages = []
+    
     try:
-        from bot.utils import get_user_client
-        client = await get_user_client(phone_number="+79996559005")
-        if not client:
-            return []
-        
-        # Извлекаем username из URL
-        username = channel_url
-        if channel_url.startswith('@'):
-            username = channel_url[1:]
-        
         logger.info(f"Обработка канала: channel_url={channel_url}, username={username}")
         try:
             entity = await client.get_entity(username)
+        except (errors.FloodWaitError, *ACCOUNT_ERRORS):
+            # Ошибки аккаунта обрабатываются ниже
+            raise
         except Exception as e:
             logger.error(f"Проверка канала {username} не удалась: {e}")
             return []
@@ -58,75 +68,160 @@ async def fetch_new_messages(channel_id, channel_url, last_message_id=0):
         try:
             await client(JoinChannelRequest(username))
             logger.info(f"Успешно подписались на канал: {username}")
+        except (errors.FloodWaitError, *ACCOUNT_ERRORS):
+            # Ошибки аккаунта обрабатываются ниже
+            raise
         except Exception as e:
             logger.error(f"Не удалось подписаться на канал {username}: {e}")
             return []
         
-        messages = await client.get_messages(
-            entity,
-            limit=100,  # Ограничиваем количество сообщений
-            min_id=last_message_id  # Получаем сообщения с ID больше last_message_id
-        )
-        
-        if not messages:
-            logger.info(f"Нет новых сообщений в канале {channel_url}")
-            return []
+        # Для нового канала история загружается на ограниченную глубину
+        min_id = last_message_id
+        if not last_message_id:
+            latest = await client.get_messages(entity, limit=1)
+            if not latest:
+                logger.info(f"Нет сообщений в канале {channel_url}")
+                return []
+            min_id = max(0, latest[0].id - NEW_CHANNEL_BACKFILL_LIMIT)
         
-        # Обрабатываем полученные сообщения
-        processed_messages = []
-        max_message_id = last_message_id
+        # Читаем сообщения от курсора в порядке возрастания ID страницами;
+        # курсор сохраняется после каждой страницы, поэтому при всплеске
+        # публикаций или долгом простое сообщения не пропускаются
+        page = []
         
-        for message in messages:
-            # Пропускаем пустые сообщения
-            if not message.text and not message.media:
-                continue
-            
-            # Обновляем максимальный ID сообщения
-            if message.id > max_message_id:
-                max_message_id = message.id
-            
-            # Сохраняем сообщение в базу данных
-            message_text = message.text if message.text else ""
-            message_date = message.date
+        async for message in client.iter_messages(entity, min_id=min_id, reverse=True):
+            page.append(message)
             
-            # Добавляем сообщение в базу данных
-            message_id = db.add_message(
-                channel_id,
-                message_text,
-                message_date.strftime('%Y-%m-%d %H:%M:%S')
-            )
-            
-            # Обрабатываем медиафайлы
-            media_files = []
-            
-            if message.media:
-                media_files = await process_media(message, message_id)
-            
-            # Добавляем обработанное сообщение в список
-            processed_messages.append({
-                'message_id': message_id,
-                'text': message_text,
-                'date': message_date,
-                'media_files': media_files
-            })
-        
-        # Обновляем последний проверенный ID сообщения
-        if max_message_id > last_message_id:
-            db.update_last_checked_message_id(channel_id, max_message_id)
+            if len(page) >= FETCH_PAGE_SIZE:
+                processed_messages.extend(await process_page(channel_id, page, client))
+                page = []
+        
+        if page:
+            processed_messages.extend(await process_page(channel_id, page, client))
+        
+        if not processed_messages:
+            logger.info(f"Нет новых сообщений в канале {channel_url}")
         
         return processed_messages
     
+    except errors.FloodWaitError as e:
+        # Курсор сохранен после последней страницы: при следующем обновлении
+        # канал продолжит другой аккаунт
+        session_pool.report_flood_wait(session_name, e.seconds)
+        return processed_messages
+    
+    except ACCOUNT_ERRORS as e:
+        await session_pool.report_failure(session_name, e)
+        return processed_messages
+    
     except Exception as e:
         logger.error(f"Ошибка при получении сообщений из канала {channel_url}: {e}")
-        return []
+        return processed_messages
+
+async def process_page(channel_id, messages, client):
+    """
+    Сохранение страницы сообщений и продвижение курсора канала
+    
+    Сообщения сохраняются по одному, а постановка в очередь суммаризации и
+    продвижение курсора выполняются одной транзакцией после страницы. Если
+    обработка страницы прервалась, страница будет получена повторно: уже
+    сохраненные сообщения не дублируются (уникальный ключ канал + ID сообщения
+    в Telegram), для них достраиваются недостающие токены, индекс, кластер и
+    медиафайлы, и они ставятся в очередь вместе с остальными.
+    
+    Args:
+        channel_id (int): ID канала в базе данных
+        messages (list): Сообщения Telethon в порядке возрастания ID
+        client: Клиент аккаунта пула, получивший сообщения (через него скачиваются медиафайлы)
+    
+    Returns:
+        list: Список сохраненных сообщений
+    """
+    processed_messages = []
+    
+    for message in messages:
+        # Пропускаем пустые сообщения
+        if not message.text and not message.media:
+            continue
+        
+        # Сохраняем сообщение в базу данных
+        message_text = message.text if message.text else ""
+        message_date = message.date
+        
+        # Очищаем и токенизируем текст один раз: результат используют
+        # векторизатор, суммаризатор и дедупликатор
+        document = preprocess_text(message_text)
+        counts = document_counts(document)
+        
+        # Добавляем сообщение в базу данных вместе с векторным представлением
+        message_id = db.add_message(
+            channel_id,
+            message_text,
+            message_date.strftime('%Y-%m-%d %H:%M:%S'),
+            counts_to_json(counts),
+            message.id
+        )
+        
+        if message_id is None:
+            # Сообщение сохранено при прерванной обработке этой страницы: обработка
+            # могла оборваться и до сохранения производных данных, поэтому
+            # выполняются только недостающие шаги
+            message_id = db.get_message_id(channel_id, message.id)
+            has_document = bool(db.get_message_tokens([message_id]))
+            has_cluster = bool(db.get_message_clusters([message_id]))
+            media_files = [
+                {'media_id': media['media_id'], 'type': media['media_type'], 'path': media['local_path']}
+                for media in db.get_media_for_message(message_id)
+            ]
+        else:
+            has_document = has_cluster = False
+            media_files = []
+        
+        # Документные частоты учитываются один раз на сообщение: результат
+        # предобработки сохраняется сразу после них и отмечает, что сообщение учтено
+        if has_document:
+            vector_representation = counts_to_json(counts)
+        else:
+            vector_representation = vectorize_for_storage(message_text, counts)
+            store_document(message_id, document)
+        
+        # Добавляем сообщение в индекс почти-дубликатов (повторная запись заменяет прежнюю)
+        index_message(message_id, message_text)
+        
+        # Присоединяем сообщение к открытому кластеру
+        if ONLINE_CLUSTERING_ENABLED and not has_cluster:
+            assign_message(message_id, message_text, vector_representation)
+        
+        # Обрабатываем медиафайлы
+        if message.media and not media_files:
+            media_files = await process_media(message, message_id, client)
+        
+        # Добавляем обработанное сообщение в список
+        processed_messages.append({
+            'message_id': message_id,
+            'text': message_text,
+            'date': message_date,
+            'media_files': media_files
+        })
+    
+    # Сохраненные сообщения ставятся в очередь суммаризации вместе с продвижением курсора;
+    # курсор продвигается и через пустые сообщения, чтобы не запрашивать их повторно
+    db.complete_fetch_page(
+        channel_id,
+        [message['message_id'] for message in processed_messages],
+        max(message.id for message in messages)
+    )
+    
+    return processed_messages
 
-async def process_media(message, message_id):
+async def process_media(message, message_id, client):
     """
     Обработка медиафайлов в сообщении
     
     Args:
         message: Объект сообщения Telethon
         message_id (int): ID сообщения в базе данных
+        client: Клиент аккаунта пула, получивший сообщение
         
     Returns:
         list: Список словарей с информацией о медиафайлах
@@ -148,9 +243,8 @@ async def process_media(message, message_id):
             file_path = os.path.join(photo_dir, file_name)
             
             # Скачиваем фото
-            client = await get_telethon_client()
             if client:
-                await message.download_media(file_path)
+                await client.download_media(message, file_path)
                 
                 # Добавляем информацию о медиафайле в базу данных
                 media_id = db.add_media(
@@ -181,9 +275,8 @@ async def process_media(message, message_id):
                 file_path = os.path.join(photo_dir, file_name)
                 
                 # Скачиваем фото
-                client = await get_telethon_client()
                 if client:
-                    await message.download_media(file_path)
+                    await client.download_media(message, file_path)
                     
                     # Добавляем информацию о медиафайле в базу данных
                     media_id = db.add_media(
@@ -1,13 +1,16 @@
 # -*- coding: utf-8 -*-
 import logging
 from telethon import TelegramClient
-from telethon.tl.functions.channels import GetFullChannelRequest, JoinChannelRequest
+from telethon.tl.functions.channels import JoinChannelRequest
 from telethon.tl.types import Channel, Chat
 import asyncio
 
 import database as db
 from bot.utils import get_telethon_client
 from channel_manager.fetcher import fetch_new_messages
+from channel_manager.metadata import get_channel_metadata
+from channel_manager.session_pool import session_pool, ring_hash
+from config import WORKER_ID, FETCH_LEASE_TIMEOUT
 
 # Настройка логирования
 logging.basicConfig(
@@ -55,7 +58,7 @@ async def check_channel_exists(channel_url):
 
 async def get_channel_info(channel_id):
     """
-    Получение информации о канале из базы данных и Telegram API
+    Получение информации о канале из базы данных и кэша метаданных
     
     Args:
         channel_id (int): ID канала в базе данных
@@ -64,50 +67,23 @@ async def get_channel_info(channel_id):
         dict: Словарь с информацией о канале или None в случае ошибки
     """
     try:
-        # Получаем информацию о канале из базы данных
-        channels = db.get_channels(None)  # Получаем все каналы
-        channel_info = None
-        
-        for channel in channels:
-            if channel['channel_id'] == channel_id:
-                channel_info = channel
-                break
+        channel_info = db.get_channel_by_id(channel_id)
         
         if not channel_info:
             logger.warning(f"Канал с ID {channel_id} не найден в базе данных")
             return None
         
-        # Получаем дополнительную информацию через Telethon
-        client = await get_telethon_client()
-        if not client:
-            return channel_info
-        
-        try:
-            # Извлекаем username из URL
-            username = channel_info['channel_url']
-            
-            # Пытаемся подписаться на канал перед получением информации
-            try:
-                await client(JoinChannelRequest(username))
-                logger.info(f"Подписался на канал {username}")
-            except Exception as e:
-                logger.warning(f"Не удалось подписаться на канал {username}: {e}")
-            
-            entity = await client.get_entity(username)
-            
-            # Добавляем информацию из Telegram API
-            if isinstance(entity, (Channel, Chat)):
-                full_channel = await client(GetFullChannelRequest(entity))
-                
-                channel_info.update({
-                    'title': entity.title,
-                    'id': entity.id,
-                    'participants_count': getattr(full_channel.full_chat, 'participants_count', 0),
-                    'about': getattr(full_channel.full_chat, 'about', None)
-                })
-        
-        except Exception as e:
-            logger.warning(f"Не удалось получить дополнительную информацию о канале {channel_id}: {e}")
+        # Добавляем информацию из Telegram API (из кэша, без повторной подписки на канал)
+        metadata = await get_channel_metadata(channel_info['channel_url'])
+        if metadata:
+            channel_info.update({
+                'title': metadata['title'],
+                'id': metadata['id'],
+                'participants_count': metadata['participants_count'],
+                'about': metadata['about']
+            })
+        else:
+            logger.warning(f"Не удалось получить дополнительную информацию о канале {channel_id}")
         
         return channel_info
     
@@ -115,16 +91,26 @@ async def get_channel_info(channel_id):
         logger.error(f"Ошибка при получении информации о канале {channel_id}: {e}")
         return None
 
-async def update_all_channels():
+async def update_all_channels(shard_index=0, shard_count=1):
     """
     Обновление всех каналов - получение новых сообщений
     
+    Несколько сборщиков делят каналы по хэшу источника (--shard i/n); канал
+    дополнительно арендуется, чтобы его не обновляли два процесса одновременно.
+    
+    Args:
+        shard_index (int): Номер части каналов, обслуживаемой процессом
+        shard_count (int): Количество частей
+        
     Returns:
         int: Количество новых сообщений
     """
     try:
-        # Получаем все каналы
-        channels = db.get_channels(None)  # Получаем все каналы
+        # Получаем каналы своей части
+        channels = [
+            channel for channel in db.get_channels(None)
+            if ring_hash(channel['channel_url'].lower()) % shard_count == shard_index
+        ]
         
         if not channels:
             logger.info("Нет каналов для обновления")
@@ -134,7 +120,14 @@ async def update_all_channels():
         
         # Обновляем каждый канал
         for channel in channels:
+            lease_name = f"fetch:{channel['channel_id']}"
+            if not db.acquire_lease(lease_name, WORKER_ID, FETCH_LEASE_TIMEOUT):
+                continue
+            
             try:
+                # Курсор перечитывается после получения аренды: его мог продвинуть другой процесс
+                channel = db.get_channel_by_id(channel['channel_id']) or channel
+                
                 # Получаем новые сообщения
                 new_messages = await fetch_new_messages(
                     channel['channel_id'],
@@ -148,6 +141,17 @@ async def update_all_channels():
             
             except Exception as e:
                 logger.error(f"Ошибка при обновлении канала {channel['channel_name']}: {e}")
+            
+            finally:
+                db.release_lease(lease_name, WORKER_ID)
+        
+        # Нагрузка аккаунтов пула сессий
+        for session_name, load in session_pool.get_load().items():
+            status = 'доступен' if load['available'] else f"недоступен еще {load['available_in']:.0f} с"
+            logger.info(
+                f"Аккаунт {session_name}: каналов {load['sources']}, запросов {load['requests']}, "
+                f"FloodWait {load['flood_waits']}, сбоев {load['failures']}, {status}"
+            )
         
         return total_new_messages
     
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import logging
+import asyncio
+import time
+from telethon.tl.functions.channels import GetFullChannelRequest
+from telethon.tl.types import Channel, Chat
+
+import database as db
+from bot.utils import get_telethon_client, telegram_rate_limiter
+from config import CHANNEL_METADATA_TTL
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Кэш метаданных в памяти процесса: источник -> метаданные
+metadata_cache = {}
+
+# Выполняющиеся запросы к Telegram: источник -> задача (одновременные запросы одного канала объединяются)
+pending_requests = {}
+
+def normalize_source(username):
+    """Ключ кэша для канала (username без @ в нижнем регистре)"""
+    return username.lstrip('@').lower()
+
+async def fetch_channel_metadata(username):
+    """
+    Получение метаданных канала из Telegram API
+
+    Args:
+        username (str): Username канала
+
+    Returns:
+        dict: Метаданные (id, title, participants_count, about, updated_at) или None
+    """
+    client = await get_telethon_client()
+    if not client:
+        return None
+
+    async with telegram_rate_limiter:
+        entity = await client.get_entity(username)
+
+    # Проверяем, что это канал или группа
+    if not isinstance(entity, (Channel, Chat)):
+        logger.warning(f"Сущность {username} не является каналом или группой")
+        return None
+
+    async with telegram_rate_limiter:
+        full_channel = await client(GetFullChannelRequest(entity))
+
+    metadata = {
+        'id': entity.id,
+        'title': entity.title,
+        'participants_count': getattr(full_channel.full_chat, 'participants_count', 0),
+        'about': getattr(full_channel.full_chat, 'about', None),
+        'updated_at': time.time()
+    }
+
+    db.set_channel_metadata(
+        normalize_source(username), metadata['id'], metadata['title'],
+        metadata['participants_count'], metadata['about'], metadata['updated_at']
+    )
+    metadata_cache[normalize_source(username)] = metadata
+
+    return metadata
+
+def request_metadata(username):
+    """Задача получения метаданных из Telegram (одна на канал, пока выполняется)"""
+    source = normalize_source(username)
+
+    task = pending_requests.get(source)
+    if task is None:
+        task = asyncio.ensure_future(fetch_channel_metadata(username))
+        pending_requests[source] = task
+        task.add_done_callback(lambda _: pending_requests.pop(source, None))
+
+    return task
+
+def refresh_in_background(username):
+    """Фоновое обновление устаревших метаданных"""
+    task = request_metadata(username)
+
+    def log_error(task):
+        if not task.cancelled() and task.exception():
+            logger.warning(f"Не удалось обновить метаданные канала {username}: {task.exception()}")
+
+    task.add_done_callback(log_error)
+
+async def get_channel_metadata(username):
+    """
+    Получение метаданных канала с кэшированием
+
+    Метаданные берутся из памяти или из базы данных; устаревшие (старше
+    CHANNEL_METADATA_TTL) возвращаются сразу и обновляются в фоне. Telegram API
+    вызывается синхронно только для канала, которого еще нет в кэше.
+
+    Args:
+        username (str): Username канала
+
+    Returns:
+        dict: Метаданные (id, title, participants_count, about, updated_at) или None в случае ошибки
+    """
+    source = normalize_source(username)
+
+    try:
+        metadata = metadata_cache.get(source)
+        if metadata is None:
+            metadata = db.get_channel_metadata(source)
+            if metadata is not None:
+                metadata_cache[source] = metadata
+
+        if metadata is not None:
+            if time.time() - metadata['updated_at'] > CHANNEL_METADATA_TTL:
+                refresh_in_background(username)
+            return dict(metadata)
+
+        metadata = await asyncio.shield(request_metadata(username))
+        return dict(metadata) if metadata else None
+
+    except Exception as e:
+        logger.error(f"Ошибка при получении метаданных канала {username}: {e}")
+        return None
@@ -0,0 +1,293 @@
+# -*- coding: utf-8 -*-
+import logging
+import asyncio
+import bisect
+import hashlib
+import time
+from telethon import TelegramClient
+from telethon import errors
+
+from config import API_ID, API_HASH, TELETHON_SESSIONS, SESSION_POOL_VIRTUAL_NODES, ACCOUNT_RETRY_INTERVAL
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Ошибки, после которых аккаунт временно исключается из пула
+ACCOUNT_ERRORS = (OSError, errors.UnauthorizedError, errors.AuthKeyError)
+
+def ring_hash(value):
+    """Позиция значения на кольце консистентного хэширования"""
+    return int.from_bytes(hashlib.md5(value.encode('utf-8')).digest()[:8], 'big')
+
+def telethon_client_factory(session_name):
+    """Создание клиента Telethon для сессии (по умолчанию для пула)"""
+    return TelegramClient(session_name, API_ID, API_HASH)
+
+class Account:
+    """Пользовательский аккаунт пула и его нагрузка"""
+
+    def __init__(self, session_name, phone_number=None):
+        self.session_name = session_name
+        self.phone_number = phone_number
+        self.client = None
+        self.available_at = 0.0  # Время (monotonic), до которого аккаунт не используется
+        self.requests = 0  # Количество выданных клиентов
+        self.flood_waits = 0  # Количество полученных FloodWait
+        self.failures = 0  # Количество сбоев соединения или авторизации
+
+    def is_available(self, now):
+        return self.available_at <= now
+
+class SessionPool:
+    """
+    Пул пользовательских сессий Telethon
+
+    Каналы (источники) распределяются между аккаунтами консистентным хэшированием:
+    каждый аккаунт занимает SESSION_POOL_VIRTUAL_NODES точек на кольце, источник
+    обслуживает первый доступный аккаунт по часовой стрелке от хэша источника.
+    Аккаунт, получивший FloodWait или сбой, исключается на время ожидания - его
+    источники переходят к соседям по кольцу, остальные назначения не меняются.
+    После ожидания источники возвращаются к исходному аккаунту.
+    """
+
+    def __init__(self, sessions=TELETHON_SESSIONS, client_factory=telethon_client_factory,
+                 virtual_nodes=SESSION_POOL_VIRTUAL_NODES, retry_interval=ACCOUNT_RETRY_INTERVAL):
+        """
+        Args:
+            sessions (list): Строки "имя_сессии:телефон" (телефон нужен только для первой авторизации)
+            client_factory: Функция, создающая клиента по имени сессии (подменяется в тестах)
+            virtual_nodes (int): Количество точек каждого аккаунта на кольце
+            retry_interval (float): Время исключения аккаунта после сбоя в секундах
+        """
+        self.accounts = {}
+        for session in sessions:
+            session_name, _, phone_number = session.partition(':')
+            self.accounts[session_name] = Account(session_name, phone_number or None)
+
+        self.client_factory = client_factory
+        self.retry_interval = retry_interval
+        self.assignments = {}  # источник -> имя сессии последнего назначенного аккаунта
+        self.loop = None  # Цикл событий, в котором созданы клиенты и блокировка
+        self.lock = None
+
+        self.ring = sorted(
+            (ring_hash(f"{session_name}#{node}"), session_name)
+            for session_name in self.accounts
+            for node in range(virtual_nodes)
+        )
+        self.ring_keys = [position for position, _ in self.ring]
+
+    def bind_loop(self):
+        """
+        Привязка пула к текущему циклу событий
+
+        Клиенты Telethon и блокировка asyncio работают только в цикле, в котором
+        созданы, поэтому в новом цикле (например, следующем asyncio.run) они
+        создаются заново. Распределение каналов и нагрузка аккаунтов сохраняются.
+        """
+        loop = asyncio.get_running_loop()
+        if self.loop is loop:
+            return
+
+        if self.loop is not None:
+            logger.info("Пул сессий используется в новом цикле событий, клиенты будут подключены заново")
+
+        self.loop = loop
+        self.lock = asyncio.Lock()
+        for account in self.accounts.values():
+            account.client = None
+
+    def account_for(self, source):
+        """
+        Аккаунт, который обслуживает источник
+
+        Args:
+            source (str): Username канала
+
+        Returns:
+            Account: Первый доступный аккаунт на кольце или None, если доступных нет
+        """
+        if not self.ring:
+            return None
+
+        now = time.monotonic()
+        start = bisect.bisect(self.ring_keys, ring_hash(source.lower()))
+        checked = set()
+
+        for offset in range(len(self.ring)):
+            session_name = self.ring[(start + offset) % len(self.ring)][1]
+            if session_name in checked:
+                continue
+            checked.add(session_name)
+
+            if self.accounts[session_name].is_available(now):
+                return self.accounts[session_name]
+
+            if len(checked) == len(self.accounts):
+                break
+
+        return None
+
+    async def get_client(self, source):
+        """
+        Клиент Telethon аккаунта, который обслуживает источник
+
+        Args:
+            source (str): Username канала
+
+        Returns:
+            tuple: (имя сессии, подключенный клиент) или (None, None), если доступных аккаунтов нет
+        """
+        self.bind_loop()
+
+        for _ in range(len(self.accounts)):
+            account = self.account_for(source)
+            if account is None:
+                break
+
+            client = await self.connect(account)
+            if client is None:
+                continue
+
+            previous = self.assignments.get(source)
+            if previous is not None and previous != account.session_name:
+                logger.info(f"Канал {source} передан от аккаунта {previous} аккаунту {account.session_name}")
+            self.assignments[source] = account.session_name
+            account.requests += 1
+
+            return account.session_name, client
+
+        logger.warning(f"Нет доступных аккаунтов Telethon для канала {source}")
+        return None, None
+
+    async def connect(self, account):
+        """Подключение клиента аккаунта (при сбое аккаунт временно исключается)"""
+        async with self.lock:
+            if account.client is not None:
+                return account.client
+
+            try:
+                client = self.client_factory(account.session_name)
+                await client.connect()
+
+                if not await client.is_user_authorized():
+                    await self.sign_in(client, account)
+
+                account.client = client
+                logger.info(f"Аккаунт {account.session_name} подключен")
+                return client
+
+            except Exception as e:
+                logger.error(f"Ошибка при подключении аккаунта {account.session_name}: {e}")
+                self.mark_unavailable(account, self.retry_interval)
+                account.failures += 1
+                return None
+
+    async def sign_in(self, client, account):
+        """Первая авторизация аккаунта по коду подтверждения"""
+        if not account.phone_number:
+            raise RuntimeError("сессия не авторизована, а телефон не указан")
+
+        logger.info(f"Попытка авторизации с номером {account.phone_number}")
+        await client.send_code_request(account.phone_number)
+        logger.info("Код подтверждения отправлен. Введите код:")
+        code = input(f"Введите код подтверждения для {account.phone_number} (например, 12345): ")
+        if not code:
+            raise RuntimeError("код подтверждения не был введен")
+
+        await client.sign_in(account.phone_number, code)
+
+    def mark_unavailable(self, account, seconds):
+        """Исключение аккаунта из распределения на seconds секунд"""
+        account.available_at = max(account.available_at, time.monotonic() + seconds)
+
+    def report_flood_wait(self, session_name, seconds):
+        """
+        Учет FloodWait: аккаунт исключается на требуемое время, его каналы переходят к другим аккаунтам
+
+        Args:
+            session_name (str): Имя сессии аккаунта
+            seconds (int): Время ожидания из FloodWaitError
+        """
+        account = self.accounts.get(session_name)
+        if account is None:
+            return
+
+        account.flood_waits += 1
+        self.mark_unavailable(account, seconds)
+        logger.warning(f"Аккаунт {session_name} получил FloodWait на {seconds} с, каналы переданы другим аккаунтам")
+
+    async def report_failure(self, session_name, error=None):
+        """
+        Учет сбоя соединения или авторизации: клиент отключается, аккаунт исключается на retry_interval
+
+        Args:
+            session_name (str): Имя сессии аккаунта
+            error (Exception): Ошибка (для журнала)
+        """
+        account = self.accounts.get(session_name)
+        if account is None:
+            return
+
+        account.failures += 1
+        self.mark_unavailable(account, self.retry_interval)
+        logger.error(f"Сбой аккаунта {session_name}: {error}. Аккаунт отключен на {self.retry_interval} с")
+
+        client, account.client = account.client, None
+        if client is not None:
+            try:
+                await client.disconnect()
+            except Exception:
+                pass
+
+    def get_load(self):
+        """
+        Нагрузка аккаунтов пула
+
+        Returns:
+            dict: Имя сессии -> {'sources', 'requests', 'flood_waits', 'failures', 'available', 'available_in'}
+        """
+        now = time.monotonic()
+        sources = {}
+        for session_name in self.assignments.values():
+            sources[session_name] = sources.get(session_name, 0) + 1
+
+        return {
+            session_name: {
+                'sources': sources.get(session_name, 0),
+                'requests': account.requests,
+                'flood_waits': account.flood_waits,
+                'failures': account.failures,
+                'available': account.is_available(now),
+                'available_in': max(0.0, account.available_at - now)
+            }
+            for session_name, account in self.accounts.items()
+        }
+
+    async def close(self):
+        """Отключение всех клиентов пула (в цикле событий, в котором они созданы)"""
+        if self.loop is not None and self.loop is not asyncio.get_running_loop():
+            # Роль all: сборщик работает в своем потоке и цикле, клиенты отключаются в нем
+            if self.loop.is_running():
+                await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self.close(), self.loop))
+                return
+
+            # Цикл уже завершен: отключать клиентов не в чем
+            for account in self.accounts.values():
+                account.client = None
+            return
+
+        for account in self.accounts.values():
+            client, account.client = account.client, None
+            if client is not None:
+                try:
+                    await client.disconnect()
+                except Exception as e:
+                    logger.error(f"Ошибка при отключении аккаунта {account.session_name}: {e}")
+
+# Пул сессий для получения сообщений из каналов
+session_pool = SessionPool()
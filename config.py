@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 import os
+import socket
 from dotenv import load_dotenv
 
 # Загрузка переменных окружения из .env файла
@@ -8,14 +9,113 @@ load_dotenv()
 # Токен Telegram бота
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 
+# Режим получения обновлений: 'polling' (long polling) или 'webhook' (HTTP-сервер aiohttp)
+BOT_MODE = os.getenv('BOT_MODE', 'polling')
+WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # Публичный адрес сервера, например https://example.com
+WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/webhook')  # Путь, на который Telegram отправляет обновления
+WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')  # Секрет из заголовка X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '0.0.0.0')  # Адрес, на котором слушает сервер
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))  # Порт сервера
+WEBHOOK_MAX_WORKERS = int(os.getenv('WEBHOOK_MAX_WORKERS', '100'))  # Максимум одновременно обрабатываемых обновлений
+
+# Хранилище состояний FSM в SQLite (общее для нескольких процессов бота)
+FSM_STATE_TTL = 24 * 60 * 60  # Время в секундах, после которого неизменявшееся состояние считается устаревшим
+
 # API ID и API Hash для Telethon (для работы с каналами)
 API_ID = os.getenv('API_ID')
 API_HASH = os.getenv('API_HASH')
+TELEGRAM_API_CONCURRENCY = 5  # Максимум одновременных запросов к Telegram API
+TELEGRAM_API_MIN_INTERVAL = 0.2  # Минимальный интервал между запросами к Telegram API в секундах
+
+# Пул пользовательских сессий Telethon для получения сообщений из каналов
+# (список "имя_сессии:телефон" через запятую; каналы распределяются между аккаунтами)
+TELETHON_SESSIONS = [
+    session.strip() for session in os.getenv('TELETHON_SESSIONS', 'user_session:+79996559005').split(',')
+    if session.strip()
+]
+SESSION_POOL_VIRTUAL_NODES = 100  # Количество точек каждого аккаунта на кольце консистентного хэширования
+ACCOUNT_RETRY_INTERVAL = 5 * 60  # Время в секундах, на которое отключается аккаунт после сбоя соединения или авторизации
 
 # Настройки базы данных
 DATABASE_NAME = 'telegram_summarizer.db'
+STREAM_CHUNK_SIZE = 1000  # Количество строк, читаемых за один раз при потоковом чтении больших выборок
+DATABASE_BUSY_TIMEOUT = 30  # Время ожидания блокировки базы данных другим процессом в секундах
+
+# Разделение на процессы по ролям (main.py --role) и очереди задач в SQLite
+WORKER_ID = os.getenv('WORKER_ID') or f"{socket.gethostname()}:{os.getpid()}"  # Имя процесса-владельца аренды
+QUEUE_VISIBILITY_TIMEOUT = 10 * 60  # Время аренды задачи в секундах; незавершенная задача затем выдается снова
+QUEUE_MAX_ATTEMPTS = 5  # Количество попыток, после которого задача переносится в очередь недоставленных
+QUEUE_RETRY_DELAY = 60  # Задержка в секундах перед повторной выдачей задачи после ошибки
+FETCH_INTERVAL = 60  # Период обновления каналов в секундах
+FETCH_LEASE_TIMEOUT = 10 * 60  # Время аренды канала сборщиком в секундах
+SUMMARIZATION_MESSAGE_LIMIT = 100  # Количество сообщений, суммаризируемых за один цикл
+DELIVERY_BATCH_SIZE = 50  # Количество суммаризаций, отправляемых за один проход
+DELIVERY_POLL_INTERVAL = 10  # Период проверки очереди доставки в секундах
+
+# Хранение и очистка устаревших данных (выполняется одним процессом роли all или summarizer)
+RETENTION_ENABLED = True  # Периодически удалять устаревшие данные и освобождать место в базе
+RETENTION_INTERVAL = 24 * 60 * 60  # Период очистки в секундах
+MESSAGE_RETENTION_DAYS = 30  # Срок хранения обработанных сообщений (вместе с медиафайлами, сигнатурами и токенами)
+SUMMARY_RETENTION_DAYS = 90  # Срок хранения доставленных суммаризаций
+SUMMARY_CACHE_RETENTION_DAYS = 30  # Срок хранения записей кэша суммаризаций
+DEAD_TASK_RETENTION_DAYS = 30  # Срок хранения задач из очереди недоставленных
+RETENTION_BATCH_SIZE = 500  # Количество строк, удаляемых в одной транзакции
+RETENTION_BATCH_PAUSE = 0.1  # Пауза между пакетами в секундах (чтобы не задерживать запись новых сообщений)
+RETENTION_ORPHAN_FILE_AGE = 60 * 60  # Минимальный возраст файла без записи в базе в секундах (файл мог только что скачаться)
+RETENTION_VACUUM_PAGES = 1000  # Количество страниц, освобождаемых за один шаг инкрементальной очистки
+
+# Локальный каталог с данными NLTK (punkt, stopwords); загрузка из сети не выполняется
+NLTK_DATA_DIR = os.getenv('NLTK_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nltk_data'))
 
 # Настройки суммаризации
 SUMMARIZATION_INTERVAL = 60 * 60  # 1 час в секундах
 SIMILARITY_THRESHOLD = 0.7  # Порог сходства для определения похожего контента
+SIMILARITY_BLOCK_SIZE = 1000  # Количество строк в блоке при вычислении попарного сходства
+
+# Бэкенд сходства для дедупликации: 'tfidf' или 'hashing' (локальные эмбеддинги символьных n-грамм)
+SIMILARITY_BACKEND = 'tfidf'
+EMBEDDING_DIM = 512  # Размерность эмбеддингов
+EMBEDDING_NGRAM_RANGE = (3, 5)  # Длины символьных n-грамм
+EMBEDDING_BATCH_SIZE = 256  # Количество текстов в пакете при вычислении эмбеддингов
+EMBEDDING_SIMILARITY_THRESHOLD = 0.8  # Порог сходства для бэкенда эмбеддингов
+ANN_TABLES = 20  # Количество таблиц приближенного индекса ближайших соседей
+ANN_BITS = 8  # Количество гиперплоскостей (бит кода) в таблице
+ANN_MIN_MESSAGES = 5000  # Минимальный размер пакета, с которого используется приближенный индекс
+
+# Онлайн-кластеризация сообщений при получении (группы формируются до суммаризации по расписанию)
+ONLINE_CLUSTERING_ENABLED = True
+CLUSTER_SUMMARY_REFRESH_INTERVAL = 5 * 60  # Период обновления суммаризаций открытых кластеров для /summarize в секундах
+
+# Настройки векторизатора
+VECTORIZER_N_FEATURES = 2 ** 18  # Размер хэшированного пространства терминов
+VECTORIZER_REFRESH_INTERVAL = 5 * 60  # Период обновления документных частот из базы данных в секундах
+
+# Настройки индекса почти-дубликатов (MinHash/LSH)
+LSH_ENABLED = True  # Использовать индекс LSH для отбора пар-кандидатов перед точным сравнением
+MINHASH_SHINGLE_SIZE = 5  # Длина символьного шингла
+LSH_BANDS = 20  # Количество полос
+LSH_ROWS_PER_BAND = 3  # Количество хэшей в полосе
+
+# Дедупликация относительно уже доставленных суммаризаций
+CROSS_BATCH_DEDUP_MODE = 'attach'  # 'off' - отключена, 'suppress' - не отправлять повтор, 'attach' - привязать к доставленной суммаризации
+DEDUP_WINDOW_HOURS = 24  # Размер скользящего окна в часах
+WINDOW_SIMILARITY_THRESHOLD = 0.5  # Порог оценки сходства Жаккара для повторов
 MAX_IMAGES_PER_POST = 2  # Максимальное количество изображений в посте
+
+# Получение сообщений из каналов
+FETCH_PAGE_SIZE = 100  # Количество сообщений в странице; курсор канала сохраняется после каждой страницы
+NEW_CHANNEL_BACKFILL_LIMIT = 100  # Глубина загрузки истории для нового канала (сообщений)
+
+# Кэш метаданных каналов (название, число подписчиков, описание)
+CHANNEL_METADATA_TTL = 24 * 60 * 60  # Время в секундах, после которого метаданные обновляются в фоне
+
+# Массовый импорт каналов (/import_channels)
+BULK_IMPORT_MAX_LINKS = 200  # Максимальное количество ссылок в одном импорте
+BULK_IMPORT_MAX_FILE_SIZE = 64 * 1024  # Максимальный размер текстового файла со ссылками в байтах
+
+# Настройки пула рабочих процессов для суммаризации
+SUMMARIZER_WORKERS = max(1, (os.cpu_count() or 2) - 1)  # Количество рабочих процессов
+SUMMARIZATION_BATCH_SIZE = 20  # Количество групп, передаваемых в рабочий процесс за один раз
+SUMMARY_CACHE_SIZE = 1000  # Количество суммаризаций, хранимых в памяти (LRU)
+SUMMARIZATION_FAN_IN = 10  # Количество суммаризаций, объединяемых на каждом уровне иерархии
+HIERARCHICAL_SUMMARIZATION_THRESHOLD = 20  # Группы с большим числом сообщений суммаризируются иерархически
@@ -1,13 +1,34 @@
 # -*- coding: utf-8 -*-
 import sqlite3
 import json
-from config import DATABASE_NAME
+import time
+from config import (
+    DATABASE_NAME, STREAM_CHUNK_SIZE, DATABASE_BUSY_TIMEOUT, QUEUE_MAX_ATTEMPTS, QUEUE_RETRY_DELAY
+)
+from message_batch import MessageBatch
+
+# Максимальное количество параметров в одном запросе (ограничение SQLite)
+MAX_QUERY_PARAMETERS = 900
+
+def chunked(values, size=MAX_QUERY_PARAMETERS):
+    """Разбиение списка значений на части для запросов с IN (...)"""
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
 
 def init_db():
     """Инициализация базы данных и создание необходимых таблиц"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
     cursor = conn.cursor()
     
+    # Инкрементальная очистка свободных страниц после удаления устаревших данных
+    # (действует для новой базы; существующая переводится в этот режим отдельной командой
+    # python retention.py --enable-incremental-vacuum при остановленных процессах)
+    cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    
+    # Журнал WAL: потоковое чтение не блокирует запись новых сообщений
+    cursor.execute('PRAGMA journal_mode=WAL')
+    
     # Таблица пользователей
     cursor.execute('''
     CREATE TABLE IF NOT EXISTS users (
@@ -42,9 +63,21 @@ def init_db():
         processed BOOLEAN DEFAULT FALSE,
         vector_representation TEXT,  -- Сохраняем векторное представление как JSON
         created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        telegram_message_id INTEGER,  -- ID сообщения в канале Telegram
         FOREIGN KEY (channel_id) REFERENCES channels (channel_id)
     )
     ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_messages_channel ON messages (channel_id)')
+    
+    # В существующих базах столбца ID сообщения Telegram нет (у старых сообщений он остается NULL)
+    cursor.execute('PRAGMA table_info(messages)')
+    if 'telegram_message_id' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE messages ADD COLUMN telegram_message_id INTEGER')
+    
+    # Сообщение канала сохраняется один раз, даже если страница была получена повторно
+    cursor.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_telegram ON messages (channel_id, telegram_message_id)
+    ''')
     
     # Таблица медиафайлов
     cursor.execute('''
@@ -58,6 +91,7 @@ def init_db():
         FOREIGN KEY (message_id) REFERENCES messages (message_id)
     )
     ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_media_message ON media (message_id)')
     
     # Таблица суммаризаций
     cursor.execute('''
@@ -71,14 +105,216 @@ def init_db():
         FOREIGN KEY (user_id) REFERENCES users (user_id)
     )
     ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_summaries_user ON summaries (user_id, created_at)')
+    
+    # Кэш суммаризаций (ключ - хэш нормализованных текстов группы и параметров)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS summary_cache (
+        cache_key TEXT PRIMARY KEY,
+        summary_text TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    
+    # Сигнатуры MinHash сообщений
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS message_signatures (
+        message_id INTEGER PRIMARY KEY,
+        signature BLOB,
+        FOREIGN KEY (message_id) REFERENCES messages (message_id)
+    )
+    ''')
+    
+    # Индекс LSH: корзины полос сигнатур MinHash (поиск почти-дубликатов среди
+    # сообщений прошлых пакетов без перебора сигнатур)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS lsh_buckets (
+        band INTEGER,
+        bucket INTEGER,
+        message_id INTEGER,
+        FOREIGN KEY (message_id) REFERENCES messages (message_id)
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_lsh_buckets ON lsh_buckets (band, bucket)')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_lsh_buckets_message ON lsh_buckets (message_id, band)')
+    
+    # Результаты предобработки сообщений (массивы uint32 в BLOB)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS message_tokens (
+        message_id INTEGER PRIMARY KEY,
+        language TEXT,
+        clean_text TEXT,
+        sentence_spans BLOB,  -- Пары смещений (начало, конец) предложений в clean_text
+        token_ids BLOB,  -- Номера терминов всех предложений подряд
+        token_offsets BLOB,  -- Границы терминов каждого предложения в token_ids
+        FOREIGN KEY (message_id) REFERENCES messages (message_id)
+    )
+    ''')
+    
+    # Документные частоты терминов векторизатора (хэшированное пространство)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS document_frequencies (
+        term_id INTEGER PRIMARY KEY,
+        document_count INTEGER DEFAULT 0
+    )
+    ''')
+    
+    # Состояние векторизатора (общее количество документов)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS vectorizer_state (
+        key TEXT PRIMARY KEY,
+        value INTEGER
+    )
+    ''')
+    
+    # Онлайн-кластеры сообщений
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS clusters (
+        cluster_id INTEGER PRIMARY KEY,
+        centroid TEXT,  -- JSON: сумма векторов участников в разреженном виде
+        size INTEGER DEFAULT 1,
+        status TEXT DEFAULT 'open',  -- open, closed
+        revision INTEGER DEFAULT 0,  -- Номер последнего изменения (общий счетчик для всех кластеров)
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_clusters_status ON clusters (status)')
+    
+    # В существующих базах номера изменений нет: процессы перечитают кластеры при запуске
+    cursor.execute('PRAGMA table_info(clusters)')
+    if 'revision' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE clusters ADD COLUMN revision INTEGER DEFAULT 0')
+    
+    # По номеру изменения процессы-сборщики получают кластеры, измененные другими процессами
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_clusters_revision ON clusters (revision)')
+    
+    # Участники онлайн-кластеров
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS cluster_members (
+        message_id INTEGER PRIMARY KEY,
+        cluster_id INTEGER,
+        FOREIGN KEY (message_id) REFERENCES messages (message_id),
+        FOREIGN KEY (cluster_id) REFERENCES clusters (cluster_id)
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_cluster_members_cluster ON cluster_members (cluster_id)')
+    
+    # Предварительно вычисленные суммаризации открытых кластеров (для команды /summarize)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS cluster_summaries (
+        cluster_id INTEGER PRIMARY KEY,
+        summary_text TEXT,
+        message_count INTEGER,  -- Размер кластера на момент суммаризации
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (cluster_id) REFERENCES clusters (cluster_id)
+    )
+    ''')
+    
+    # Кэш метаданных каналов из Telegram (источник - username в нижнем регистре)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS channel_metadata (
+        source TEXT PRIMARY KEY,
+        telegram_id INTEGER,
+        title TEXT,
+        participants_count INTEGER,
+        about TEXT,
+        updated_at REAL  -- unix time получения из Telegram
+    )
+    ''')
+    
+    # Состояния и данные FSM бота (ключ - bot_id:chat_id:user_id:thread_id:destiny)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS fsm_storage (
+        storage_key TEXT PRIMARY KEY,
+        state TEXT,
+        data TEXT,  -- JSON
+        updated_at REAL  -- unix time последнего изменения
+    )
+    ''')
+    
+    # Очереди задач конвейера: суммаризация сообщений и доставка суммаризаций
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'work_queue'")
+    queue_exists = cursor.fetchone() is not None
+    
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS work_queue (
+        task_id INTEGER PRIMARY KEY,
+        queue TEXT,
+        payload TEXT,  -- JSON
+        lease_owner TEXT,
+        lease_expires_at REAL,  -- unix time окончания аренды (NULL - задача свободна)
+        attempts INTEGER DEFAULT 0,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_work_queue ON work_queue (queue, lease_expires_at)')
+    
+    # Сообщения, полученные до появления очереди, ставятся в очередь суммаризации
+    if not queue_exists:
+        cursor.execute('''
+        INSERT INTO work_queue (queue, payload)
+        SELECT 'summarize', message_id FROM messages WHERE processed = FALSE ORDER BY message_id
+        ''')
+    
+    # Задачи, которые не удалось выполнить за допустимое число попыток
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS work_queue_dead (
+        task_id INTEGER PRIMARY KEY,
+        queue TEXT,
+        payload TEXT,  -- JSON
+        attempts INTEGER,
+        error TEXT,
+        failed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    
+    # Именованные аренды (канал у сборщика, периодические задачи у одного процесса)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS leases (
+        name TEXT PRIMARY KEY,
+        owner TEXT,
+        expires_at REAL  -- unix time окончания аренды
+    )
+    ''')
     
     conn.commit()
     conn.close()
 
+# Функции потокового чтения: большие выборки читаются частями через отдельное соединение
+def get_read_connection():
+    """Отдельное соединение только для чтения"""
+    return sqlite3.connect(f'file:{DATABASE_NAME}?mode=ro', uri=True, timeout=DATABASE_BUSY_TIMEOUT)
+
+def iter_rows(query, params=(), chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Потоковое чтение результата запроса
+
+    Args:
+        query (str): SQL-запрос
+        params (tuple): Параметры запроса
+        chunk_size (int): Количество строк в одной части
+
+    Yields:
+        list: Очередная часть строк (не более chunk_size)
+    """
+    conn = get_read_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
 # Функции для работы с пользователями
 def add_user(user_id, username=None, first_name=None, last_name=None):
     """Добавление нового пользователя или обновление существующего"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -91,7 +327,7 @@ def add_user(user_id, username=None, first_name=None, last_name=None):
 
 def get_user(user_id):
     """Получение информации о пользователе"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
     cursor = conn.cursor()
     
     cursor.execute('SELECT * FROM users WHERE user_id = ?', (user_id,))
@@ -112,7 +348,7 @@ def get_user(user_id):
 # Функции для работы с каналами
 def add_channel(user_id, channel_name, channel_url):
     """Добавление нового канала для отслеживания"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -127,9 +363,43 @@ def add_channel(user_id, channel_name, channel_url):
     
     return channel_id
 
+def add_channels(user_id, channels):
+    """
+    Добавление нескольких каналов пользователя в одной транзакции
+
+    Args:
+        user_id (int): ID пользователя
+        channels (list): Пары (название канала, username канала)
+
+    Returns:
+        list: ID добавленных каналов
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    channel_ids = []
+    try:
+        for channel_name, channel_url in channels:
+            cursor.execute('''
+            INSERT INTO channels (user_id, channel_name, channel_url)
+            VALUES (?, ?, ?)
+            ''', (user_id, channel_name, channel_url))
+            channel_ids.append(cursor.lastrowid)
+        
+        conn.commit()
+    
+    except Exception:
+        conn.rollback()
+        raise
+    
+    finally:
+        conn.close()
+    
+    return channel_ids
+
 def get_channels(user_id):
     """Получение списка каналов пользователя"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
     cursor = conn.cursor()
     
     if user_id is None:
@@ -153,9 +423,55 @@ def get_channels(user_id):
     
     return result
 
+def get_channel_by_id(channel_id):
+    """Получение канала по ID"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT * FROM channels WHERE channel_id = ?', (channel_id,))
+    channel = cursor.fetchone()
+    
+    conn.close()
+    
+    if not channel:
+        return None
+    
+    return {
+        'channel_id': channel[0],
+        'user_id': channel[1],
+        'channel_name': channel[2],
+        'channel_url': channel[3],
+        'last_checked_message_id': channel[4],
+        'created_at': channel[5]
+    }
+
+def get_channel_users(channel_ids):
+    """
+    Получение пользователей, отслеживающих каналы, одним запросом
+
+    Returns:
+        dict: ID канала -> ID пользователя
+    """
+    if not channel_ids:
+        return {}
+    
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    # Большие списки разбиваются на части из-за ограничения SQLite на число параметров
+    rows = []
+    for chunk in chunked(channel_ids):
+        placeholders = ', '.join(['?'] * len(chunk))
+        cursor.execute(f'SELECT channel_id, user_id FROM channels WHERE channel_id IN ({placeholders})', chunk)
+        rows.extend(cursor.fetchall())
+    
+    conn.close()
+    
+    return dict(rows)
+
 def remove_channel(channel_id):
     """Удаление канала из отслеживаемых"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
     cursor = conn.cursor()
     
     cursor.execute('DELETE FROM channels WHERE channel_id = ?', (channel_id,))
@@ -165,7 +481,7 @@ def remove_channel(channel_id):
 
 def update_last_checked_message_id(channel_id, message_id):
     """Обновление ID последнего проверенного сообщения"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
     cursor = conn.cursor()
     
     cursor.execute('''
@@ -176,45 +492,86 @@ def update_last_checked_message_id(channel_id, message_id):
     conn.commit()
     conn.close()
 
-# Функции для работы с сообщениями
+def complete_fetch_page(channel_id, message_ids, last_message_id):
+    """
+    Завершение страницы сборщика: постановка сообщений в очередь суммаризации
+    и продвижение курсора канала в одной транзакции
 
-def get_messages_last_hour():
-    """Получение сообщений за последний час"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    Args:
+        channel_id (int): ID канала
+        message_ids (list): ID сохраненных сообщений страницы
+        last_message_id (int): ID последнего сообщения страницы в Telegram
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
     cursor = conn.cursor()
     
-    cursor.execute('''
-    SELECT * FROM messages
-    WHERE message_date >= datetime('now', '-1 hour')
-    ORDER BY message_date ASC
-    ''')
+    try:
+        cursor.executemany(
+            'INSERT INTO work_queue (queue, payload) VALUES (?, ?)',
+            [('summarize', json.dumps(message_id)) for message_id in message_ids]
+        )
+        cursor.execute('''
+        UPDATE channels SET last_checked_message_id = ?
+        WHERE channel_id = ?
+        ''', (last_message_id, channel_id))
+        
+        conn.commit()
+    
+    except Exception:
+        conn.rollback()
+        raise
+    
+    finally:
+        conn.close()
+
+# Функции для работы с кэшем метаданных каналов
+def get_channel_metadata(source):
+    """Получение сохраненных метаданных канала"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'SELECT telegram_id, title, participants_count, about, updated_at FROM channel_metadata WHERE source = ?',
+        (source,)
+    )
+    row = cursor.fetchone()
     
-    messages = cursor.fetchall()
     conn.close()
     
-    result = []
-    for message in messages:
-        vector = None
-        if message[5]:  # vector_representation
-            try:
-                vector = json.loads(message[5])
-            except:
-                pass
-                
-        result.append({
-            'message_id': message[0],
-            'channel_id': message[1],
-            'message_text': message[2],
-            'message_date': message[3],
-            'processed': bool(message[4]),
-            'vector_representation': vector,
-            'created_at': message[6]
-        })
+    if not row:
+        return None
     
-    return result
-def add_message(channel_id, message_text, message_date, vector_representation=None):
-    """Добавление нового сообщения из канала"""
-    conn = sqlite3.connect(DATABASE_NAME)
+    return {
+        'id': row[0],
+        'title': row[1],
+        'participants_count': row[2],
+        'about': row[3],
+        'updated_at': row[4]
+    }
+
+def set_channel_metadata(source, telegram_id, title, participants_count, about, updated_at):
+    """Сохранение метаданных канала"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    INSERT OR REPLACE INTO channel_metadata (source, telegram_id, title, participants_count, about, updated_at)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', (source, telegram_id, title, participants_count, about, updated_at))
+    
+    conn.commit()
+    conn.close()
+
+# Функции для работы с сообщениями
+
+def add_message(channel_id, message_text, message_date, vector_representation=None, telegram_message_id=None):
+    """
+    Добавление нового сообщения из канала
+
+    Returns:
+        int: ID сообщения или None, если сообщение канала с таким telegram_message_id уже сохранено
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
     cursor = conn.cursor()
     
     vector_json = None
@@ -222,164 +579,1398 @@ def add_message(channel_id, message_text, message_date, vector_representation=No
         vector_json = json.dumps(vector_representation.tolist() if hasattr(vector_representation, 'tolist') else vector_representation)
     
     cursor.execute('''
-    INSERT INTO messages (channel_id, message_text, message_date, vector_representation)
-    VALUES (?, ?, ?, ?)
-    ''', (channel_id, message_text, message_date, vector_json))
+    INSERT OR IGNORE INTO messages (channel_id, message_text, message_date, vector_representation, telegram_message_id)
+    VALUES (?, ?, ?, ?, ?)
+    ''', (channel_id, message_text, message_date, vector_json, telegram_message_id))
     
-    message_id = cursor.lastrowid
+    message_id = cursor.lastrowid if cursor.rowcount else None
     
     conn.commit()
     conn.close()
     
     return message_id
 
-def get_unprocessed_messages(limit=100):
-    """Получение необработанных сообщений для суммаризации"""
-    conn = sqlite3.connect(DATABASE_NAME)
+def get_message_id(channel_id, telegram_message_id):
+    """Получение ID сохраненного сообщения канала по ID сообщения в Telegram"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
     cursor = conn.cursor()
     
-    cursor.execute('''
-    SELECT * FROM messages 
-    WHERE processed = FALSE
-    ORDER BY message_date ASC
-    LIMIT ?
-    ''', (limit,))
+    cursor.execute(
+        'SELECT message_id FROM messages WHERE channel_id = ? AND telegram_message_id = ?',
+        (channel_id, telegram_message_id)
+    )
+    row = cursor.fetchone()
+    
+    conn.close()
+    
+    return row[0] if row else None
+
+def get_messages_by_ids(message_ids):
+    """
+    Получение сообщений по списку ID одним пакетным запросом
+
+    Returns:
+        dict: ID сообщения -> сообщение
+    """
+    if not message_ids:
+        return {}
+    
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
     
-    messages = cursor.fetchall()
+    # Большие списки разбиваются на части из-за ограничения SQLite на число параметров
+    rows = []
+    for chunk in chunked(message_ids):
+        placeholders = ', '.join(['?'] * len(chunk))
+        cursor.execute(f'''
+        SELECT message_id, channel_id, message_text, message_date FROM messages
+        WHERE message_id IN ({placeholders})
+        ''', chunk)
+        rows.extend(cursor.fetchall())
     
     conn.close()
     
-    result = []
-    for message in messages:
-        vector = None
-        if message[5]:  # vector_representation
-            try:
-                vector = json.loads(message[5])
-            except:
-                pass
-                
-        result.append({
-            'message_id': message[0],
-            'channel_id': message[1],
-            'message_text': message[2],
-            'message_date': message[3],
-            'processed': bool(message[4]),
-            'vector_representation': vector,
-            'created_at': message[6]
-        })
+    result = {}
+    for row in rows:
+        result[row[0]] = {
+            'message_id': row[0],
+            'channel_id': row[1],
+            'message_text': row[2],
+            'message_date': row[3]
+        }
     
     return result
 
-def mark_messages_as_processed(message_ids):
-    """Отметка сообщений как обработанных"""
-    if not message_ids:
+def get_batch_by_ids(message_ids):
+    """
+    Получение необработанных сообщений по ID в виде колоночного пакета
+
+    Returns:
+        MessageBatch: Пакет сообщений в порядке даты (отсутствующие и уже
+            обработанные ID пропускаются)
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    rows = []
+    for chunk in chunked(message_ids):
+        placeholders = ','.join('?' for _ in chunk)
+        cursor.execute(f'''
+        SELECT message_id, channel_id, CAST(strftime('%s', message_date) AS INTEGER), message_text, vector_representation
+        FROM messages
+        WHERE message_id IN ({placeholders}) AND processed = FALSE
+        ''', chunk)
+        rows.extend(cursor.fetchall())
+    
+    conn.close()
+    
+    rows.sort(key=lambda row: (row[2] or 0, row[0]))
+    
+    return MessageBatch.from_rows(rows)
+
+# Функции для работы с индексом почти-дубликатов (MinHash/LSH)
+def add_message_signature(message_id, signature, buckets):
+    """Сохранение сигнатуры MinHash сообщения и его корзин LSH (повторный вызов ничего не меняет)"""
+    add_message_signatures([(message_id, signature, buckets)])
+
+def add_message_signatures(signatures):
+    """
+    Сохранение сигнатур MinHash и корзин LSH нескольких сообщений одной транзакцией
+
+    Args:
+        signatures (list): Кортежи (ID сообщения, сигнатура в BLOB, пары (полоса, корзина))
+    """
+    if not signatures:
         return
-        
-    conn = sqlite3.connect(DATABASE_NAME)
+    
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
     cursor = conn.cursor()
     
-    placeholders = ', '.join(['?'] * len(message_ids))
-    cursor.execute(f'''
-    UPDATE messages SET processed = TRUE
-    WHERE message_id IN ({placeholders})
-    ''', message_ids)
+    cursor.executemany('''
+    INSERT OR REPLACE INTO message_signatures (message_id, signature)
+    VALUES (?, ?)
+    ''', [(message_id, signature) for message_id, signature, buckets in signatures])
+    
+    cursor.executemany('''
+    INSERT OR REPLACE INTO lsh_buckets (band, bucket, message_id)
+    VALUES (?, ?, ?)
+    ''', [
+        (band, bucket, message_id)
+        for message_id, signature, buckets in signatures for band, bucket in buckets
+    ])
     
     conn.commit()
     conn.close()
 
-# Функции для работы с медиафайлами
-def add_media(message_id, media_type, media_url, local_path=None):
-    """Добавление медиафайла, связанного с сообщением"""
-    conn = sqlite3.connect(DATABASE_NAME)
+def get_message_signatures(message_ids):
+    """Получение сигнатур MinHash для списка сообщений"""
+    if not message_ids:
+        return {}
+    
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
     cursor = conn.cursor()
     
-    cursor.execute('''
-    INSERT INTO media (message_id, media_type, media_url, local_path)
-    VALUES (?, ?, ?, ?)
-    ''', (message_id, media_type, media_url, local_path))
+    # Большие списки разбиваются на части из-за ограничения SQLite на число параметров
+    rows = []
+    for chunk in chunked(message_ids):
+        placeholders = ', '.join(['?'] * len(chunk))
+        cursor.execute(f'''
+        SELECT message_id, signature FROM message_signatures
+        WHERE message_id IN ({placeholders})
+        ''', chunk)
+        rows.extend(cursor.fetchall())
     
-    media_id = cursor.lastrowid
+    conn.close()
+    
+    return {row[0]: row[1] for row in rows}
+
+def find_lsh_candidates(buckets):
+    """
+    Поиск сообщений, попавших хотя бы в одну из корзин LSH
+
+    Args:
+        buckets: Пары (номер полосы, хэш корзины)
+
+    Returns:
+        set: ID сообщений
+    """
+    buckets = list(set(buckets))
+    if not buckets:
+        return set()
+    
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    # Каждая корзина занимает два параметра запроса; соединение со списком корзин
+    # (а не IN по паре столбцов) ищет по индексу idx_lsh_buckets
+    message_ids = set()
+    for chunk in chunked(buckets, MAX_QUERY_PARAMETERS // 2):
+        placeholders = ', '.join(['(?, ?)'] * len(chunk))
+        cursor.execute(f'''
+        SELECT DISTINCT l.message_id FROM (VALUES {placeholders}) AS q
+        JOIN lsh_buckets l ON l.band = q.column1 AND l.bucket = q.column2
+        ''', [value for bucket in chunk for value in bucket])
+        message_ids.update(row[0] for row in cursor.fetchall())
     
-    conn.commit()
     conn.close()
     
-    return media_id
+    return message_ids
 
-def get_media_for_message(message_id):
-    """Получение медиафайлов для сообщения"""
-    conn = sqlite3.connect(DATABASE_NAME)
+# Функции для работы с результатами предобработки сообщений
+def add_message_tokens(message_id, language, clean_text, sentence_spans, token_ids, token_offsets):
+    """Сохранение очищенного текста, границ предложений и номеров терминов сообщения"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
     cursor = conn.cursor()
     
-    cursor.execute('SELECT * FROM media WHERE message_id = ?', (message_id,))
-    media_files = cursor.fetchall()
+    cursor.execute('''
+    INSERT OR REPLACE INTO message_tokens
+    (message_id, language, clean_text, sentence_spans, token_ids, token_offsets)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ''', (message_id, language, clean_text, sentence_spans, token_ids, token_offsets))
     
+    conn.commit()
     conn.close()
+
+def get_message_tokens(message_ids):
+    """Получение результатов предобработки для списка сообщений"""
+    if not message_ids:
+        return {}
     
-    result = []
-    for media in media_files:
-        result.append({
-            'media_id': media[0],
-            'message_id': media[1],
-            'media_type': media[2],
-            'media_url': media[3],
-            'local_path': media[4],
-            'created_at': media[5]
-        })
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    # Большие списки разбиваются на части из-за ограничения SQLite на число параметров
+    rows = []
+    for chunk in chunked(message_ids):
+        placeholders = ', '.join(['?'] * len(chunk))
+        cursor.execute(f'''
+        SELECT message_id, language, clean_text, sentence_spans, token_ids, token_offsets
+        FROM message_tokens
+        WHERE message_id IN ({placeholders})
+        ''', chunk)
+        rows.extend(cursor.fetchall())
+    
+    conn.close()
+    
+    result = {}
+    for row in rows:
+        result[row[0]] = {
+            'message_id': row[0],
+            'language': row[1],
+            'clean_text': row[2],
+            'sentence_spans': row[3],
+            'token_ids': row[4],
+            'token_offsets': row[5]
+        }
     
     return result
 
-# Функции для работы с суммаризациями
-def add_summary(user_id, summary_text, source_messages, media_files=None):
-    """Добавление новой суммаризации"""
-    conn = sqlite3.connect(DATABASE_NAME)
+# Функции для работы с документными частотами векторизатора
+def update_document_frequencies(term_ids):
+    """Учет одного нового документа: увеличение частот его терминов и счетчика документов"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
     cursor = conn.cursor()
     
-    source_messages_json = json.dumps(source_messages)
-    media_files_json = json.dumps(media_files) if media_files else None
+    cursor.executemany('''
+    INSERT INTO document_frequencies (term_id, document_count) VALUES (?, 1)
+    ON CONFLICT (term_id) DO UPDATE SET document_count = document_count + 1
+    ''', [(term_id,) for term_id in term_ids])
     
     cursor.execute('''
-    INSERT INTO summaries (user_id, summary_text, source_messages, media_files)
-    VALUES (?, ?, ?, ?)
-    ''', (user_id, summary_text, source_messages_json, media_files_json))
-    
-    summary_id = cursor.lastrowid
+    INSERT INTO vectorizer_state (key, value) VALUES ('documents', 1)
+    ON CONFLICT (key) DO UPDATE SET value = value + 1
+    ''')
     
     conn.commit()
     conn.close()
+
+def get_document_frequencies():
+    """Получение количества документов и документных частот терминов"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT value FROM vectorizer_state WHERE key = 'documents'")
+    row = cursor.fetchone()
+    
+    cursor.execute('SELECT term_id, document_count FROM document_frequencies')
+    frequencies = cursor.fetchall()
+    
+    conn.close()
     
-    return summary_id
+    return (row[0] if row else 0), dict(frequencies)
 
-def get_recent_summaries(user_id, limit=10):
-    """Получение последних суммаризаций для пользователя"""
-    conn = sqlite3.connect(DATABASE_NAME)
+# Функции для работы с онлайн-кластерами
+
+# Каждое изменение кластера получает следующий номер общего счетчика (revision),
+# по нему процессы-сборщики узнают о кластерах, созданных, дополненных или
+# закрытых другими процессами
+NEXT_CLUSTER_REVISION = '(SELECT COALESCE(MAX(revision), 0) + 1 FROM clusters)'
+
+def create_cluster(message_id, centroid, revision):
+    """
+    Создание открытого кластера из одного сообщения
+
+    Кластер создается, только если кластеры не изменялись после revision: иначе
+    другой процесс мог создать или дополнить подходящий кластер.
+
+    Args:
+        message_id (int): ID сообщения
+        centroid (str): Центроид в формате JSON
+        revision (int): Номер изменения, по которому выбирался кластер
+
+    Returns:
+        tuple: (ID кластера, номер изменения) или None, если кластеры изменились
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
     cursor = conn.cursor()
     
     cursor.execute('''
-    SELECT * FROM summaries 
-    WHERE user_id = ?
-    ORDER BY created_at DESC
-    LIMIT ?
-    ''', (user_id, limit))
+    INSERT INTO clusters (centroid, revision)
+    SELECT ?, COALESCE(MAX(revision), 0) + 1 FROM clusters
+    HAVING COALESCE(MAX(revision), 0) = ?
+    RETURNING cluster_id, revision
+    ''', (centroid, revision))
+    row = cursor.fetchone()
     
-    summaries = cursor.fetchall()
+    if row:
+        cursor.execute('''
+        INSERT OR REPLACE INTO cluster_members (message_id, cluster_id)
+        VALUES (?, ?)
+        ''', (message_id, row[0]))
     
+    conn.commit()
     conn.close()
     
-    result = []
-    for summary in summaries:
-        source_messages = json.loads(summary[3]) if summary[3] else []
-        media_files = json.loads(summary[4]) if summary[4] else []
-        
-        result.append({
-            'summary_id': summary[0],
-            'user_id': summary[1],
-            'summary_text': summary[2],
-            'source_messages': source_messages,
-            'media_files': media_files,
-            'created_at': summary[5]
-        })
+    return row
+
+def add_message_to_cluster(cluster_id, message_id, centroid, size, revision):
+    """
+    Добавление сообщения в кластер с обновлением центроида
+
+    Кластер обновляется, только если он открыт и не изменялся после revision:
+    иначе центроид вычислен по устаревшему состоянию (кластер дополнил или
+    закрыл другой процесс) и сообщение не добавляется.
+
+    Args:
+        cluster_id (int): ID кластера
+        message_id (int): ID сообщения
+        centroid (str): Новый центроид в формате JSON
+        size (int): Новый размер кластера
+        revision (int): Номер изменения, по которому вычислен центроид
+
+    Returns:
+        int: Новый номер изменения или None, если кластер закрыт или изменен
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
     
-    return result
+    cursor.execute(f'''
+    UPDATE clusters SET centroid = ?, size = ?, revision = {NEXT_CLUSTER_REVISION}, updated_at = CURRENT_TIMESTAMP
+    WHERE cluster_id = ? AND status = 'open' AND revision = ?
+    RETURNING revision
+    ''', (centroid, size, cluster_id, revision))
+    row = cursor.fetchone()
+    
+    if row:
+        cursor.execute('''
+        INSERT OR REPLACE INTO cluster_members (message_id, cluster_id)
+        VALUES (?, ?)
+        ''', (message_id, cluster_id))
+    
+    conn.commit()
+    conn.close()
+    
+    return row[0] if row else None
+
+def get_open_clusters():
+    """Получение открытых кластеров"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT cluster_id, centroid, size, revision FROM clusters WHERE status = 'open'")
+    clusters = cursor.fetchall()
+    
+    conn.close()
+    
+    result = []
+    for cluster in clusters:
+        result.append({
+            'cluster_id': cluster[0],
+            'centroid': json.loads(cluster[1]) if cluster[1] else {'indices': [], 'values': []},
+            'size': cluster[2],
+            'revision': cluster[3]
+        })
+    
+    return result
+
+def get_cluster_revision():
+    """Получение номера последнего изменения кластеров"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT COALESCE(MAX(revision), 0) FROM clusters')
+    revision = cursor.fetchone()[0]
+    
+    conn.close()
+    
+    return revision
+
+def get_changed_clusters(revision):
+    """
+    Получение кластеров, измененных после номера изменения revision
+
+    Returns:
+        list: Кластеры (cluster_id, status, centroid, size, revision) в порядке изменения;
+            центроид загружается только для открытых кластеров
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    SELECT cluster_id, status, CASE WHEN status = 'open' THEN centroid END, size, revision
+    FROM clusters WHERE revision > ?
+    ORDER BY revision
+    ''', (revision,))
+    clusters = cursor.fetchall()
+    
+    conn.close()
+    
+    return [
+        {
+            'cluster_id': cluster[0],
+            'status': cluster[1],
+            'centroid': json.loads(cluster[2]) if cluster[2] else {'indices': [], 'values': []},
+            'size': cluster[3],
+            'revision': cluster[4]
+        }
+        for cluster in clusters
+    ]
+
+def close_batch_clusters(message_ids, owner, visibility_timeout):
+    """
+    Закрытие открытых кластеров сообщений арендованного пакета целиком
+
+    Кластер закрывается, только если все его сообщения в очереди суммаризации
+    обрабатывает owner: свободные задачи остальных сообщений кластера арендуются
+    в той же транзакции. Если часть сообщений кластера арендована другим процессом,
+    кластер остается открытым, а задачи сообщений пакета из этого кластера
+    возвращаются в очередь без учета попытки: кластер закроет процесс, который
+    арендует оставшиеся сообщения.
+
+    Args:
+        message_ids (list): ID сообщений пакета
+        owner (str): Имя процесса-владельца аренды
+        visibility_timeout (float): Время аренды дополнительных задач в секундах
+
+    Returns:
+        tuple: (дополнительно арендованные задачи в формате lease_tasks,
+        ID сообщений пакета, задачи которых возвращены в очередь)
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT, isolation_level=None)
+    cursor = conn.cursor()
+    
+    now = time.time()
+    batch_ids = set(message_ids)
+    
+    try:
+        # Блокировка записи берется сразу: состав кластеров и аренды не меняются до закрытия
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        # Все сообщения открытых кластеров пакета
+        members = {}
+        for chunk in chunked(message_ids):
+            placeholders = ', '.join(['?'] * len(chunk))
+            cursor.execute(f'''
+            SELECT cm.cluster_id, cm.message_id FROM cluster_members cm
+            JOIN clusters c ON c.cluster_id = cm.cluster_id
+            WHERE c.status = 'open' AND cm.cluster_id IN (
+                SELECT cluster_id FROM cluster_members WHERE message_id IN ({placeholders})
+            )
+            ''', chunk)
+            for cluster_id, message_id in cursor.fetchall():
+                members.setdefault(cluster_id, set()).add(message_id)
+        
+        # Задачи суммаризации сообщений этих кластеров, не попавших в пакет
+        outside = {
+            message_id: cluster_id
+            for cluster_id, cluster_members in members.items()
+            for message_id in cluster_members if message_id not in batch_ids
+        }
+        queued = []
+        for chunk in chunked(list(outside)):
+            placeholders = ', '.join(['?'] * len(chunk))
+            cursor.execute(f'''
+            SELECT task_id, payload, lease_expires_at FROM work_queue
+            WHERE queue = 'summarize' AND payload IN ({placeholders})
+            ''', [json.dumps(message_id) for message_id in chunk])
+            queued.extend(cursor.fetchall())
+        
+        # Кластеры, часть сообщений которых арендована другим процессом (или ждет повтора)
+        blocked = {
+            outside[json.loads(payload)] for task_id, payload, lease_expires_at in queued
+            if lease_expires_at is not None and lease_expires_at >= now
+        }
+        
+        leased = []
+        free_task_ids = [
+            task_id for task_id, payload, lease_expires_at in queued
+            if outside[json.loads(payload)] not in blocked
+        ]
+        for chunk in chunked(free_task_ids):
+            placeholders = ', '.join(['?'] * len(chunk))
+            cursor.execute(f'''
+            UPDATE work_queue SET lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1
+            WHERE task_id IN ({placeholders})
+            RETURNING task_id, payload, attempts
+            ''', [owner, now + visibility_timeout] + chunk)
+            leased.extend(cursor.fetchall())
+        
+        for chunk in chunked([cluster_id for cluster_id in members if cluster_id not in blocked]):
+            placeholders = ', '.join(['?'] * len(chunk))
+            cursor.execute(f'''
+            UPDATE clusters SET status = 'closed', revision = {NEXT_CLUSTER_REVISION}, updated_at = CURRENT_TIMESTAMP
+            WHERE cluster_id IN ({placeholders})
+            ''', chunk)
+        
+        # Сообщения пакета из незакрытых кластеров возвращаются в очередь
+        deferred = sorted(
+            message_id for cluster_id in blocked for message_id in members[cluster_id] if message_id in batch_ids
+        )
+        for chunk in chunked(deferred):
+            placeholders = ', '.join(['?'] * len(chunk))
+            cursor.execute(f'''
+            UPDATE work_queue SET lease_owner = NULL, lease_expires_at = NULL, attempts = attempts - 1
+            WHERE queue = 'summarize' AND lease_owner = ? AND payload IN ({placeholders})
+            ''', [owner] + [json.dumps(message_id) for message_id in chunk])
+        
+        cursor.execute('COMMIT')
+    
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+    
+    finally:
+        conn.close()
+    
+    leased.sort()
+    
+    return [{'task_id': row[0], 'payload': json.loads(row[1]), 'attempts': row[2]} for row in leased], deferred
+
+def get_message_clusters(message_ids):
+    """Получение кластеров для списка сообщений"""
+    if not message_ids:
+        return {}
+    
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    # Большие списки разбиваются на части из-за ограничения SQLite на число параметров
+    rows = []
+    for chunk in chunked(message_ids):
+        placeholders = ', '.join(['?'] * len(chunk))
+        cursor.execute(f'''
+        SELECT message_id, cluster_id FROM cluster_members
+        WHERE message_id IN ({placeholders})
+        ''', chunk)
+        rows.extend(cursor.fetchall())
+    
+    conn.close()
+    
+    return dict(rows)
+
+def get_cluster_members(cluster_ids):
+    """Получение ID сообщений для списка кластеров"""
+    if not cluster_ids:
+        return {}
+    
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    rows = []
+    for chunk in chunked(cluster_ids):
+        placeholders = ', '.join(['?'] * len(chunk))
+        cursor.execute(f'''
+        SELECT cluster_id, message_id FROM cluster_members
+        WHERE cluster_id IN ({placeholders})
+        ORDER BY message_id ASC
+        ''', chunk)
+        rows.extend(cursor.fetchall())
+    
+    conn.close()
+    
+    result = {}
+    for cluster_id, message_id in rows:
+        result.setdefault(cluster_id, []).append(message_id)
+    
+    return result
+
+def get_stale_clusters():
+    """Получение открытых кластеров без актуальной суммаризации"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    SELECT c.cluster_id, c.size FROM clusters c
+    LEFT JOIN cluster_summaries cs ON cs.cluster_id = c.cluster_id
+    WHERE c.status = 'open' AND (cs.cluster_id IS NULL OR cs.message_count != c.size)
+    ''')
+    
+    rows = cursor.fetchall()
+    
+    conn.close()
+    
+    return [{'cluster_id': row[0], 'size': row[1]} for row in rows]
+
+def set_cluster_summary(cluster_id, summary_text, message_count):
+    """Сохранение суммаризации открытого кластера"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    INSERT INTO cluster_summaries (cluster_id, summary_text, message_count)
+    VALUES (?, ?, ?)
+    ON CONFLICT (cluster_id) DO UPDATE SET
+        summary_text = excluded.summary_text,
+        message_count = excluded.message_count,
+        updated_at = CURRENT_TIMESTAMP
+    ''', (cluster_id, summary_text, message_count))
+    
+    conn.commit()
+    conn.close()
+
+def get_user_open_clusters(user_id):
+    """
+    Получение открытых кластеров с сообщениями из каналов пользователя
+
+    Returns:
+        list: Кластеры с предварительно вычисленной суммаризацией (или None)
+        и ID первого сообщения пользователя в кластере
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    SELECT cm.cluster_id, MIN(cm.message_id), cs.summary_text
+    FROM channels ch
+    JOIN messages m ON m.channel_id = ch.channel_id
+    JOIN cluster_members cm ON cm.message_id = m.message_id
+    JOIN clusters c ON c.cluster_id = cm.cluster_id
+    LEFT JOIN cluster_summaries cs ON cs.cluster_id = cm.cluster_id
+    WHERE ch.user_id = ? AND c.status = 'open'
+    GROUP BY cm.cluster_id
+    ORDER BY cm.cluster_id ASC
+    ''', (user_id,))
+    
+    rows = cursor.fetchall()
+    
+    conn.close()
+    
+    return [
+        {'cluster_id': row[0], 'first_message_id': row[1], 'summary_text': row[2]}
+        for row in rows
+    ]
+
+# Функции для работы с хранилищем состояний FSM
+def get_fsm_record(storage_key):
+    """Получение состояния и данных FSM по ключу"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'SELECT state, data, updated_at FROM fsm_storage WHERE storage_key = ?',
+        (storage_key,)
+    )
+    row = cursor.fetchone()
+    
+    conn.close()
+    
+    if not row:
+        return None
+    
+    return {
+        'state': row[0],
+        'data': json.loads(row[1]) if row[1] else {},
+        'updated_at': row[2]
+    }
+
+def set_fsm_state(storage_key, state, updated_at):
+    """Сохранение состояния FSM"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    INSERT INTO fsm_storage (storage_key, state, updated_at)
+    VALUES (?, ?, ?)
+    ON CONFLICT (storage_key) DO UPDATE SET state = excluded.state, updated_at = excluded.updated_at
+    ''', (storage_key, state, updated_at))
+    
+    conn.commit()
+    conn.close()
+
+def set_fsm_data(storage_key, data, updated_at):
+    """Сохранение данных FSM"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    INSERT INTO fsm_storage (storage_key, data, updated_at)
+    VALUES (?, ?, ?)
+    ON CONFLICT (storage_key) DO UPDATE SET data = excluded.data, updated_at = excluded.updated_at
+    ''', (storage_key, json.dumps(data, ensure_ascii=False), updated_at))
+    
+    conn.commit()
+    conn.close()
+
+def delete_fsm_records(before, storage_key=None):
+    """
+    Удаление устаревших записей FSM
+
+    Args:
+        before (float): Удаляются записи, не изменявшиеся с этого момента (unix time)
+        storage_key (str): Ограничить удаление одним ключом
+
+    Returns:
+        int: Количество удаленных записей
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    if storage_key is None:
+        cursor.execute('DELETE FROM fsm_storage WHERE updated_at < ?', (before,))
+    else:
+        cursor.execute(
+            'DELETE FROM fsm_storage WHERE storage_key = ? AND updated_at < ?',
+            (storage_key, before)
+        )
+    deleted = cursor.rowcount
+    
+    conn.commit()
+    conn.close()
+    
+    return deleted
+
+# Функции для работы с очередями задач
+def enqueue_tasks(queue, payloads):
+    """
+    Постановка задач в очередь
+
+    Args:
+        queue (str): Имя очереди
+        payloads (list): Данные задач (сериализуются в JSON)
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.executemany(
+        'INSERT INTO work_queue (queue, payload) VALUES (?, ?)',
+        [(queue, json.dumps(payload, ensure_ascii=False)) for payload in payloads]
+    )
+    
+    conn.commit()
+    conn.close()
+
+def lease_tasks(queue, owner, visibility_timeout, limit=1, max_attempts=QUEUE_MAX_ATTEMPTS):
+    """
+    Аренда пакета свободных задач очереди одним запросом UPDATE ... RETURNING
+
+    Задача, аренда которой истекла (процесс упал или завис), выдается снова.
+    Задачи, исчерпавшие max_attempts попыток, переносятся в очередь
+    недоставленных (work_queue_dead) и больше не выдаются.
+
+    Args:
+        queue (str): Имя очереди
+        owner (str): Имя процесса-владельца
+        visibility_timeout (float): Время аренды в секундах
+        limit (int): Максимальное количество задач
+        max_attempts (int): Максимальное количество попыток выполнения задачи
+
+    Returns:
+        list: Задачи (task_id, payload, attempts) в порядке постановки в очередь
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT, isolation_level=None)
+    cursor = conn.cursor()
+    
+    now = time.time()
+    
+    try:
+        # Блокировка записи берется сразу, чтобы два процесса не арендовали одну задачу
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        # Задачи, которые не удалось выполнить за max_attempts аренд
+        cursor.execute('''
+        INSERT INTO work_queue_dead (task_id, queue, payload, attempts, error)
+        SELECT task_id, queue, payload, attempts, 'истекла аренда последней попытки' FROM work_queue
+        WHERE queue = ? AND attempts >= ? AND lease_owner IS NOT NULL AND lease_expires_at < ?
+        ''', (queue, max_attempts, now))
+        cursor.execute('''
+        DELETE FROM work_queue
+        WHERE queue = ? AND attempts >= ? AND lease_owner IS NOT NULL AND lease_expires_at < ?
+        ''', (queue, max_attempts, now))
+        
+        cursor.execute('''
+        UPDATE work_queue SET lease_owner = ?, lease_expires_at = ?, attempts = attempts + 1
+        WHERE task_id IN (
+            SELECT task_id FROM work_queue
+            WHERE queue = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)
+            ORDER BY task_id
+            LIMIT ?
+        )
+        RETURNING task_id, payload, attempts
+        ''', (owner, now + visibility_timeout, queue, now, limit))
+        rows = cursor.fetchall()
+        
+        cursor.execute('COMMIT')
+    
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+    
+    finally:
+        conn.close()
+    
+    rows.sort()
+    
+    return [{'task_id': row[0], 'payload': json.loads(row[1]), 'attempts': row[2]} for row in rows]
+
+def ack_tasks(task_ids, owner):
+    """
+    Удаление выполненных задач из очереди
+
+    Подтверждаются только задачи, аренда которых принадлежит owner: если аренда
+    истекла и задачу взял другой процесс, подтверждать ее будет он.
+
+    Returns:
+        int: Количество подтвержденных задач
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    acknowledged = 0
+    for chunk in chunked(task_ids):
+        placeholders = ','.join('?' for _ in chunk)
+        cursor.execute(
+            f'DELETE FROM work_queue WHERE task_id IN ({placeholders}) AND lease_owner = ?',
+            chunk + [owner]
+        )
+        acknowledged += cursor.rowcount
+    
+    conn.commit()
+    conn.close()
+    
+    return acknowledged
+
+def fail_tasks(task_ids, owner, error, retry_delay=QUEUE_RETRY_DELAY, max_attempts=QUEUE_MAX_ATTEMPTS):
+    """
+    Возврат невыполненных задач в очередь
+
+    Задача будет выдана снова через retry_delay секунд; задача, исчерпавшая
+    max_attempts попыток, переносится в очередь недоставленных.
+
+    Args:
+        task_ids (list): ID задач
+        owner (str): Имя процесса-владельца аренды
+        error (str): Описание ошибки (сохраняется для недоставленных задач)
+        retry_delay (float): Задержка до повторной выдачи в секундах
+        max_attempts (int): Максимальное количество попыток
+
+    Returns:
+        int: Количество задач, перенесенных в очередь недоставленных
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    dead = 0
+    for chunk in chunked(task_ids):
+        placeholders = ','.join('?' for _ in chunk)
+        params = chunk + [owner]
+        
+        cursor.execute(f'''
+        INSERT INTO work_queue_dead (task_id, queue, payload, attempts, error)
+        SELECT task_id, queue, payload, attempts, ? FROM work_queue
+        WHERE task_id IN ({placeholders}) AND lease_owner = ? AND attempts >= ?
+        ''', [str(error)] + params + [max_attempts])
+        cursor.execute(
+            f'DELETE FROM work_queue WHERE task_id IN ({placeholders}) AND lease_owner = ? AND attempts >= ?',
+            params + [max_attempts]
+        )
+        dead += cursor.rowcount
+        
+        cursor.execute(
+            f'''UPDATE work_queue SET lease_owner = NULL, lease_expires_at = ?
+            WHERE task_id IN ({placeholders}) AND lease_owner = ?''',
+            [time.time() + retry_delay] + params
+        )
+    
+    conn.commit()
+    conn.close()
+    
+    return dead
+
+def acquire_lease(name, owner, duration):
+    """
+    Получение или продление именованной аренды
+
+    Args:
+        name (str): Имя аренды
+        owner (str): Имя процесса-владельца
+        duration (float): Время аренды в секундах
+
+    Returns:
+        bool: True, если аренда принадлежит owner
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    now = time.time()
+    cursor.execute('''
+    INSERT INTO leases (name, owner, expires_at) VALUES (?, ?, ?)
+    ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at
+    WHERE leases.expires_at < ? OR leases.owner = excluded.owner
+    ''', (name, owner, now + duration, now))
+    acquired = cursor.rowcount > 0
+    
+    conn.commit()
+    conn.close()
+    
+    return acquired
+
+def release_lease(name, owner):
+    """Освобождение именованной аренды"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('DELETE FROM leases WHERE name = ? AND owner = ?', (name, owner))
+    
+    conn.commit()
+    conn.close()
+
+# Функции очистки устаревших данных (удаление небольшими пакетами, каждый в своей транзакции)
+def delete_old_messages(days, limit):
+    """
+    Удаление пакета обработанных сообщений старше days дней вместе со связанными строками
+
+    Сообщения открытых кластеров не удаляются.
+
+    Returns:
+        tuple: (количество удаленных сообщений, локальные пути файлов удаленных медиа)
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    SELECT message_id FROM messages
+    WHERE processed = TRUE AND created_at < datetime('now', ?)
+    AND NOT EXISTS (
+        SELECT 1 FROM cluster_members
+        JOIN clusters ON clusters.cluster_id = cluster_members.cluster_id
+        WHERE cluster_members.message_id = messages.message_id AND clusters.status = 'open'
+    )
+    ORDER BY message_id
+    LIMIT ?
+    ''', (f'-{days} days', limit))
+    message_ids = [row[0] for row in cursor.fetchall()]
+    
+    paths = []
+    if message_ids:
+        placeholders = ','.join('?' for _ in message_ids)
+        
+        cursor.execute(
+            f'SELECT local_path FROM media WHERE message_id IN ({placeholders}) AND local_path IS NOT NULL',
+            message_ids
+        )
+        paths = [row[0] for row in cursor.fetchall()]
+        
+        for table in ('media', 'message_signatures', 'lsh_buckets', 'message_tokens', 'cluster_members', 'messages'):
+            cursor.execute(f'DELETE FROM {table} WHERE message_id IN ({placeholders})', message_ids)
+    
+    conn.commit()
+    conn.close()
+    
+    return len(message_ids), paths
+
+def delete_orphan_media(limit):
+    """
+    Удаление пакета записей о медиафайлах, сообщения которых уже удалены
+
+    Returns:
+        tuple: (количество удаленных записей, локальные пути файлов)
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    SELECT media_id, local_path FROM media
+    WHERE NOT EXISTS (SELECT 1 FROM messages WHERE messages.message_id = media.message_id)
+    LIMIT ?
+    ''', (limit,))
+    rows = cursor.fetchall()
+    
+    if rows:
+        placeholders = ','.join('?' for _ in rows)
+        cursor.execute(f'DELETE FROM media WHERE media_id IN ({placeholders})', [row[0] for row in rows])
+    
+    conn.commit()
+    conn.close()
+    
+    return len(rows), [row[1] for row in rows if row[1]]
+
+def delete_old_summaries(days, limit):
+    """Удаление пакета доставленных суммаризаций старше days дней"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    DELETE FROM summaries WHERE summary_id IN (
+        SELECT summary_id FROM summaries
+        WHERE created_at < datetime('now', ?)
+        AND NOT EXISTS (
+            SELECT 1 FROM work_queue
+            WHERE work_queue.queue = 'deliver' AND work_queue.payload = summaries.summary_id
+        )
+        ORDER BY summary_id
+        LIMIT ?
+    )
+    ''', (f'-{days} days', limit))
+    deleted = cursor.rowcount
+    
+    conn.commit()
+    conn.close()
+    
+    return deleted
+
+def delete_empty_clusters(limit):
+    """Удаление пакета закрытых кластеров, все сообщения которых удалены, вместе с их суммаризациями"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    SELECT cluster_id FROM clusters
+    WHERE status = 'closed'
+    AND NOT EXISTS (SELECT 1 FROM cluster_members WHERE cluster_members.cluster_id = clusters.cluster_id)
+    LIMIT ?
+    ''', (limit,))
+    cluster_ids = [row[0] for row in cursor.fetchall()]
+    
+    if cluster_ids:
+        placeholders = ','.join('?' for _ in cluster_ids)
+        cursor.execute(f'DELETE FROM cluster_summaries WHERE cluster_id IN ({placeholders})', cluster_ids)
+        cursor.execute(f'DELETE FROM clusters WHERE cluster_id IN ({placeholders})', cluster_ids)
+    
+    conn.commit()
+    conn.close()
+    
+    return len(cluster_ids)
+
+def delete_old_rows(table, date_column, days, limit):
+    """
+    Удаление пакета строк таблицы старше days дней по столбцу даты
+
+    Args:
+        table (str): Таблица (summary_cache, work_queue_dead)
+        date_column (str): Столбец даты создания
+        days (int): Срок хранения в днях
+        limit (int): Размер пакета
+
+    Returns:
+        int: Количество удаленных строк
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute(f'''
+    DELETE FROM {table} WHERE rowid IN (
+        SELECT rowid FROM {table} WHERE {date_column} < datetime('now', ?) LIMIT ?
+    )
+    ''', (f'-{days} days', limit))
+    deleted = cursor.rowcount
+    
+    conn.commit()
+    conn.close()
+    
+    return deleted
+
+def get_media_paths():
+    """Множество локальных путей всех медиафайлов (читается частями)"""
+    return {row[0] for rows in iter_rows('SELECT local_path FROM media WHERE local_path IS NOT NULL') for row in rows}
+
+def get_database_size():
+    """
+    Размер базы данных
+
+    Returns:
+        dict: page_size, page_count, freelist_count и auto_vacuum (2 - инкрементальный режим)
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    size = {}
+    for pragma in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum'):
+        cursor.execute(f'PRAGMA {pragma}')
+        size[pragma] = cursor.fetchone()[0]
+    
+    conn.close()
+    
+    return size
+
+def enable_incremental_vacuum():
+    """
+    Перевод существующей базы в режим инкрементальной очистки (однократный полный VACUUM)
+
+    VACUUM перезаписывает всю базу под исключительной блокировкой, поэтому
+    выполняется только отдельной командой при остановленных процессах.
+
+    Returns:
+        bool: True, если база переведена в этот режим сейчас
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT, isolation_level=None)
+    cursor = conn.cursor()
+    
+    cursor.execute('PRAGMA auto_vacuum')
+    if cursor.fetchone()[0] == 2:
+        conn.close()
+        return False
+    
+    cursor.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    cursor.execute('VACUUM')
+    conn.close()
+    
+    return True
+
+def incremental_vacuum(pages):
+    """
+    Освобождение до pages свободных страниц в конце файла базы
+
+    Returns:
+        int: Количество оставшихся свободных страниц
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT, isolation_level=None)
+    cursor = conn.cursor()
+    
+    cursor.execute(f'PRAGMA incremental_vacuum({int(pages)})')
+    cursor.fetchall()
+    cursor.execute('PRAGMA freelist_count')
+    remaining = cursor.fetchone()[0]
+    
+    conn.close()
+    
+    return remaining
+
+def checkpoint_wal():
+    """Перенос журнала WAL в базу и усечение файла журнала"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    result = cursor.fetchone()
+    
+    conn.close()
+    
+    return result
+
+# Функции для работы с медиафайлами
+def add_media(message_id, media_type, media_url, local_path=None):
+    """Добавление медиафайла, связанного с сообщением"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    INSERT INTO media (message_id, media_type, media_url, local_path)
+    VALUES (?, ?, ?, ?)
+    ''', (message_id, media_type, media_url, local_path))
+    
+    media_id = cursor.lastrowid
+    
+    conn.commit()
+    conn.close()
+    
+    return media_id
+
+def get_media_for_message(message_id):
+    """Получение медиафайлов для сообщения"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT * FROM media WHERE message_id = ?', (message_id,))
+    media_files = cursor.fetchall()
+    
+    conn.close()
+    
+    result = []
+    for media in media_files:
+        result.append({
+            'media_id': media[0],
+            'message_id': media[1],
+            'media_type': media[2],
+            'media_url': media[3],
+            'local_path': media[4],
+            'created_at': media[5]
+        })
+    
+    return result
+
+# Функции для работы с суммаризациями
+def add_group_summaries(user_ids, summary_text, source_messages, media_files=None,
+                        attach_to=(), task_ids=(), owner=None):
+    """
+    Сохранение результата обработки группы сообщений одной транзакцией:
+    суммаризации для каждого пользователя, задачи их доставки, привязка
+    сообщений группы к доставленным ранее суммаризациям, отметка сообщений
+    группы как обработанных и подтверждение их задач суммаризации
+
+    Если процесс упадет посреди пакета, сохраненные группы не теряются и не
+    дублируются: их суммаризации уже стоят в очереди доставки, а задачи
+    подтверждены. Исходные сообщения доставленных суммаризаций дополняются под
+    блокировкой записи, поэтому одновременные суммаризаторы не теряют изменения
+    друг друга.
+
+    Args:
+        user_ids (list): ID пользователей-получателей (может быть пустым)
+        summary_text (str): Текст суммаризации
+        source_messages (list): ID сообщений группы
+        media_files (list): Пути к изображениям
+        attach_to (list): ID доставленных ранее суммаризаций, к исходным сообщениям которых добавляется группа
+        task_ids (list): ID задач суммаризации сообщений группы
+        owner (str): Имя процесса-владельца аренды (подтверждаются только его задачи)
+
+    Returns:
+        dict: ID пользователя -> ID суммаризации
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT, isolation_level=None)
+    cursor = conn.cursor()
+    
+    source_messages_json = json.dumps(source_messages)
+    media_files_json = json.dumps(media_files) if media_files else None
+    
+    try:
+        # Блокировка записи берется сразу: исходные сообщения суммаризаций читаются и дополняются в ней
+        cursor.execute('BEGIN IMMEDIATE')
+        
+        for summary_id in attach_to:
+            cursor.execute('SELECT source_messages FROM summaries WHERE summary_id = ?', (summary_id,))
+            row = cursor.fetchone()
+            if not row:
+                continue
+            
+            attached = json.loads(row[0]) if row[0] else []
+            attached.extend(message_id for message_id in source_messages if message_id not in attached)
+            cursor.execute(
+                'UPDATE summaries SET source_messages = ? WHERE summary_id = ?',
+                (json.dumps(attached), summary_id)
+            )
+        
+        summary_ids = {}
+        for user_id in user_ids:
+            cursor.execute('''
+            INSERT INTO summaries (user_id, summary_text, source_messages, media_files)
+            VALUES (?, ?, ?, ?)
+            ''', (user_id, summary_text, source_messages_json, media_files_json))
+            summary_ids[user_id] = cursor.lastrowid
+        
+        cursor.executemany(
+            'INSERT INTO work_queue (queue, payload) VALUES (?, ?)',
+            [('deliver', json.dumps(summary_id)) for summary_id in summary_ids.values()]
+        )
+        
+        for chunk in chunked(source_messages):
+            placeholders = ', '.join(['?'] * len(chunk))
+            cursor.execute(f'''
+            UPDATE messages SET processed = TRUE
+            WHERE message_id IN ({placeholders})
+            ''', chunk)
+        
+        for chunk in chunked(list(task_ids)):
+            placeholders = ', '.join(['?'] * len(chunk))
+            cursor.execute(
+                f'DELETE FROM work_queue WHERE task_id IN ({placeholders}) AND lease_owner = ?',
+                chunk + [owner]
+            )
+        
+        cursor.execute('COMMIT')
+    
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+    
+    finally:
+        conn.close()
+    
+    return summary_ids
+
+def get_summary(summary_id):
+    """Получение суммаризации для доставки"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute(
+        'SELECT summary_id, user_id, summary_text, media_files FROM summaries WHERE summary_id = ?',
+        (summary_id,)
+    )
+    row = cursor.fetchone()
+    
+    conn.close()
+    
+    if not row:
+        return None
+    
+    return {
+        'summary_id': row[0],
+        'user_id': row[1],
+        'text': row[2],
+        'images': json.loads(row[3]) if row[3] else []
+    }
+
+def get_recent_summaries(user_id, limit=10):
+    """Получение последних суммаризаций для пользователя"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    SELECT * FROM summaries 
+    WHERE user_id = ?
+    ORDER BY created_at DESC
+    LIMIT ?
+    ''', (user_id, limit))
+    
+    summaries = cursor.fetchall()
+    
+    conn.close()
+    
+    result = []
+    for summary in summaries:
+        source_messages = json.loads(summary[3]) if summary[3] else []
+        media_files = json.loads(summary[4]) if summary[4] else []
+        
+        result.append({
+            'summary_id': summary[0],
+            'user_id': summary[1],
+            'summary_text': summary[2],
+            'source_messages': source_messages,
+            'media_files': media_files,
+            'created_at': summary[5]
+        })
+    
+    return result
+
+def get_user_summaries_since(user_id, hours=1):
+    """Получение суммаризаций пользователя за последние hours часов"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    SELECT summary_id, summary_text, created_at FROM summaries
+    WHERE user_id = ? AND created_at >= datetime('now', ?)
+    ORDER BY created_at ASC
+    ''', (user_id, f'-{int(hours)} hours'))
+    
+    summaries = cursor.fetchall()
+    
+    conn.close()
+    
+    return [
+        {'summary_id': summary[0], 'summary_text': summary[1], 'created_at': summary[2]}
+        for summary in summaries
+    ]
+
+def get_summaries_since(hours=24, after_summary_id=0):
+    """
+    Получение суммаризаций всех пользователей за последние hours часов
+
+    Args:
+        hours (int): Глубина выборки в часах
+        after_summary_id (int): Возвращаются только суммаризации с большим ID
+
+    Returns:
+        list: Суммаризации (summary_id, user_id, source_messages, created_at) в порядке создания
+    """
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    SELECT summary_id, user_id, source_messages, created_at FROM summaries
+    WHERE summary_id > ? AND created_at >= datetime('now', ?)
+    ORDER BY summary_id ASC
+    ''', (after_summary_id, f'-{int(hours)} hours'))
+    
+    summaries = cursor.fetchall()
+    
+    conn.close()
+    
+    result = []
+    for summary in summaries:
+        result.append({
+            'summary_id': summary[0],
+            'user_id': summary[1],
+            'source_messages': json.loads(summary[2]) if summary[2] else [],
+            'created_at': summary[3]
+        })
+    
+    return result
+
+# Функции для работы с кэшем суммаризаций
+def get_cached_summary(cache_key):
+    """Получение суммаризации из кэша по ключу"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT summary_text FROM summary_cache WHERE cache_key = ?', (cache_key,))
+    row = cursor.fetchone()
+    
+    conn.close()
+    
+    return row[0] if row else None
+
+def add_cached_summary(cache_key, summary_text):
+    """Сохранение суммаризации в кэш"""
+    conn = sqlite3.connect(DATABASE_NAME, timeout=DATABASE_BUSY_TIMEOUT)
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+    INSERT OR REPLACE INTO summary_cache (cache_key, summary_text)
+    VALUES (?, ?)
+    ''', (cache_key, summary_text))
+    
+    conn.commit()
+    conn.close()
 
 # Инициализация базы данных при импорте модуля
 if __name__ == "__main__":
@@ -1,15 +1,22 @@
 # -*- coding: utf-8 -*-
 import logging
 import asyncio
+import argparse
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.enums.parse_mode import ParseMode
 
 import database as db
-from config import BOT_TOKEN
+from config import BOT_TOKEN, BOT_MODE, ONLINE_CLUSTERING_ENABLED, RETENTION_ENABLED
 from bot.handlers import router
-from scheduler import setup_scheduler
+from scheduler import setup_scheduler, schedule_fetching
 from bot.utils import close_telethon_client
+from channel_manager.session_pool import session_pool
+from bot.webhook import run_webhook
+from bot.storage import SQLiteStorage
+from bot.delivery import schedule_delivery
+from summarizer.pool import shutdown_pool, warm_up_pool
+from summarizer.summarizer import schedule_summarization, schedule_cluster_summaries
+from retention import schedule_retention
 
 # Настройка логирования
 logging.basicConfig(
@@ -20,40 +27,86 @@ logger = logging.getLogger(__name__)
 
 # Инициализация бота и диспетчера
 bot = Bot(token=BOT_TOKEN, parse_mode=ParseMode.HTML)
-storage = MemoryStorage()
+storage = SQLiteStorage()
 dp = Dispatcher(storage=storage)
 
 # Регистрация роутеров
 dp.include_router(router)
 
-async def on_startup():
+# Роли процесса: all - все в одном процессе, остальные запускаются отдельно
+# и взаимодействуют через очереди задач в базе данных
+ROLES = ('all', 'bot', 'fetcher', 'summarizer', 'delivery')
+
+async def on_startup(role='all'):
     """Действия при запуске бота"""
     # Инициализация базы данных
     db.init_db()
     logger.info("База данных инициализирована")
     
-    # Настройка планировщика задач
-    setup_scheduler(bot)
-    logger.info("Планировщик задач настроен")
+    if role in ('all', 'bot'):
+        # Удаляем устаревшие состояния FSM
+        storage.cleanup()
+    
+    if role == 'all':
+        # Настройка планировщика задач
+        setup_scheduler(bot)
+        logger.info("Планировщик задач настроен")
     
-    logger.info("Бот запущен и готов к работе!")
+    if role in ('all', 'summarizer'):
+        # Прогреваем пул рабочих процессов в фоне, не задерживая запуск бота
+        asyncio.create_task(warm_up_pool())
+    
+    logger.info(f"Процесс с ролью {role} запущен и готов к работе!")
 
 async def on_shutdown():
     """Действия при остановке бота"""
     # Закрываем клиент Telethon
     await close_telethon_client()
-    logger.info("Клиент Telethon закрыт")
+    await session_pool.close()
+    logger.info("Клиенты Telethon закрыты")
+    
+    # Останавливаем пул рабочих процессов суммаризации
+    shutdown_pool()
+    logger.info("Пул рабочих процессов остановлен")
     
     logger.info("Бот остановлен")
 
-async def main():
+async def run_role(role, shard_index=0, shard_count=1):
+    """
+    Основной цикл процесса с заданной ролью
+    
+    Args:
+        role (str): Роль процесса (см. ROLES)
+        shard_index (int): Номер части каналов (для роли fetcher)
+        shard_count (int): Количество частей каналов (для роли fetcher)
+    """
+    if role == 'fetcher':
+        await schedule_fetching(shard_index, shard_count)
+    
+    elif role == 'summarizer':
+        jobs = [schedule_summarization()]
+        if ONLINE_CLUSTERING_ENABLED:
+            jobs.append(schedule_cluster_summaries())
+        if RETENTION_ENABLED:
+            jobs.append(schedule_retention())
+        await asyncio.gather(*jobs)
+    
+    elif role == 'delivery':
+        await schedule_delivery(bot)
+    
+    # Получаем обновления через вебхук или long polling
+    elif BOT_MODE == 'webhook':
+        await run_webhook(dp, bot)
+    else:
+        await dp.start_polling(bot)
+
+async def main(role='all', shard_index=0, shard_count=1):
     """Основная функция запуска бота"""
     try:
         # Вызываем функцию on_startup
-        await on_startup()
+        await on_startup(role)
         
-        # Запускаем поллинг
-        await dp.start_polling(bot)
+        await run_role(role, shard_index, shard_count)
     
     except Exception as e:
         logger.error(f"Ошибка при запуске бота: {e}")
@@ -62,10 +115,27 @@ async def main():
         # Вызываем функцию on_shutdown
         await on_shutdown()
 
+def parse_args():
+    """Разбор аргументов командной строки"""
+    parser = argparse.ArgumentParser(description="Бот суммаризации Telegram каналов")
+    parser.add_argument('--role', choices=ROLES, default='all', help="Роль процесса")
+    parser.add_argument('--shard', default='0/1', help="Часть каналов сборщика в формате номер/количество, например 0/2")
+    args = parser.parse_args()
+    
+    try:
+        shard_index, shard_count = (int(value) for value in args.shard.split('/'))
+    except ValueError:
+        parser.error("--shard должен быть в формате номер/количество")
+    
+    if not 0 <= shard_index < shard_count:
+        parser.error("номер части должен быть от 0 до количества частей - 1")
+    
+    return args.role, shard_index, shard_count
+
 if __name__ == "__main__":
     try:
         # Запускаем основную функцию
-        asyncio.run(main())
+        asyncio.run(main(*parse_args()))
     
     except (KeyboardInterrupt, SystemExit):
         logger.info("Бот остановлен")
@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+import json
+from array import array
+from datetime import datetime, timezone
+
+from config import VECTORIZER_N_FEATURES
+
+class MessageBatch:
+    """
+    Колоночное представление пакета сообщений для конвейера обработки
+
+    ID, каналы и даты хранятся в компактных массивах, тексты - в списке,
+    сохраненные при получении частоты терминов - в одной разреженной матрице
+    (строка - сообщение). Индекс index позволяет найти строку по ID сообщения.
+    """
+
+    __slots__ = ('ids', 'channel_ids', 'dates', 'texts', 'vectors', 'missing', 'index')
+
+    def __init__(self, ids=(), channel_ids=(), dates=(), texts=(), vectors=None, missing=()):
+        """
+        Args:
+            ids: ID сообщений
+            channel_ids: ID каналов сообщений
+            dates: Даты сообщений (unix time)
+            texts: Тексты сообщений
+            vectors: Матрица частот терминов (scipy.sparse.csr_matrix) или None
+            missing: Номера строк без сохраненного векторного представления
+        """
+        self.ids = array('q', ids)
+        self.channel_ids = array('q', channel_ids)
+        self.dates = array('q', dates)
+        self.texts = list(texts)
+        self.vectors = vectors
+        self.missing = array('q', missing)
+        self.index = {message_id: row for row, message_id in enumerate(self.ids)}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def take(self, rows):
+        """
+        Подмножество пакета по номерам строк
+
+        Args:
+            rows: Номера строк в нужном порядке
+
+        Returns:
+            MessageBatch: Новый пакет
+        """
+        rows = list(rows)
+        missing = set(self.missing)
+
+        return MessageBatch(
+            [self.ids[row] for row in rows],
+            [self.channel_ids[row] for row in rows],
+            [self.dates[row] for row in rows],
+            [self.texts[row] for row in rows],
+            self.vectors[rows] if self.vectors is not None else None,
+            [position for position, row in enumerate(rows) if row in missing]
+        )
+
+    def select(self, message_ids):
+        """Подмножество пакета по ID сообщений (отсутствующие в пакете ID пропускаются)"""
+        return self.take([self.index[message_id] for message_id in message_ids if message_id in self.index])
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Построение пакета из строк базы данных
+
+        Args:
+            rows (list): Кортежи (ID сообщения, ID канала, unix time, текст, vector_representation в JSON)
+
+        Returns:
+            MessageBatch: Пакет сообщений
+        """
+        import numpy as np
+        from scipy import sparse
+
+        ids, channel_ids, dates, texts, missing = [], [], [], [], []
+
+        # Частоты терминов сразу складываются в компактные массивы CSR,
+        # без промежуточных словарей на каждое сообщение
+        indices = array('i')
+        data = array('f')
+        indptr = array('q', [0])
+
+        for row, (message_id, channel_id, date, text, vector_json) in enumerate(rows):
+            vector = None
+            if vector_json:
+                try:
+                    vector = json.loads(vector_json)
+                except:
+                    pass
+
+            if isinstance(vector, dict) and 'indices' in vector and 'counts' in vector:
+                indices.extend(vector['indices'])
+                data.extend(vector['counts'])
+            else:
+                missing.append(row)
+            indptr.append(len(indices))
+
+            ids.append(message_id)
+            channel_ids.append(channel_id or 0)
+            dates.append(date or 0)
+            texts.append(text or '')
+
+        vectors = sparse.csr_matrix(
+            (np.frombuffer(data, dtype=np.float32), np.frombuffer(indices, dtype=np.int32),
+             np.frombuffer(indptr, dtype=np.int64)),
+            shape=(len(ids), VECTORIZER_N_FEATURES)
+        )
+
+        return cls(ids, channel_ids, dates, texts, vectors, missing)
+
+    @classmethod
+    def from_messages(cls, messages):
+        """Построение пакета из списка сообщений-словарей с ключами message_id, channel_id, message_date, message_text и vector_representation"""
+        rows = []
+        for message in messages:
+            vector = message.get('vector_representation')
+            rows.append((
+                message['message_id'],
+                message.get('channel_id'),
+                _to_timestamp(message.get('message_date')),
+                message.get('message_text'),
+                json.dumps(vector) if vector is not None else None
+            ))
+        return cls.from_rows(rows)
+
+def counts_from_json(vector):
+    """Восстановление подсчета терминов из messages.vector_representation (None для устаревших форматов)"""
+    if isinstance(vector, dict) and 'indices' in vector and 'counts' in vector:
+        return dict(zip(vector['indices'], vector['counts']))
+    return None
+
+def counts_matrix(counts_list):
+    """
+    Разреженная матрица частот терминов в хэшированном пространстве
+
+    Args:
+        counts_list (list): Словари "номер термина -> количество" для каждого документа
+
+    Returns:
+        scipy.sparse.csr_matrix: Матрица документов x терминов
+    """
+    import numpy as np
+    from scipy import sparse
+
+    indptr = [0]
+    indices = []
+    data = []
+    for counts in counts_list:
+        indices.extend(counts.keys())
+        data.extend(counts.values())
+        indptr.append(len(indices))
+
+    return sparse.csr_matrix(
+        (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr, dtype=np.int64)),
+        shape=(len(counts_list), VECTORIZER_N_FEATURES)
+    )
+
+def _to_timestamp(value):
+    """Преобразование даты сообщения в unix time"""
+    if isinstance(value, datetime):
+        return int(value.replace(tzinfo=value.tzinfo or timezone.utc).timestamp())
+    if isinstance(value, str):
+        try:
+            return int(datetime.strptime(value[:19], '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp())
+        except ValueError:
+            return 0
+    return int(value or 0)
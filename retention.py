@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+import logging
+import argparse
+import asyncio
+import os
+import time
+
+import database as db
+from channel_manager.fetcher import MEDIA_DIR
+from config import (
+    WORKER_ID, RETENTION_INTERVAL, MESSAGE_RETENTION_DAYS, SUMMARY_RETENTION_DAYS,
+    SUMMARY_CACHE_RETENTION_DAYS, DEAD_TASK_RETENTION_DAYS, RETENTION_BATCH_SIZE,
+    RETENTION_BATCH_PAUSE, RETENTION_ORPHAN_FILE_AGE, RETENTION_VACUUM_PAGES, FSM_STATE_TTL
+)
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Политики хранения: имя -> функция удаления одного пакета.
+# Функция возвращает количество удаленных строк или пару (количество, пути файлов для удаления).
+# Порядок важен: после сообщений удаляются ставшие пустыми кластеры и осиротевшие медиафайлы.
+RETENTION_POLICIES = [
+    ('messages', lambda: db.delete_old_messages(MESSAGE_RETENTION_DAYS, RETENTION_BATCH_SIZE)),
+    ('media', lambda: db.delete_orphan_media(RETENTION_BATCH_SIZE)),
+    ('clusters', lambda: db.delete_empty_clusters(RETENTION_BATCH_SIZE)),
+    ('summaries', lambda: db.delete_old_summaries(SUMMARY_RETENTION_DAYS, RETENTION_BATCH_SIZE)),
+    ('summary_cache', lambda: db.delete_old_rows(
+        'summary_cache', 'created_at', SUMMARY_CACHE_RETENTION_DAYS, RETENTION_BATCH_SIZE
+    )),
+    ('work_queue_dead', lambda: db.delete_old_rows(
+        'work_queue_dead', 'failed_at', DEAD_TASK_RETENTION_DAYS, RETENTION_BATCH_SIZE
+    )),
+]
+
+def database_bytes():
+    """Размер файлов базы данных (вместе с журналом WAL) в байтах"""
+    total = 0
+    for suffix in ('', '-wal'):
+        try:
+            total += os.path.getsize(db.DATABASE_NAME + suffix)
+        except OSError:
+            pass
+    return total
+
+def remove_files(paths):
+    """
+    Удаление файлов с диска
+
+    Returns:
+        tuple: (количество удаленных файлов, освобождено байт)
+    """
+    removed = 0
+    freed = 0
+    for path in paths:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            removed += 1
+            freed += size
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Не удалось удалить файл {path}: {e}")
+    return removed, freed
+
+def find_orphan_files(directory=os.path.join(MEDIA_DIR, 'photos'), min_age=RETENTION_ORPHAN_FILE_AGE):
+    """
+    Файлы в каталоге медиа, на которые не ссылается ни одна запись в базе
+
+    Недавние файлы пропускаются: сборщик сохраняет файл до записи о нем в базу.
+    """
+    if not os.path.isdir(directory):
+        return []
+
+    known = {os.path.normpath(path) for path in db.get_media_paths()}
+    cutoff = time.time() - min_age
+
+    orphans = []
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and os.path.normpath(entry.path) not in known and entry.stat().st_mtime < cutoff:
+                orphans.append(entry.path)
+    return orphans
+
+async def apply_policy(delete_batch):
+    """
+    Удаление пакетами, пока политика находит устаревшие строки
+
+    Returns:
+        tuple: (количество удаленных строк, пути файлов для удаления)
+    """
+    deleted = 0
+    paths = []
+
+    while True:
+        result = delete_batch()
+        count, batch_paths = result if isinstance(result, tuple) else (result, [])
+        deleted += count
+        paths.extend(batch_paths)
+
+        if count < RETENTION_BATCH_SIZE:
+            return deleted, paths
+
+        # Между пакетами другие процессы успевают записать новые данные
+        await asyncio.sleep(RETENTION_BATCH_PAUSE)
+
+async def run_retention():
+    """
+    Удаление устаревших данных по политикам хранения и освобождение места
+
+    Returns:
+        dict: Отчет: удалено строк по политикам, удалено файлов, размер базы до и после
+              и освобожденное место в байтах или None, если очистку выполняет другой процесс
+    """
+    if not db.acquire_lease('retention', WORKER_ID, RETENTION_INTERVAL):
+        return None
+
+    report = {'deleted': {}, 'files': 0, 'file_bytes': 0, 'db_bytes_before': database_bytes()}
+
+    try:
+        paths = []
+        for name, delete_batch in RETENTION_POLICIES:
+            deleted, policy_paths = await apply_policy(delete_batch)
+            report['deleted'][name] = deleted
+            paths.extend(policy_paths)
+
+        report['deleted']['fsm_storage'] = db.delete_fsm_records(time.time() - FSM_STATE_TTL)
+
+        # Файлы удаляются после записей о них; файлы без записей - только достаточно старые
+        paths.extend(find_orphan_files())
+        report['files'], report['file_bytes'] = remove_files(paths)
+
+        # Освобождаем свободные страницы небольшими шагами. База, созданная до
+        # включения инкрементальной очистки, не переводится в этот режим здесь:
+        # полный VACUUM заблокировал бы запись сборщиков (см. enable_vacuum)
+        if db.get_database_size()['auto_vacuum'] == 2:
+            while db.incremental_vacuum(RETENTION_VACUUM_PAGES) > 0:
+                await asyncio.sleep(RETENTION_BATCH_PAUSE)
+        else:
+            logger.warning(
+                "База данных не в режиме инкрементальной очистки: освобожденные страницы используются "
+                "повторно, но файл не уменьшается. Остановите процессы и выполните "
+                "python retention.py --enable-incremental-vacuum"
+            )
+
+        db.checkpoint_wal()
+
+    except Exception as e:
+        logger.error(f"Ошибка при очистке устаревших данных: {e}")
+
+    report['db_bytes_after'] = database_bytes()
+    report['reclaimed_bytes'] = report['db_bytes_before'] - report['db_bytes_after'] + report['file_bytes']
+
+    logger.info(
+        f"Очистка устаревших данных: удалено {report['deleted']}, файлов {report['files']}; "
+        f"база {report['db_bytes_before'] / 1024 / 1024:.1f} -> {report['db_bytes_after'] / 1024 / 1024:.1f} МБ, "
+        f"освобождено {report['reclaimed_bytes'] / 1024 / 1024:.1f} МБ"
+    )
+
+    return report
+
+async def schedule_retention():
+    """Периодическая очистка устаревших данных"""
+    while True:
+        await run_retention()
+        await asyncio.sleep(RETENTION_INTERVAL)
+
+def enable_vacuum():
+    """
+    Перевод существующей базы в режим инкрементальной очистки
+
+    Выполняется отдельной командой при остановленных процессах: полный VACUUM
+    держит исключительную блокировку базы все время перезаписи.
+    """
+    db.init_db()
+
+    if db.enable_incremental_vacuum():
+        logger.info(f"База данных переведена в режим инкрементальной очистки, размер {database_bytes() / 1024 / 1024:.1f} МБ")
+    else:
+        logger.info("База данных уже в режиме инкрементальной очистки")
+
+def main():
+    parser = argparse.ArgumentParser(description="Очистка устаревших данных")
+    parser.add_argument(
+        '--enable-incremental-vacuum', action='store_true',
+        help="Перевести существующую базу в режим инкрементальной очистки (остановите процессы бота)"
+    )
+    args = parser.parse_args()
+
+    if args.enable_incremental_vacuum:
+        enable_vacuum()
+    else:
+        db.init_db()
+        asyncio.run(run_retention())
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,13 @@
 # -*- coding: utf-8 -*-
 import logging
 import asyncio
-import schedule
-import time
 from threading import Thread
 
 from channel_manager.manager import update_all_channels
-from summarizer.summarizer import process_new_messages, schedule_summarization
-from config import SUMMARIZATION_INTERVAL
+from summarizer.summarizer import process_new_messages, schedule_summarization, schedule_cluster_summaries
+from bot.delivery import schedule_delivery
+from retention import schedule_retention
+from config import SUMMARIZATION_INTERVAL, ONLINE_CLUSTERING_ENABLED, FETCH_INTERVAL, RETENTION_ENABLED
 
 # Настройка логирования
 logging.basicConfig(
@@ -16,17 +16,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def run_scheduler():
-    """Запуск планировщика задач в отдельном потоке"""
-    def run_schedule():
-        while True:
-            schedule.run_pending()
-            time.sleep(1)
+def run_fetcher():
+    """
+    Запуск периодического обновления каналов в отдельном потоке
     
-    # Создаем и запускаем поток
-    scheduler_thread = Thread(target=run_schedule)
-    scheduler_thread.daemon = True
-    scheduler_thread.start()
+    Сборщик выполняет блокирующие запросы к базе данных и предобработку, поэтому
+    не работает в цикле событий бота. Цикл событий потока постоянный: клиенты
+    пула сессий и их блокировка создаются в нем один раз.
+    """
+    fetcher_thread = Thread(target=lambda: asyncio.run(schedule_fetching()))
+    fetcher_thread.daemon = True
+    fetcher_thread.start()
 
 def setup_scheduler(bot):
     """
@@ -35,17 +35,39 @@ def setup_scheduler(bot):
     Args:
         bot: Объект бота для отправки сообщений
     """
-    # Запускаем планировщик
-    run_scheduler()
-    
     # Запускаем периодическое обновление каналов
-    schedule.every(1).minutes.do(lambda: asyncio.run(update_all_channels()))
+    run_fetcher()
     
-    # Запускаем периодическую суммаризацию в асинхронном режиме
-    asyncio.create_task(schedule_summarization(bot))
+    # Запускаем периодическую суммаризацию и доставку в асинхронном режиме
+    asyncio.create_task(schedule_summarization())
+    asyncio.create_task(schedule_delivery(bot))
+    
+    # Поддерживаем актуальные суммаризации открытых кластеров для команды /summarize
+    if ONLINE_CLUSTERING_ENABLED:
+        asyncio.create_task(schedule_cluster_summaries())
+    
+    # Периодически удаляем устаревшие данные
+    if RETENTION_ENABLED:
+        asyncio.create_task(schedule_retention())
     
     logger.info("Планировщик задач успешно настроен")
 
+async def schedule_fetching(shard_index=0, shard_count=1):
+    """
+    Периодическое обновление каналов (роль fetcher)
+    
+    Args:
+        shard_index (int): Номер части каналов, обслуживаемой процессом
+        shard_count (int): Количество частей
+    """
+    while True:
+        try:
+            await update_all_channels(shard_index, shard_count)
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении каналов: {e}")
+        
+        await asyncio.sleep(FETCH_INTERVAL)
+
 async def manual_update_channels():
     """Ручное обновление каналов"""
     try:
@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+import logging
+import hashlib
+import json
+import re
+from collections import OrderedDict
+
+import database as db
+from config import SUMMARY_CACHE_SIZE
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+class SummaryCache:
+    """Кэш суммаризаций: LRU в памяти поверх постоянного хранилища в SQLite"""
+
+    def __init__(self, max_size=SUMMARY_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(texts, **params):
+        """
+        Вычисление ключа кэша
+
+        Args:
+            texts (list): Тексты сообщений группы
+            **params: Параметры суммаризации (количество предложений, версия алгоритма)
+
+        Returns:
+            str: SHA-256 от нормализованных текстов и параметров
+        """
+        # Нормализуем пробелы и отбрасываем пустые тексты
+        normalized_texts = [re.sub(r'\s+', ' ', text).strip() for text in texts if text]
+        normalized_texts = [text for text in normalized_texts if text]
+
+        payload = json.dumps(
+            {'texts': normalized_texts, 'params': params},
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Получение суммаризации из кэша или None"""
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+
+        try:
+            summary_text = db.get_cached_summary(key)
+        except Exception as e:
+            logger.error(f"Ошибка при чтении кэша суммаризаций: {e}")
+            summary_text = None
+
+        if summary_text is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._remember(key, summary_text)
+        return summary_text
+
+    def set(self, key, summary_text):
+        """Сохранение суммаризации в кэш"""
+        self._remember(key, summary_text)
+
+        try:
+            db.add_cached_summary(key, summary_text)
+        except Exception as e:
+            logger.error(f"Ошибка при записи в кэш суммаризаций: {e}")
+
+    def stats(self):
+        """Счетчики попаданий и промахов кэша"""
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'size': len(self.entries)
+        }
+
+    def _remember(self, key, summary_text):
+        """Добавление записи в память с вытеснением самых старых"""
+        self.entries[key] = summary_text
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+
+# Общий кэш суммаризаций процесса
+summary_cache = SummaryCache()
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+import logging
+import json
+import math
+import threading
+
+import database as db
+from message_batch import MessageBatch
+from summarizer.deduplicator import get_backend
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def vector_to_dict(matrix):
+    """Преобразование первой строки матрицы (разреженной или плотной) в словарь "координата -> значение" """
+    import numpy as np
+    from scipy import sparse
+
+    if sparse.issparse(matrix):
+        row = sparse.csr_matrix(matrix)[0]
+        return dict(zip(row.indices.tolist(), row.data.tolist()))
+
+    row = np.asarray(matrix, dtype=np.float32)[0]
+    indices = np.flatnonzero(row)
+    return dict(zip(indices.tolist(), row[indices].tolist()))
+
+class OnlineClusterer:
+    """
+    Онлайн-кластеризация сообщений при получении: сообщение присоединяется к
+    ближайшему открытому кластеру (по сходству с центроидом) или открывает новый.
+    Кластеры закрываются суммаризатором, когда он арендует все их сообщения.
+
+    Открытые кластеры общие для всех процессов-сборщиков: перед присоединением
+    сообщения кластеризатор загружает из базы кластеры, созданные, дополненные
+    или закрытые с прошлой синхронизации. Кластер дополняется, только если он не
+    изменился с момента синхронизации, а новый кластер создается, только если не
+    изменился ни один кластер; иначе выбор кластера повторяется.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.clusters = None  # ID кластера -> {'centroid': сумма векторов, 'size': размер, 'norm': норма суммы, 'revision': номер изменения}
+        self.postings = {}  # координата -> множество ID кластеров с ненулевым значением центроида
+        self.revision = 0  # Номер последнего изменения кластеров, загруженного из базы
+
+    def _load(self):
+        """Загрузка открытых кластеров из базы данных"""
+        self.clusters = {}
+        self.postings = {}
+
+        # Номер изменения читается до кластеров: изменения между запросами загрузятся при синхронизации
+        self.revision = db.get_cluster_revision()
+
+        for cluster in db.get_open_clusters():
+            centroid = dict(zip(cluster['centroid']['indices'], cluster['centroid']['values']))
+            self._remember(cluster['cluster_id'], centroid, cluster['size'], cluster['revision'])
+
+        logger.info(f"Загружено {len(self.clusters)} открытых кластеров")
+
+    def _sync(self):
+        """Загрузка кластеров, измененных другими процессами; закрытые кластеры удаляются из памяти"""
+        if self.clusters is None:
+            self._load()
+
+        for cluster in db.get_changed_clusters(self.revision):
+            self._forget(cluster['cluster_id'])
+
+            if cluster['status'] == 'open':
+                centroid = dict(zip(cluster['centroid']['indices'], cluster['centroid']['values']))
+                self._remember(cluster['cluster_id'], centroid, cluster['size'], cluster['revision'])
+
+            self.revision = max(self.revision, cluster['revision'])
+
+    def _remember(self, cluster_id, centroid, size, revision):
+        """Сохранение кластера в памяти и в инвертированном индексе"""
+        self._forget(cluster_id)
+
+        self.clusters[cluster_id] = {
+            'centroid': centroid,
+            'size': size,
+            'norm': math.sqrt(sum(value * value for value in centroid.values())),
+            'revision': revision
+        }
+        for index in centroid:
+            self.postings.setdefault(index, set()).add(cluster_id)
+
+    def _forget(self, cluster_id):
+        """Удаление кластера из памяти и из инвертированного индекса"""
+        cluster = self.clusters.pop(cluster_id, None)
+        if cluster is None:
+            return
+
+        for index in cluster['centroid']:
+            members = self.postings.get(index)
+            if members is not None:
+                members.discard(cluster_id)
+                if not members:
+                    del self.postings[index]
+
+    def _nearest(self, vector):
+        """Поиск открытого кластера с наибольшим косинусным сходством с вектором"""
+        scores = {}
+        for index, value in vector.items():
+            for cluster_id in self.postings.get(index, ()):
+                scores[cluster_id] = scores.get(cluster_id, 0.0) + value * self.clusters[cluster_id]['centroid'][index]
+
+        best_id, best_score = None, 0.0
+        for cluster_id, score in scores.items():
+            norm = self.clusters[cluster_id]['norm']
+            if norm and score / norm > best_score:
+                best_id, best_score = cluster_id, score / norm
+
+        return best_id, best_score
+
+    def assign(self, message_id, text, vector_representation=None):
+        """
+        Присоединение сообщения к открытому кластеру или создание нового
+
+        Args:
+            message_id (int): ID сообщения в базе данных
+            text (str): Текст сообщения
+            vector_representation (dict): Векторное представление, вычисленное при получении
+
+        Returns:
+            int: ID кластера или None в случае ошибки
+        """
+        try:
+            backend = get_backend()
+            vector = vector_to_dict(backend.encode(MessageBatch.from_messages([{
+                'message_id': message_id,
+                'message_text': text or '',
+                'vector_representation': vector_representation
+            }])))
+
+            with self.lock:
+                self._sync()
+
+                while True:
+                    cluster_id, score = self._nearest(vector)
+
+                    if cluster_id is None or score < backend.threshold:
+                        centroid, size = vector, 1
+                        created = db.create_cluster(message_id, centroid_to_json(centroid), self.revision)
+                        if created is not None:
+                            cluster_id, revision = created
+                            break
+                    else:
+                        # Центроид хранится как сумма векторов участников
+                        cluster = self.clusters[cluster_id]
+                        centroid = dict(cluster['centroid'])
+                        for index, value in vector.items():
+                            centroid[index] = centroid.get(index, 0.0) + value
+                        size = cluster['size'] + 1
+
+                        revision = db.add_message_to_cluster(
+                            cluster_id, message_id, centroid_to_json(centroid), size, cluster['revision']
+                        )
+                        if revision is not None:
+                            break
+
+                    # Кластеры изменил другой процесс (кластер дополнен, закрыт или
+                    # создан новый): выбираем кластер заново
+                    self._sync()
+
+                self._remember(cluster_id, centroid, size, revision)
+
+            return cluster_id
+
+        except Exception as e:
+            logger.error(f"Ошибка при кластеризации сообщения {message_id}: {e}")
+            return None
+
+    def close_batch(self, message_ids, owner, visibility_timeout):
+        """Закрытие кластеров арендованных сообщений целиком (см. database.close_batch_clusters)"""
+        with self.lock:
+            result = db.close_batch_clusters(message_ids, owner, visibility_timeout)
+            if self.clusters is not None:
+                self._sync()
+            return result
+
+def centroid_to_json(centroid):
+    """Преобразование центроида в формат для хранения в базе данных"""
+    return json.dumps({'indices': list(centroid.keys()), 'values': list(centroid.values())})
+
+def assign_message(message_id, text, vector_representation=None):
+    """Онлайн-кластеризация сообщения при получении"""
+    return online_clusterer.assign(message_id, text, vector_representation)
+
+def close_clusters(tasks, owner, visibility_timeout):
+    """
+    Закрытие кластеров сообщений арендованного пакета перед суммаризацией
+
+    Закрываются только кластеры, все сообщения которых в очереди арендованы
+    этим процессом, поэтому история не делится между пакетами и суммаризаторами.
+
+    Args:
+        tasks (list): Арендованные задачи суммаризации (payload - ID сообщения)
+        owner (str): Имя процесса-владельца аренды
+        visibility_timeout (float): Время аренды дополнительных задач в секундах
+
+    Returns:
+        list: Задачи пакета: арендованные без возвращенных в очередь и задачи
+        остальных сообщений закрытых кластеров
+    """
+    leased, deferred = online_clusterer.close_batch(
+        [task['payload'] for task in tasks], owner, visibility_timeout
+    )
+
+    if deferred:
+        logger.info(f"Возвращено в очередь {len(deferred)} сообщений кластеров, которые обрабатывает другой процесс")
+
+    deferred = set(deferred)
+    return [task for task in tasks if task['payload'] not in deferred] + leased
+
+def group_by_clusters(batch):
+    """
+    Группировка пакета по кластерам
+
+    Args:
+        batch (MessageBatch): Необработанные сообщения
+
+    Returns:
+        tuple: (список групп ID сообщений, пакет сообщений без кластера)
+    """
+    clusters = db.get_message_clusters(batch.ids)
+
+    groups = {}
+    unclustered = []
+    for row, message_id in enumerate(batch.ids):
+        cluster_id = clusters.get(message_id)
+        if cluster_id is None:
+            unclustered.append(row)
+        else:
+            groups.setdefault(cluster_id, []).append(message_id)
+
+    return list(groups.values()), batch.take(unclustered)
+
+# Общий онлайн-кластеризатор процесса
+online_clusterer = OnlineClusterer()
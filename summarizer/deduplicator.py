@@ -1,10 +1,15 @@
 # -*- coding: utf-8 -*-
 import logging
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-import numpy as np
+import zlib
+from abc import ABC, abstractmethod
 
-from config import SIMILARITY_THRESHOLD
+from config import (
+    SIMILARITY_THRESHOLD, SIMILARITY_BLOCK_SIZE, LSH_ENABLED, SIMILARITY_BACKEND,
+    EMBEDDING_DIM, EMBEDDING_NGRAM_RANGE, EMBEDDING_BATCH_SIZE, EMBEDDING_SIMILARITY_THRESHOLD,
+    ANN_TABLES, ANN_BITS, ANN_MIN_MESSAGES
+)
+from summarizer.minhash import candidate_pairs, normalize_text
+from summarizer.vectorizer import vectorizer, vectorize_messages
 
 # Настройка логирования
 logging.basicConfig(
@@ -13,95 +18,417 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def find_similar_messages(messages):
+class SimilarityBackend(ABC):
+    """
+    Базовый класс бэкенда сходства: превращает сообщения в L2-нормированные
+    векторы и предлагает пары-кандидатов для точного сравнения
+    """
+    
+    name = None
+    threshold = SIMILARITY_THRESHOLD
+    
+    @abstractmethod
+    def encode_texts(self, texts):
+        """Векторизация списка текстов (матрица с L2-нормированными строками)"""
+    
+    def encode(self, batch):
+        """Векторизация пакета сообщений (MessageBatch)"""
+        return self.encode_texts(batch.texts)
+    
+    def candidate_pairs(self, batch, matrix):
+        """Пары-кандидаты (i, j) или None, если нужно сравнить все пары"""
+        return None
+
+class TfidfBackend(SimilarityBackend):
+    """TF-IDF на хэшированном пространстве терминов с кандидатами из индекса MinHash/LSH"""
+    
+    name = 'tfidf'
+    
+    def encode_texts(self, texts):
+        return vectorizer.transform(texts)
+    
+    def encode(self, batch):
+        # Сохраненные при получении частоты терминов используются повторно
+        return vectorize_messages(batch)
+    
+    def candidate_pairs(self, batch, matrix):
+        return candidate_pairs(batch) if LSH_ENABLED else None
+
+class HashingEmbeddingBackend(SimilarityBackend):
+    """
+    Локальные эмбеддинги без сети и внешних моделей: символьные n-граммы
+    нормализованного текста хэшируются со знаком в плотный вектор фиксированной
+    размерности. Устойчивы к словоизменению и перестановке слов при перепечатке.
+    Векторы хранятся в float16, кандидаты ищутся приближенным индексом AnnIndex.
+    """
+    
+    name = 'hashing'
+    threshold = EMBEDDING_SIMILARITY_THRESHOLD
+    
+    def encode_texts(self, texts):
+        import numpy as np
+        
+        low, high = EMBEDDING_NGRAM_RANGE
+        embeddings = np.zeros((len(texts), EMBEDDING_DIM), dtype=np.float16)
+        
+        # Векторизуем пакетами, чтобы ограничить объем промежуточных float32-матриц
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            batch = texts[start:start + EMBEDDING_BATCH_SIZE]
+            block = np.zeros((len(batch), EMBEDDING_DIM), dtype=np.float32)
+            
+            for row, text in enumerate(batch):
+                normalized = f" {normalize_text(text)} "
+                hashes = np.array([
+                    zlib.crc32(normalized[i:i + size].encode('utf-8'))
+                    for size in range(low, high + 1)
+                    for i in range(len(normalized) - size + 1)
+                ], dtype=np.int64)
+                
+                if len(hashes):
+                    # Старший бит хэша задает знак, остаток - номер координаты
+                    signs = np.where(hashes & 0x80000000, 1.0, -1.0)
+                    np.add.at(block[row], hashes % EMBEDDING_DIM, signs)
+            
+            norms = np.linalg.norm(block, axis=1, keepdims=True)
+            norms[norms == 0] = 1
+            embeddings[start:start + len(batch)] = block / norms
+        
+        return embeddings
+    
+    def candidate_pairs(self, batch, matrix):
+        # На небольших пакетах полный блочный перебор быстрее построения индекса
+        if len(batch) < ANN_MIN_MESSAGES:
+            return None
+        
+        index = AnnIndex(matrix.shape[1])
+        index.add(matrix)
+        return index.candidate_pairs()
+
+class AnnIndex:
+    """
+    Приближенный поиск ближайших соседей по косинусному сходству: несколько таблиц
+    случайных гиперплоскостей (SimHash), похожие векторы с высокой вероятностью
+    попадают в общую корзину хотя бы одной таблицы
+    """
+    
+    def __init__(self, dim, tables=ANN_TABLES, bits=ANN_BITS, seed=1):
+        import numpy as np
+        
+        generator = np.random.RandomState(seed)
+        self.planes = generator.standard_normal((tables, dim, bits)).astype(np.float32)
+        self.powers = (1 << np.arange(bits)).astype(np.int64)
+        self.buckets = [{} for _ in range(tables)]
+        self.size = 0
+    
+    def _codes(self, vectors):
+        """Коды корзин векторов для каждой таблицы (массив tables x n)"""
+        import numpy as np
+        
+        vectors = np.asarray(vectors, dtype=np.float32)
+        return np.stack([(vectors @ planes > 0).astype(np.int64) @ self.powers for planes in self.planes])
+    
+    def add(self, vectors):
+        """Добавление векторов в индекс (номера присваиваются по порядку добавления)"""
+        codes = self._codes(vectors)
+        for table, table_codes in zip(self.buckets, codes):
+            for offset, code in enumerate(table_codes.tolist()):
+                table.setdefault(code, []).append(self.size + offset)
+        self.size += codes.shape[1]
+    
+    def query(self, vector):
+        """Номера векторов, попавших в общую корзину с запросом"""
+        codes = self._codes([vector])[:, 0].tolist()
+        candidates = set()
+        for table, code in zip(self.buckets, codes):
+            candidates.update(table.get(code, ()))
+        return candidates
+    
+    def candidate_pairs(self):
+        """Все пары (i, j), i < j, попавшие в общую корзину"""
+        pairs = set()
+        for table in self.buckets:
+            for members in table.values():
+                for position, i in enumerate(members):
+                    for j in members[position + 1:]:
+                        pairs.add((i, j))
+        return pairs
+
+# Доступные бэкенды сходства
+BACKENDS = {
+    TfidfBackend.name: TfidfBackend,
+    HashingEmbeddingBackend.name: HashingEmbeddingBackend
+}
+
+backend = None
+
+def get_backend():
+    """Получение бэкенда сходства, выбранного в SIMILARITY_BACKEND"""
+    global backend
+    
+    if backend is None:
+        if SIMILARITY_BACKEND not in BACKENDS:
+            logger.warning(f"Неизвестный бэкенд сходства {SIMILARITY_BACKEND}, используется tfidf")
+        backend = BACKENDS.get(SIMILARITY_BACKEND, TfidfBackend)()
+    
+    return backend
+
+def _as_computable(matrix):
+    """Разреженные матрицы - в CSR, плотные float16 - в float32 для быстрого умножения"""
+    import numpy as np
+    from scipy import sparse
+    
+    if sparse.issparse(matrix):
+        return sparse.csr_matrix(matrix)
+    return np.asarray(matrix, dtype=np.float32)
+
+def similarity_adjacency(matrix, threshold=SIMILARITY_THRESHOLD, block_size=SIMILARITY_BLOCK_SIZE):
+    """
+    Построение разреженной матрицы смежности пар с косинусным сходством не ниже порога
+    
+    Сходство считается блоками по block_size строк, в памяти хранятся только
+    пары выше порога, поэтому плотная матрица n x n никогда не создается.
+    
+    Args:
+        matrix: Матрица векторов сообщений с L2-нормированными строками
+        threshold (float): Порог сходства
+        block_size (int): Количество строк в одном блоке
+        
+    Returns:
+        scipy.sparse.csr_matrix: Булева матрица смежности n x n с отсортированными индексами
+    """
+    import numpy as np
+    from scipy import sparse
+    
+    matrix = _as_computable(matrix)
+    transposed = matrix.T.tocsr() if sparse.issparse(matrix) else matrix.T
+    size = matrix.shape[0]
+    
+    rows, cols = [], []
+    for start in range(0, size, block_size):
+        # Скалярные произведения нормированных векторов равны косинусному сходству
+        block = matrix[start:start + block_size] @ transposed
+        
+        if sparse.issparse(block):
+            block = block.tocoo()
+            mask = block.data >= threshold
+            block_rows, block_cols = block.row[mask], block.col[mask]
+        else:
+            block_rows, block_cols = np.nonzero(block >= threshold)
+        
+        rows.append(block_rows + start)
+        cols.append(block_cols)
+    
+    rows = np.concatenate(rows) if rows else np.array([], dtype=np.int64)
+    cols = np.concatenate(cols) if cols else np.array([], dtype=np.int64)
+    
+    adjacency = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)),
+        shape=(size, size)
+    )
+    adjacency.sort_indices()
+    
+    return adjacency
+
+def candidate_adjacency(matrix, pairs, threshold=SIMILARITY_THRESHOLD):
+    """
+    Построение матрицы смежности только по парам-кандидатам из индекса LSH
+    
+    Args:
+        matrix: Матрица векторов сообщений с L2-нормированными строками
+        pairs: Пары индексов строк (i, j) для точного сравнения
+        threshold (float): Порог сходства
+        
+    Returns:
+        scipy.sparse.csr_matrix: Симметричная булева матрица смежности n x n
+    """
+    import numpy as np
+    from scipy import sparse
+    
+    matrix = _as_computable(matrix)
+    size = matrix.shape[0]
+    
+    rows, cols = [], []
+    if pairs:
+        left, right = (np.array(side, dtype=np.int64) for side in zip(*sorted(pairs)))
+        
+        # Точное косинусное сходство для каждой пары
+        if sparse.issparse(matrix):
+            similarities = np.asarray(matrix[left].multiply(matrix[right]).sum(axis=1)).ravel()
+        else:
+            similarities = np.einsum('ij,ij->i', matrix[left], matrix[right])
+        mask = similarities >= threshold
+        rows = np.concatenate([left[mask], right[mask]])
+        cols = np.concatenate([right[mask], left[mask]])
+    
+    adjacency = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)),
+        shape=(size, size)
+    )
+    adjacency.sort_indices()
+    
+    return adjacency
+
+def group_by_adjacency(adjacency, message_ids):
+    """
+    Жадная группировка по матрице смежности: сообщение открывает группу
+    и забирает в нее всех еще не распределенных похожих соседей
+    
+    Args:
+        adjacency: Булева матрица смежности (scipy.sparse.csr_matrix)
+        message_ids (list): ID сообщений в порядке строк матрицы
+        
+    Returns:
+        list: Список групп (каждая группа - список ID сообщений)
+    """
+    import numpy as np
+    
+    assigned = np.zeros(len(message_ids), dtype=bool)
+    groups = []
+    
+    for i in range(len(message_ids)):
+        if assigned[i]:
+            continue
+        
+        # Создаем новую группу
+        assigned[i] = True
+        neighbors = adjacency.indices[adjacency.indptr[i]:adjacency.indptr[i + 1]]
+        neighbors = neighbors[~assigned[neighbors]]
+        assigned[neighbors] = True
+        
+        groups.append([message_ids[i]] + [message_ids[j] for j in neighbors])
+    
+    return groups
+
+def find_similar_messages(batch):
     """
     Группировка похожих сообщений
     
     Args:
-        messages (list): Список сообщений для группировки
+        batch (MessageBatch): Пакет сообщений для группировки
         
     Returns:
         list: Список групп похожих сообщений (каждая группа - список ID сообщений)
     """
     try:
-        if not messages:
+        if not len(batch):
             return []
         
-        # Извлекаем тексты сообщений
-        texts = [m['message_text'] for m in messages]
-        message_ids = [m['message_id'] for m in messages]
+        message_ids = batch.ids.tolist()
         
         # Если сообщений меньше 2, возвращаем одну группу
-        if len(texts) < 2:
+        if len(batch) < 2:
             return [message_ids]
         
-        # Создаем векторизатор TF-IDF
-        vectorizer = TfidfVectorizer(stop_words='english')
+        similarity_backend = get_backend()
         
-        # Преобразуем тексты в векторы TF-IDF
+        # Векторы сообщений (строки нормированы по L2)
         try:
-            tfidf_matrix = vectorizer.fit_transform(texts)
+            matrix = similarity_backend.encode(batch)
         except Exception as e:
             logger.error(f"Ошибка при векторизации текстов: {e}")
             # В случае ошибки векторизации возвращаем каждое сообщение как отдельную группу
             return [[message_id] for message_id in message_ids]
         
-        # Вычисляем матрицу сходства
-        similarity_matrix = cosine_similarity(tfidf_matrix)
-        
-        # Группируем похожие сообщения
-        groups = []
-        processed = set()
+        # Находим только пары со сходством выше порога и группируем похожие сообщения
+        pairs = similarity_backend.candidate_pairs(batch, matrix)
+        if pairs is not None:
+            # Индекс отбирает кандидатов, точное сходство считается только для них
+            adjacency = candidate_adjacency(matrix, pairs, similarity_backend.threshold)
+        else:
+            adjacency = similarity_adjacency(matrix, similarity_backend.threshold)
         
-        for i in range(len(messages)):
-            if i in processed:
-                continue
-            
-            # Создаем новую группу
-            group = [message_ids[i]]
-            processed.add(i)
-            
-            # Ищем похожие сообщения
-            for j in range(len(messages)):
-                if j in processed or i == j:
-                    continue
-                
-                # Если сходство выше порогового значения, добавляем в группу
-                if similarity_matrix[i, j] >= SIMILARITY_THRESHOLD:
-                    group.append(message_ids[j])
-                    processed.add(j)
-            
-            groups.append(group)
-        
-        return groups
+        return group_by_adjacency(adjacency, message_ids)
     
     except Exception as e:
         logger.error(f"Ошибка при поиске похожих сообщений: {e}")
         # В случае ошибки возвращаем каждое сообщение как отдельную группу
-        return [[m['message_id']] for m in messages]
+        return [[message_id] for message_id in batch.ids]
+
+def _to_matrix(items):
+    """Приведение текста, списка текстов или готовых векторов к матрице выбранного бэкенда"""
+    import numpy as np
+    from scipy import sparse
+    
+    if isinstance(items, str):
+        items = [items]
+    
+    if sparse.issparse(items) or isinstance(items, np.ndarray):
+        return _as_computable(items)
+    
+    return _as_computable(get_backend().encode_texts(list(items)))
+
+def similarity_matrix(queries, candidates):
+    """
+    Попарное сходство M запросов с N кандидатами за одну векторизацию и одно умножение
+    
+    Args:
+        queries: Текст, список текстов или матрица векторов (M строк)
+        candidates: Список текстов или матрица векторов (N строк)
+        
+    Returns:
+        numpy.ndarray: Матрица косинусного сходства M x N (значения от -1 до 1; у бэкенда tfidf
+        векторы неотрицательны и значения от 0 до 1)
+    """
+    query_matrix = _to_matrix(queries)
+    candidate_matrix = _to_matrix(candidates)
+    
+    # Строки нормированы по L2, поэтому произведение равно косинусному сходству
+    product = query_matrix @ candidate_matrix.T
+    
+    return product.toarray() if hasattr(product, 'toarray') else product
+
+def similarity_scores(query, candidates):
+    """
+    Сходство одного запроса с N кандидатами
+    
+    Args:
+        query: Текст запроса или вектор (матрица из одной строки)
+        candidates: Список текстов или матрица векторов
+        
+    Returns:
+        numpy.ndarray: Массив сходства длины N
+    """
+    return similarity_matrix(query, candidates)[0]
+
+def top_k_similar(query, candidates, k=5):
+    """
+    Поиск k наиболее похожих кандидатов
+    
+    Args:
+        query: Текст запроса или вектор
+        candidates: Список текстов или матрица векторов
+        k (int): Количество результатов
+        
+    Returns:
+        list: Пары (индекс кандидата, сходство) по убыванию сходства
+    """
+    import numpy as np
+    
+    scores = similarity_scores(query, candidates)
+    if not len(scores):
+        return []
+    
+    k = min(k, len(scores))
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    
+    return [(int(index), float(scores[index])) for index in top]
 
 def calculate_text_similarity(text1, text2):
     """
     Вычисление сходства между двумя текстами
     
+    Для сравнения одного текста с многими используйте similarity_scores.
+    
     Args:
         text1 (str): Первый текст
         text2 (str): Второй текст
         
     Returns:
-        float: Значение сходства (от 0 до 1)
+        float: Косинусное сходство (от -1 до 1, у бэкенда tfidf - от 0 до 1)
     """
     try:
-        # Создаем векторизатор TF-IDF
-        vectorizer = TfidfVectorizer(stop_words='english')
-        
-        # Преобразуем тексты в векторы TF-IDF
-        tfidf_matrix = vectorizer.fit_transform([text1, text2])
-        
-        # Вычисляем сходство
-        similarity = cosine_similarity(tfidf_matrix[0:1], tfidf_matrix[1:2])[0][0]
-        
-        return similarity
+        return float(similarity_scores(text1, [text2])[0])
     
     except Exception as e:
         logger.error(f"Ошибка при вычислении сходства текстов: {e}")
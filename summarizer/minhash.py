@@ -0,0 +1,193 @@
+# -*- coding: utf-8 -*-
+import logging
+import hashlib
+import re
+import zlib
+
+import database as db
+from config import MINHASH_SHINGLE_SIZE, LSH_BANDS, LSH_ROWS_PER_BAND
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Количество хэш-функций в сигнатуре MinHash
+NUM_PERMUTATIONS = LSH_BANDS * LSH_ROWS_PER_BAND
+
+# Простое число больше 2^32 для универсального хэширования a * x + b mod p
+MERSENNE_PRIME = 4294967311
+MAX_HASH = 0xFFFFFFFF
+
+# Коэффициенты хэш-функций (фиксированный seed - сигнатуры должны совпадать между запусками)
+permutations = None
+
+def get_permutations():
+    """Получение коэффициентов хэш-функций MinHash"""
+    global permutations
+
+    if permutations is None:
+        import numpy as np
+
+        generator = np.random.RandomState(1)
+        a = generator.randint(1, MAX_HASH, size=NUM_PERMUTATIONS, dtype=np.uint64)
+        b = generator.randint(0, MAX_HASH, size=NUM_PERMUTATIONS, dtype=np.uint64)
+        permutations = (a, b)
+
+    return permutations
+
+def normalize_text(text):
+    """
+    Нормализация текста перед разбиением на шинглы
+
+    Args:
+        text (str): Исходный текст сообщения
+
+    Returns:
+        str: Текст в нижнем регистре без ссылок, пунктуации и лишних пробелов
+    """
+    text = (text or '').lower().replace('ё', 'е')
+    text = re.sub(r'https?://\S+|t\.me/\S+', ' ', text)
+    text = re.sub(r'[^\w\s]', ' ', text)
+    return re.sub(r'\s+', ' ', text).strip()
+
+def compute_signature(text):
+    """
+    Вычисление сигнатуры MinHash по символьным шинглам нормализованного текста
+
+    Args:
+        text (str): Текст сообщения
+
+    Returns:
+        numpy.ndarray: Сигнатура (uint32) или None для пустого текста
+    """
+    import numpy as np
+
+    normalized = normalize_text(text)
+    if not normalized:
+        return None
+
+    size = MINHASH_SHINGLE_SIZE
+    shingles = {normalized[i:i + size] for i in range(max(1, len(normalized) - size + 1))}
+    hashes = np.array([zlib.crc32(shingle.encode('utf-8')) for shingle in shingles], dtype=np.uint64)
+
+    a, b = get_permutations()
+    permuted = (a[:, None] * hashes[None, :] + b[:, None]) % np.uint64(MERSENNE_PRIME)
+
+    return (permuted & np.uint64(MAX_HASH)).min(axis=1).astype(np.uint32)
+
+def signature_from_bytes(data):
+    """Восстановление сигнатуры из BLOB"""
+    import numpy as np
+    return np.frombuffer(data, dtype=np.uint32)
+
+def band_buckets(signature):
+    """
+    Разбиение сигнатуры на полосы LSH
+
+    Args:
+        signature (numpy.ndarray): Сигнатура MinHash
+
+    Returns:
+        list: Пары (номер полосы, хэш корзины)
+    """
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS_PER_BAND:(band + 1) * LSH_ROWS_PER_BAND]
+        digest = hashlib.blake2b(rows.tobytes(), digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, 'little', signed=True)))
+    return buckets
+
+def estimate_similarity(signature1, signature2):
+    """Оценка коэффициента Жаккара по двум сигнатурам"""
+    return float((signature1 == signature2).mean())
+
+def index_message(message_id, text):
+    """
+    Вычисление сигнатуры сообщения и добавление ее в индекс LSH (вызывается при получении сообщения)
+
+    По индексу скользящее окно находит почти-дубликаты среди доставленных
+    сообщений прошлых пакетов; внутри пакета корзины строятся в памяти
+    в candidate_pairs.
+
+    Args:
+        message_id (int): ID сообщения в базе данных
+        text (str): Текст сообщения
+
+    Returns:
+        numpy.ndarray: Сигнатура или None, если текст пустой
+    """
+    try:
+        signature = compute_signature(text)
+        if signature is None:
+            return None
+
+        db.add_message_signature(message_id, signature.tobytes(), band_buckets(signature))
+        return signature
+
+    except Exception as e:
+        logger.error(f"Ошибка при индексации сообщения {message_id}: {e}")
+        return None
+
+def get_signatures(batch, index_missing=False):
+    """
+    Получение сигнатур сообщений: сохраненных при получении или вычисленных на лету
+
+    Args:
+        batch (MessageBatch): Пакет сообщений
+        index_missing (bool): Добавить вычисленные на лету сигнатуры в индекс LSH
+
+    Returns:
+        dict: ID сообщения -> сигнатура (сообщения с пустым текстом пропускаются)
+    """
+    stored = db.get_message_signatures(batch.ids)
+
+    signatures = {}
+    missing = []
+    for message_id, text in zip(batch.ids, batch.texts):
+        if message_id in stored:
+            signature = signature_from_bytes(stored[message_id])
+        else:
+            signature = compute_signature(text)
+            if index_missing and signature is not None:
+                missing.append((message_id, signature.tobytes(), band_buckets(signature)))
+
+        if signature is not None:
+            signatures[message_id] = signature
+
+    db.add_message_signatures(missing)
+
+    return signatures
+
+def candidate_pairs(batch):
+    """
+    Генерация пар-кандидатов в пакете сообщений по корзинам LSH
+
+    Сигнатуры берутся из базы данных, отсутствующие вычисляются на лету.
+
+    Args:
+        batch (MessageBatch): Пакет сообщений
+
+    Returns:
+        set: Пары индексов (i, j), i < j, попавших в общую корзину
+    """
+    signatures = get_signatures(batch)
+
+    buckets = {}
+    for index, message_id in enumerate(batch.ids):
+        signature = signatures.get(message_id)
+        if signature is None:
+            continue
+
+        for bucket in band_buckets(signature):
+            buckets.setdefault(bucket, []).append(index)
+
+    pairs = set()
+    for members in buckets.values():
+        for position, i in enumerate(members):
+            for j in members[position + 1:]:
+                pairs.add((i, j))
+
+    return pairs
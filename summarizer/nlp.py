@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+import logging
+import re
+
+from config import NLTK_DATA_DIR
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Модуль nltk и его ресурсы загружаются лениво при первом использовании
+nltk = None
+punkt_available = False
+stop_words = set()
+stop_words_by_language = {}
+nltk_resources_loaded = False
+
+def load_nltk_resources():
+    """
+    Загрузка ресурсов NLTK из локального каталога без обращения к сети
+
+    Вызывается при первом использовании токенизации и в каждом рабочем процессе.
+    Если ресурсы не найдены, используются упрощенные токенизаторы.
+    """
+    global nltk, punkt_available, stop_words, nltk_resources_loaded
+
+    if nltk_resources_loaded:
+        return
+
+    import nltk as nltk_module
+    nltk = nltk_module
+
+    # Ищем данные NLTK в первую очередь в локальном каталоге приложения
+    if NLTK_DATA_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DATA_DIR)
+
+    try:
+        nltk.data.find('tokenizers/punkt')
+        punkt_available = True
+    except LookupError:
+        punkt_available = False
+        logger.warning(f"Токенизатор punkt не найден в {NLTK_DATA_DIR}, используется упрощенная токенизация")
+
+    # Получаем стоп-слова для русского языка
+    try:
+        stop_words = set(nltk.corpus.stopwords.words('russian'))
+    except:
+        stop_words = set()
+        logger.warning("Не удалось загрузить стоп-слова для русского языка")
+
+    nltk_resources_loaded = True
+
+def get_stop_words(language='russian'):
+    """Получение множества стоп-слов для языка (по умолчанию - русского)"""
+    load_nltk_resources()
+
+    if language == 'russian':
+        return stop_words
+
+    if language not in stop_words_by_language:
+        try:
+            stop_words_by_language[language] = set(nltk.corpus.stopwords.words(language))
+        except:
+            stop_words_by_language[language] = set()
+            logger.warning(f"Не удалось загрузить стоп-слова для языка {language}")
+
+    return stop_words_by_language[language]
+
+def sent_tokenize(text):
+    """Разбиение текста на предложения"""
+    load_nltk_resources()
+
+    if punkt_available:
+        return nltk.sent_tokenize(text)
+
+    # Упрощенное разбиение по знакам конца предложения
+    return [sentence for sentence in re.split(r'(?<=[.!?…])\s+', text.strip()) if sentence]
+
+def word_tokenize(text):
+    """Разбиение текста на слова"""
+    load_nltk_resources()
+
+    # Без punkt токенизируем текст как одну строку (без предварительного разбиения на предложения)
+    return nltk.word_tokenize(text, preserve_line=not punkt_available)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import logging
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import SUMMARIZER_WORKERS
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Пул процессов для тяжелых вычислений (токенизация, TF-IDF, ранжирование)
+executor = None
+
+def _init_worker():
+    """Инициализация рабочего процесса: предварительная загрузка ресурсов NLTK"""
+    from summarizer.nlp import load_nltk_resources
+    load_nltk_resources()
+
+def _warm_up_worker():
+    """Предварительный импорт тяжелых зависимостей в рабочем процессе"""
+    import numpy
+    import scipy.sparse
+    from summarizer.vectorizer import vectorizer
+    vectorizer.refresh()
+
+def get_executor():
+    """Получение или создание пула рабочих процессов"""
+    global executor
+
+    if executor is None:
+        # Используем spawn, чтобы не копировать потоки и клиенты Telethon основного процесса
+        executor = ProcessPoolExecutor(
+            max_workers=SUMMARIZER_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker
+        )
+        logger.info(f"Запущен пул из {SUMMARIZER_WORKERS} рабочих процессов")
+
+    return executor
+
+async def run_in_pool(func, *args):
+    """
+    Выполнение функции в пуле рабочих процессов без блокировки цикла событий
+
+    Args:
+        func: Функция уровня модуля (должна сериализоваться через pickle)
+        *args: Аргументы функции
+
+    Returns:
+        Результат выполнения функции
+    """
+    global executor
+
+    loop = asyncio.get_running_loop()
+    try:
+        return await loop.run_in_executor(get_executor(), func, *args)
+    except BrokenProcessPool:
+        # Рабочий процесс упал - пересоздадим пул при следующем вызове
+        logger.error("Пул рабочих процессов поврежден, он будет пересоздан")
+        executor = None
+        raise
+
+async def warm_up_pool():
+    """Фоновый запуск рабочих процессов и загрузка в них тяжелых зависимостей"""
+    try:
+        await asyncio.gather(*[run_in_pool(_warm_up_worker) for _ in range(SUMMARIZER_WORKERS)])
+        logger.info("Рабочие процессы суммаризации готовы")
+    except Exception as e:
+        logger.error(f"Ошибка при прогреве пула рабочих процессов: {e}")
+
+def shutdown_pool():
+    """Остановка пула рабочих процессов"""
+    global executor
+
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+        executor = None
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+import logging
+import re
+from array import array
+
+import database as db
+from summarizer import nlp
+from summarizer.vectorizer import term_id, vectorizer
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Языки, для которых есть стеммер и стоп-слова (код -> название в NLTK)
+LANGUAGES = {'ru': 'russian', 'en': 'english'}
+DEFAULT_LANGUAGE = 'ru'
+
+# Разметка Telegram (markdown Telethon): [текст](ссылка), жирный, курсив, зачеркнутый, код, спойлер
+MARKDOWN_LINK_PATTERN = re.compile(r'\[([^\]]*)\]\([^)]*\)')
+MARKUP_PATTERN = re.compile(r'```|\*\*|__|~~|`|\|\|')
+LINK_PATTERN = re.compile(r'https?://\S+|www\.\S+|t\.me/\S+')
+EMOJI_PATTERN = re.compile(
+    '[\U0001F000-\U0001FAFF\U00002600-\U000027BF\U00002B00-\U00002BFF\U0000FE0F\U0000200D\U000020E3]+'
+)
+
+def clean_text(text):
+    """
+    Очистка текста сообщения от разметки Telegram, ссылок и эмодзи
+
+    Args:
+        text (str): Исходный текст сообщения
+
+    Returns:
+        str: Очищенный текст (переводы строк сохраняются как границы абзацев)
+    """
+    text = MARKDOWN_LINK_PATTERN.sub(r'\1', text or '')
+    text = MARKUP_PATTERN.sub('', text)
+    text = LINK_PATTERN.sub(' ', text)
+    text = EMOJI_PATTERN.sub(' ', text)
+    text = re.sub(r'[ \t\r\f\v]+', ' ', text)
+    text = re.sub(r' *\n[\s]*', '\n', text)
+    return text.strip()
+
+def detect_language(text):
+    """
+    Определение языка текста по соотношению кириллических и латинских букв
+
+    Args:
+        text (str): Очищенный текст
+
+    Returns:
+        str: Код языка ('ru', 'en') или None, если букв нет
+    """
+    cyrillic = len(re.findall(r'[а-яё]', text, re.IGNORECASE))
+    latin = len(re.findall(r'[a-z]', text, re.IGNORECASE))
+
+    if not cyrillic and not latin:
+        return None
+
+    return 'ru' if cyrillic >= latin else 'en'
+
+def split_sentences(text):
+    """
+    Разбиение очищенного текста на предложения
+
+    Каждая строка (заголовок, пункт списка) разбивается отдельно.
+
+    Returns:
+        list: Пары (начало, конец) - смещения предложений в тексте
+    """
+    spans = []
+    offset = 0
+    for line in text.split('\n'):
+        position = 0
+        for sentence in nlp.sent_tokenize(line):
+            start = line.find(sentence, position)
+            if start < 0:
+                continue
+            position = start + len(sentence)
+            spans.append((offset + start, offset + position))
+        offset += len(line) + 1
+    return spans
+
+def preprocess_text(text):
+    """
+    Нормализация и токенизация сообщения (выполняется один раз при получении)
+
+    Args:
+        text (str): Исходный текст сообщения
+
+    Returns:
+        dict: Документ: язык, очищенный текст, предложения и номера терминов каждого предложения
+    """
+    cleaned = clean_text(text)
+    language = detect_language(cleaned)
+    spans = split_sentences(cleaned) if cleaned else []
+
+    sentences = [cleaned[start:end] for start, end in spans]
+    tokens = [
+        array('I', [term_id(term) for term in vectorizer.tokenize(sentence, LANGUAGES[language or DEFAULT_LANGUAGE])])
+        for sentence in sentences
+    ]
+
+    return {
+        'language': language,
+        'text': cleaned,
+        'spans': spans,
+        'sentences': sentences,
+        'tokens': tokens
+    }
+
+def document_counts(document):
+    """Подсчет терминов документа (для векторного представления сообщения)"""
+    counts = {}
+    for sentence_tokens in document['tokens']:
+        for index in sentence_tokens:
+            counts[index] = counts.get(index, 0) + 1
+    return counts
+
+def document_to_record(document):
+    """
+    Упаковка документа в компактные массивы для хранения в message_tokens
+
+    Returns:
+        tuple: (язык, очищенный текст, границы предложений, номера терминов, смещения терминов по предложениям)
+    """
+    spans = array('I', [position for span in document['spans'] for position in span])
+    token_ids = array('I')
+    token_offsets = array('I', [0])
+    for sentence_tokens in document['tokens']:
+        token_ids.extend(sentence_tokens)
+        token_offsets.append(len(token_ids))
+
+    return (
+        document['language'],
+        document['text'],
+        spans.tobytes(),
+        token_ids.tobytes(),
+        token_offsets.tobytes()
+    )
+
+def document_from_record(record):
+    """Восстановление документа из строки таблицы message_tokens"""
+    spans = array('I')
+    spans.frombytes(record['sentence_spans'])
+    token_ids = array('I')
+    token_ids.frombytes(record['token_ids'])
+    token_offsets = array('I')
+    token_offsets.frombytes(record['token_offsets'])
+
+    text = record['clean_text']
+    pairs = list(zip(spans[::2], spans[1::2]))
+
+    return {
+        'language': record['language'],
+        'text': text,
+        'spans': pairs,
+        'sentences': [text[start:end] for start, end in pairs],
+        'tokens': [token_ids[token_offsets[i]:token_offsets[i + 1]] for i in range(len(pairs))]
+    }
+
+def store_document(message_id, document):
+    """Сохранение результата предобработки сообщения"""
+    try:
+        db.add_message_tokens(message_id, *document_to_record(document))
+    except Exception as e:
+        logger.error(f"Ошибка при сохранении токенов сообщения {message_id}: {e}")
+
+def get_documents(message_ids):
+    """
+    Получение предобработанных документов для сообщений
+
+    Args:
+        message_ids: ID сообщений
+
+    Returns:
+        dict: ID сообщения -> документ (сообщения без сохраненных токенов пропускаются)
+    """
+    try:
+        records = db.get_message_tokens(message_ids)
+        return {message_id: document_from_record(record) for message_id, record in records.items()}
+
+    except Exception as e:
+        logger.error(f"Ошибка при получении токенов сообщений: {e}")
+        return {}
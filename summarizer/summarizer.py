@@ -1,16 +1,21 @@
 # -*- coding: utf-8 -*-
 import logging
-import nltk
 import asyncio
 from datetime import datetime, timedelta
-import re
-from collections import Counter
-from string import punctuation
-import heapq
 
 import database as db
 from summarizer.deduplicator import find_similar_messages
 from channel_manager.fetcher import get_best_images
+from summarizer.pool import run_in_pool
+from summarizer.cache import summary_cache
+from summarizer.preprocessing import preprocess_text, get_documents
+from summarizer.window import find_delivered, remember_delivered
+from summarizer.clustering import close_clusters, group_by_clusters
+from config import (
+    SUMMARIZATION_BATCH_SIZE, SUMMARIZATION_FAN_IN, HIERARCHICAL_SUMMARIZATION_THRESHOLD,
+    CROSS_BATCH_DEDUP_MODE, ONLINE_CLUSTERING_ENABLED, CLUSTER_SUMMARY_REFRESH_INTERVAL,
+    SUMMARIZATION_INTERVAL, SUMMARIZATION_MESSAGE_LIMIT, QUEUE_VISIBILITY_TIMEOUT, WORKER_ID
+)
 
 # Настройка логирования
 logging.basicConfig(
@@ -19,35 +24,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Загружаем необходимые ресурсы для NLTK
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('corpora/stopwords')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('stopwords')
+# Версия алгоритма суммаризации (входит в ключ кэша, увеличивается при изменении алгоритма)
+ALGORITHM_VERSION = 3
 
-# Получаем стоп-слова для русского языка
-try:
-    stop_words = set(nltk.corpus.stopwords.words('russian'))
-except:
-    stop_words = set()
-    logger.warning("Не удалось загрузить стоп-слова для русского языка")
+# Текст, возвращаемый при ошибке суммаризации (не кэшируется)
+SUMMARY_ERROR_TEXT = "Не удалось создать суммаризацию из-за ошибки."
 
-async def summarize_messages(messages, sentences_count=5):
+def summarize_text(texts, sentences_count=5):
     """
-    Суммаризация текста сообщений с использованием частотного анализа
+    Суммаризация текстов с использованием частотного анализа (синхронная, выполняется в рабочем процессе)
     
     Args:
-        messages (list): Список сообщений для суммаризации
+        texts (list): Список текстов сообщений или документов, предобработанных при получении
         sentences_count (int): Количество предложений в суммаризации
         
     Returns:
         str: Суммаризированный текст
     """
+    # Тяжелые зависимости загружаются только в рабочем процессе при первом вызове
+    import numpy as np
+    from scipy import sparse
+    
     try:
-        # Объединяем тексты всех сообщений
-        combined_text = "\n\n".join([m['message_text'] for m in messages if m['message_text']])
+        # Тексты без сохраненной предобработки (например, суммаризации на
+        # следующем уровне иерархии) обрабатываются здесь же
+        documents = [
+            text if isinstance(text, dict) else preprocess_text(text)
+            for text in texts if text
+        ]
+        documents = [document for document in documents if document['text']]
+        
+        # Объединяем очищенные тексты всех сообщений
+        combined_text = "\n\n".join([document['text'] for document in documents])
         
         if not combined_text.strip():
             logger.warning("Нет текста для суммаризации")
@@ -58,99 +66,326 @@ async def summarize_messages(messages, sentences_count=5):
             logger.warning("Текст слишком короткий для суммаризации")
             return combined_text
         
-        # Разбиваем текст на предложения
-        sentences = nltk.sent_tokenize(combined_text)
+        # Предложения и их термины уже выделены при предобработке
+        sentences = [sentence for document in documents for sentence in document['sentences']]
+        sentence_tokens = [tokens for document in documents for tokens in document['tokens']]
         
         # Если предложений меньше, чем требуется для суммаризации, возвращаем весь текст
         if len(sentences) <= sentences_count:
             return combined_text
         
-        # Очищаем текст от пунктуации и стоп-слов
-        clean_text = re.sub(r'[^\w\s]', '', combined_text.lower())
-        word_tokens = nltk.word_tokenize(clean_text)
-        filtered_text = [word for word in word_tokens if word not in stop_words]
-        
-        # Считаем частоту слов
-        word_frequencies = Counter(filtered_text)
-        
-        # Нормализуем частоты
-        max_frequency = max(word_frequencies.values()) if word_frequencies else 1
-        for word in word_frequencies:
-            word_frequencies[word] = word_frequencies[word] / max_frequency
-        
-        # Считаем веса предложений
-        sentence_scores = {}
-        for sentence in sentences:
-            for word in nltk.word_tokenize(sentence.lower()):
-                if word in word_frequencies:
-                    if len(sentence.split()) < 30:  # Игнорируем слишком длинные предложения
-                        if sentence not in sentence_scores:
-                            sentence_scores[sentence] = 0
-                        sentence_scores[sentence] += word_frequencies[word]
-        
-        # Выбираем предложения с наибольшим весом
-        summary_sentences = heapq.nlargest(sentences_count, sentence_scores, key=sentence_scores.get)
-        
-        # Восстанавливаем порядок предложений в исходном тексте
-        ordered_summary = []
-        for sentence in sentences:
-            if sentence in summary_sentences:
-                ordered_summary.append(sentence)
-                if len(ordered_summary) == sentences_count:
-                    break
-        
-        # Объединяем предложения в текст
-        summary = " ".join(ordered_summary)
+        # Строим разреженную матрицу "предложение x термин" по номерам терминов
+        lengths = np.array([len(tokens) for tokens in sentence_tokens])
+        if not lengths.sum():
+            return ""
+        
+        rows = np.repeat(np.arange(len(sentences)), lengths)
+        term_ids = np.concatenate([np.frombuffer(tokens, dtype=np.uint32) for tokens in sentence_tokens if len(tokens)])
+        vocabulary, cols = np.unique(term_ids, return_inverse=True)
+        
+        matrix = sparse.csr_matrix(
+            (np.ones(len(cols)), (rows, cols)), shape=(len(sentences), len(vocabulary))
+        )
+        
+        # Считаем частоты терминов. Нормализация на максимальную частоту не меняет
+        # ранжирование, поэтому веса считаются в целых числах - без ошибок округления
+        word_frequencies = np.asarray(matrix.sum(axis=0)).ravel()
+        
+        # Считаем веса всех предложений одним умножением матрицы на вектор
+        sentence_scores = matrix @ word_frequencies
+        
+        # Игнорируем слишком длинные предложения и предложения без значимых слов
+        sentence_lengths = np.array([len(sentence.split()) for sentence in sentences])
+        eligible = (sentence_lengths < 30) & (lengths > 0)
+        
+        # Выбираем предложения с наибольшим весом (при равенстве - более ранние)
+        candidates = np.flatnonzero(eligible)
+        order = np.argsort(-sentence_scores[candidates], kind='stable')
+        summary_indices = np.sort(candidates[order[:sentences_count]])
+        
+        # Объединяем предложения в текст в исходном порядке
+        summary = " ".join(sentences[index] for index in summary_indices)
         
         return summary
     
     except Exception as e:
         logger.error(f"Ошибка при суммаризации сообщений: {e}")
-        return "Не удалось создать суммаризацию из-за ошибки."
+        return SUMMARY_ERROR_TEXT
+
+def summarize_groups(groups_texts, sentences_count=5):
+    """
+    Суммаризация пакета групп в одном рабочем процессе
+    
+    Args:
+        groups_texts (list): Список групп, каждая группа - список текстов
+        sentences_count (int): Количество предложений в суммаризации
+        
+    Returns:
+        list: Суммаризации в порядке следования групп
+    """
+    return [summarize_text(texts, sentences_count) for texts in groups_texts]
+
+async def summarize_messages(batch, sentences_count=5):
+    """
+    Суммаризация текста сообщений с использованием частотного анализа
+    
+    Args:
+        batch (MessageBatch): Пакет сообщений для суммаризации
+        sentences_count (int): Количество предложений в суммаризации
+        
+    Returns:
+        str: Суммаризированный текст
+    """
+    try:
+        # Используем предобработку, сохраненную при получении сообщений
+        documents = get_documents(batch.ids)
+        texts = [documents.get(message_id) or text for message_id, text in zip(batch.ids, batch.texts)]
+        
+        # Вычисления выполняются в пуле процессов, цикл событий только ожидает результат
+        return await run_in_pool(summarize_text, texts, sentences_count)
+    
+    except Exception as e:
+        logger.error(f"Ошибка при суммаризации сообщений: {e}")
+        return SUMMARY_ERROR_TEXT
+
+async def summarize_message_groups(groups_texts, sentences_count=5):
+    """
+    Суммаризация групп сообщений пакетами в пуле процессов
+    
+    Args:
+        groups_texts (list): Список групп, каждая группа - список текстов
+        sentences_count (int): Количество предложений в суммаризации
+        
+    Returns:
+        list: Суммаризации в порядке следования групп
+    """
+    # Разбиваем группы на пакеты, чтобы загрузить все рабочие процессы
+    batches = [
+        groups_texts[i:i + SUMMARIZATION_BATCH_SIZE]
+        for i in range(0, len(groups_texts), SUMMARIZATION_BATCH_SIZE)
+    ]
+    
+    results = await asyncio.gather(*[
+        run_in_pool(summarize_groups, batch, sentences_count) for batch in batches
+    ])
+    
+    return [summary for batch_result in results for summary in batch_result]
+
+async def summarize_hierarchical(texts, sentences_count=5, fan_in=SUMMARIZATION_FAN_IN):
+    """
+    Иерархическая (map-reduce) суммаризация большой группы сообщений
+    
+    Каждое сообщение суммаризируется отдельно, затем суммаризации объединяются
+    порциями по fan_in и суммаризируются повторно, пока не останется одна.
+    Объем работы на каждой задаче ограничен fan_in * sentences_count предложений.
+    
+    Args:
+        texts (list): Тексты (или предобработанные документы) сообщений группы
+        sentences_count (int): Количество предложений в суммаризации
+        fan_in (int): Количество суммаризаций, объединяемых на следующем уровне
+        
+    Returns:
+        str: Суммаризированный текст
+    """
+    fan_in = max(2, fan_in)
+    
+    # Map: суммаризируем каждое сообщение независимо
+    level = await summarize_message_groups([[text] for text in texts if text], sentences_count)
+    
+    # Reduce: объединяем суммаризации порциями, пока их больше fan_in
+    while True:
+        level = [summary for summary in level if summary and summary != SUMMARY_ERROR_TEXT]
+        
+        if len(level) <= fan_in:
+            break
+        
+        chunks = [level[i:i + fan_in] for i in range(0, len(level), fan_in)]
+        level = await summarize_message_groups(chunks, sentences_count)
+    
+    return (await summarize_message_groups([level], sentences_count))[0]
+
+async def summarize_groups_cached(groups_texts, sentences_count=5, groups_documents=None):
+    """
+    Суммаризация групп с использованием кэша: в пул процессов передаются только промахи
+    
+    Args:
+        groups_texts (list): Список групп, каждая группа - список текстов
+        sentences_count (int): Количество предложений в суммаризации
+        groups_documents (list): Те же группы из предобработанных документов (ключ кэша по-прежнему
+            строится по текстам)
+        
+    Returns:
+        list: Суммаризации в порядке следования групп
+    """
+    # Большие группы суммаризируются иерархически
+    hierarchical = [len(texts) > HIERARCHICAL_SUMMARIZATION_THRESHOLD for texts in groups_texts]
+    
+    cache_keys = []
+    for texts, is_hierarchical in zip(groups_texts, hierarchical):
+        params = {'sentences_count': sentences_count, 'version': ALGORITHM_VERSION}
+        if is_hierarchical:
+            params.update({'mode': 'hierarchical', 'fan_in': SUMMARIZATION_FAN_IN})
+        cache_keys.append(summary_cache.make_key(texts, **params))
+    
+    summary_texts = [summary_cache.get(key) for key in cache_keys]
+    
+    # Суммаризируем только группы, которых нет в кэше
+    missing = [i for i, summary_text in enumerate(summary_texts) if summary_text is None]
+    if missing:
+        inputs = groups_documents if groups_documents is not None else groups_texts
+        flat = [i for i in missing if not hierarchical[i]]
+        large = [i for i in missing if hierarchical[i]]
+        
+        results = await asyncio.gather(
+            summarize_message_groups([inputs[i] for i in flat], sentences_count),
+            *[summarize_hierarchical(inputs[i], sentences_count) for i in large]
+        )
+        computed = results[0] + list(results[1:])
+        
+        for i, summary_text in zip(flat + large, computed):
+            summary_texts[i] = summary_text
+            if summary_text != SUMMARY_ERROR_TEXT:
+                summary_cache.set(cache_keys[i], summary_text)
+    
+    stats = summary_cache.stats()
+    logger.info(f"Кэш суммаризаций: попаданий {stats['hits']}, промахов {stats['misses']}")
+    
+    return summary_texts
+
+async def build_message_groups(batch):
+    """
+    Группировка похожих сообщений: по онлайн-кластерам, сформированным при получении,
+    а для сообщений без кластера - поиском похожих в пуле процессов
+    
+    Args:
+        batch (MessageBatch): Необработанные сообщения
+        
+    Returns:
+        list: Список групп ID сообщений
+    """
+    if not ONLINE_CLUSTERING_ENABLED:
+        return await run_in_pool(find_similar_messages, batch)
+    
+    groups, unclustered = group_by_clusters(batch)
+    
+    if len(unclustered):
+        groups.extend(await run_in_pool(find_similar_messages, unclustered))
+    
+    return groups
 
 async def process_new_messages():
     """
     Обработка новых сообщений и создание суммаризаций
     
+    Сообщения берутся из очереди суммаризации с арендой, поэтому несколько
+    процессов-суммаризаторов обрабатывают разные сообщения, а кластер целиком
+    обрабатывает один процесс. Суммаризации группы сохраняются одной транзакцией
+    с постановкой в очередь доставки и отметкой сообщений как обработанных;
+    задачи подтверждаются после всего пакета. При сбое аренда истекает и пакет
+    обрабатывается снова, при этом сообщения уже сохраненных групп пропускаются.
+    
     Returns:
         list: Список созданных суммаризаций
     """
     try:
-        # Получаем необработанные сообщения
-        messages = db.get_unprocessed_messages(limit=100)
+        # Арендуем сообщения одним запросом и загружаем их в виде колоночного пакета
+        tasks = db.lease_tasks('summarize', WORKER_ID, QUEUE_VISIBILITY_TIMEOUT, limit=SUMMARIZATION_MESSAGE_LIMIT)
         
-        if not messages:
+        if not tasks:
             logger.info("Нет новых сообщений для обработки")
             return []
+    
+    except Exception as e:
+        logger.error(f"Ошибка при получении сообщений из очереди: {e}")
+        return []
+    
+    task_ids = [task['task_id'] for task in tasks]
+    
+    try:
+        # Кластеры закрываются целиком: остальные сообщения кластеров пакета
+        # арендуются вместе с ним, сообщения кластеров, которые частично
+        # обрабатывает другой процесс, возвращаются в очередь
+        if ONLINE_CLUSTERING_ENABLED:
+            tasks = close_clusters(tasks, WORKER_ID, QUEUE_VISIBILITY_TIMEOUT)
+            task_ids = [task['task_id'] for task in tasks]
+        
+        batch = db.get_batch_by_ids([task['payload'] for task in tasks])
+        task_by_message = {task['payload']: task['task_id'] for task in tasks}
+        
+        if not len(batch):
+            db.ack_tasks(task_ids, WORKER_ID)
+            return []
         
         # Группируем похожие сообщения
-        message_groups = find_similar_messages(messages)
+        message_groups = await build_message_groups(batch)
+        
+        # Группы формируются по индексу пакета "ID -> строка"
+        groups_messages = [batch.select(group) for group in message_groups]
+        
+        # Определяем получателей групп; пользователи, уже получившие почти-дубликат
+        # в пределах скользящего окна, повторно суммаризацию не получают
+        groups_users = []
+        groups_delivered = []
+        
+        # Подписчики каналов загружаются одним запросом на весь пакет
+        channel_users = db.get_channel_users(list(set(batch.channel_ids)))
+        
+        for group_messages in groups_messages:
+            user_ids = await get_users_for_messages(group_messages, channel_users)
+            delivered = find_delivered(group_messages) if CROSS_BATCH_DEDUP_MODE != 'off' else {}
+            
+            groups_users.append([user_id for user_id in user_ids if user_id not in delivered])
+            groups_delivered.append({
+                user_id: summary_id for user_id, summary_id in delivered.items() if user_id in user_ids
+            })
+        
+        # Создаем суммаризации пакетами только для групп, у которых остались получатели
+        pending = [i for i, user_ids in enumerate(groups_users) if user_ids]
+        documents = get_documents([message_id for i in pending for message_id in groups_messages[i].ids])
+        pending_texts = await summarize_groups_cached(
+            [groups_messages[i].texts for i in pending],
+            groups_documents=[
+                [
+                    documents.get(message_id) or text
+                    for message_id, text in zip(groups_messages[i].ids, groups_messages[i].texts)
+                ]
+                for i in pending
+            ]
+        )
+        summary_texts = dict(zip(pending, pending_texts))
+        
+        if len(pending) < len(message_groups):
+            logger.info(f"Пропущено {len(message_groups) - len(pending)} групп, уже доставленных ранее")
         
         # Создаем суммаризации для каждой группы
         summaries = []
         
-        for group in message_groups:
-            # Получаем сообщения группы
-            group_messages = [m for m in messages if m['message_id'] in group]
+        for i, (group, group_messages) in enumerate(zip(message_groups, groups_messages)):
+            deliveries = {}
+            
+            # Повторы привязываются к уже доставленным суммаризациям
+            attach_to = []
+            if CROSS_BATCH_DEDUP_MODE == 'attach' and groups_delivered[i]:
+                attach_to = sorted(set(groups_delivered[i].values()))
+                deliveries.update(groups_delivered[i])
             
-            # Создаем суммаризацию
-            summary_text = await summarize_messages(group_messages)
+            summary_text = summary_texts.get(i)
             
             # Получаем лучшие изображения для группы
-            image_paths = await get_best_images(group)
+            image_paths = await get_best_images(group) if groups_users[i] else []
             
-            # Получаем пользователей, которым нужно отправить суммаризацию
-            user_ids = await get_users_for_messages(group_messages)
+            # Суммаризации для каждого пользователя, задачи их доставки, привязка
+            # повторов, отметка сообщений группы как обработанных и подтверждение
+            # их задач сохраняются одной транзакцией
+            summary_ids = db.add_group_summaries(
+                groups_users[i], summary_text, group, image_paths,
+                attach_to=attach_to,
+                task_ids=[task_by_message[message_id] for message_id in group if message_id in task_by_message],
+                owner=WORKER_ID
+            )
+            deliveries.update(summary_ids)
             
-            # Сохраняем суммаризацию для каждого пользователя
-            for user_id in user_ids:
-                summary_id = db.add_summary(
-                    user_id,
-                    summary_text,
-                    group,
-                    image_paths
-                )
-                
+            for user_id, summary_id in summary_ids.items():
                 summaries.append({
                     'summary_id': summary_id,
                     'user_id': user_id,
@@ -158,59 +393,115 @@ async def process_new_messages():
                     'images': image_paths
                 })
             
-            # Отмечаем сообщения как обработанные
-            db.mark_messages_as_processed(group)
+            # Запоминаем доставленные сообщения для дедупликации следующих циклов
+            # (только после сохранения группы)
+            if CROSS_BATCH_DEDUP_MODE != 'off':
+                remember_delivered(group_messages, deliveries)
+        
+        # Подтверждаем задачи сообщений, не попавших в группы (например, удаленных)
+        db.ack_tasks(task_ids, WORKER_ID)
         
         return summaries
     
     except Exception as e:
         logger.error(f"Ошибка при обработке новых сообщений: {e}")
+        
+        # Сообщения будут обработаны повторно; после QUEUE_MAX_ATTEMPTS попыток
+        # они переносятся в очередь недоставленных
+        try:
+            db.fail_tasks(task_ids, WORKER_ID, e)
+        except Exception as fail_error:
+            logger.error(f"Ошибка при возврате сообщений в очередь: {fail_error}")
+        
         return []
 
-async def get_users_for_messages(messages):
+async def refresh_cluster_summaries():
+    """
+    Обновление суммаризаций открытых кластеров, которые выросли с прошлого обновления
+    
+    Суммаризации используются командой /summarize, чтобы не суммаризировать
+    сообщения во время обработки запроса пользователя.
+    
+    Returns:
+        int: Количество обновленных кластеров
+    """
+    try:
+        # Суммаризации кластеров обновляет один из процессов-суммаризаторов
+        if not db.acquire_lease('cluster_summaries', WORKER_ID, CLUSTER_SUMMARY_REFRESH_INTERVAL * 2):
+            return 0
+        
+        clusters = db.get_stale_clusters()
+        if not clusters:
+            return 0
+        
+        # Сообщения и их предобработка загружаются одним пакетом для всех кластеров
+        members = db.get_cluster_members([cluster['cluster_id'] for cluster in clusters])
+        message_ids = [message_id for ids in members.values() for message_id in ids]
+        messages = db.get_messages_by_ids(message_ids)
+        documents = get_documents(message_ids)
+        
+        clusters = [cluster for cluster in clusters if members.get(cluster['cluster_id'])]
+        groups_ids = [
+            [message_id for message_id in members[cluster['cluster_id']] if message_id in messages]
+            for cluster in clusters
+        ]
+        
+        summary_texts = await summarize_groups_cached(
+            [[messages[message_id]['message_text'] for message_id in ids] for ids in groups_ids],
+            groups_documents=[
+                [documents.get(message_id) or messages[message_id]['message_text'] for message_id in ids]
+                for ids in groups_ids
+            ]
+        )
+        
+        updated = 0
+        for cluster, summary_text in zip(clusters, summary_texts):
+            if summary_text != SUMMARY_ERROR_TEXT:
+                db.set_cluster_summary(cluster['cluster_id'], summary_text, cluster['size'])
+                updated += 1
+        
+        return updated
+    
+    except Exception as e:
+        logger.error(f"Ошибка при обновлении суммаризаций кластеров: {e}")
+        return 0
+
+async def schedule_cluster_summaries():
+    """Периодическое обновление суммаризаций открытых кластеров"""
+    while True:
+        updated = await refresh_cluster_summaries()
+        if updated:
+            logger.info(f"Обновлены суммаризации {updated} открытых кластеров")
+        
+        await asyncio.sleep(CLUSTER_SUMMARY_REFRESH_INTERVAL)
+
+async def get_users_for_messages(batch, channel_users=None):
     """
     Получение списка пользователей, которым нужно отправить суммаризацию
     
     Args:
-        messages (list): Список сообщений
+        batch (MessageBatch): Сообщения группы
+        channel_users (dict): ID канала -> ID пользователя, загруженные один раз для всего
+            пакета (по умолчанию загружаются для каналов группы)
         
     Returns:
         list: Список ID пользователей
     """
     try:
         # Получаем ID каналов из сообщений
-        channel_ids = set([m['channel_id'] for m in messages])
+        channel_ids = set(batch.channel_ids)
         
-        # Получаем всех пользователей
-        users = []
+        if channel_users is None:
+            channel_users = db.get_channel_users(list(channel_ids))
         
-        # Для каждого канала получаем пользователей, которые его отслеживают
-        for channel_id in channel_ids:
-            # Получаем каналы всех пользователей
-            all_channels = db.get_channels(None)
-            
-            # Фильтруем каналы по ID
-            channel_users = set([
-                channel['user_id'] for channel in all_channels
-                if channel['channel_id'] == channel_id
-            ])
-            
-            users.extend(channel_users)
-        
-        # Удаляем дубликаты
-        return list(set(users))
+        return list({channel_users[channel_id] for channel_id in channel_ids if channel_id in channel_users})
     
     except Exception as e:
         logger.error(f"Ошибка при получении пользователей для сообщений: {e}")
         return []
 
-async def schedule_summarization(bot):
-    """
-    Планирование периодической суммаризации
-    
-    Args:
-        bot: Объект бота для отправки сообщений
-    """
+async def schedule_summarization():
+    """Планирование периодической суммаризации (доставку выполняет bot.delivery)"""
     while True:
         try:
             logger.info("Запуск периодической суммаризации")
@@ -218,40 +509,10 @@ async def schedule_summarization(bot):
             # Обрабатываем новые сообщения
             summaries = await process_new_messages()
             
-            # Отправляем суммаризации пользователям
-            for summary in summaries:
-                try:
-                    # Получаем информацию о пользователе
-                    user_id = summary['user_id']
-                    
-                    # Формируем сообщение
-                    message_text = summary['text']
-                    
-                    # Отправляем сообщение
-                    if summary['images']:
-                        # Если есть изображения, отправляем их с текстом
-                        for image_path in summary['images']:
-                            await bot.send_photo(
-                                chat_id=user_id,
-                                photo=open(image_path, 'rb'),
-                                caption=message_text if image_path == summary['images'][0] else None
-                            )
-                    else:
-                        # Если нет изображений, отправляем только текст
-                        await bot.send_message(
-                            chat_id=user_id,
-                            text=message_text
-                        )
-                    
-                    logger.info(f"Суммаризация отправлена пользователю {user_id}")
-                
-                except Exception as e:
-                    logger.error(f"Ошибка при отправке суммаризации пользователю {summary['user_id']}: {e}")
-            
-            logger.info(f"Отправлено {len(summaries)} суммаризаций")
+            logger.info(f"Создано {len(summaries)} суммаризаций")
         
         except Exception as e:
             logger.error(f"Ошибка при выполнении периодической суммаризации: {e}")
         
-        # Ждем 1 час перед следующей суммаризацией
-        await asyncio.sleep(60 * 60)  # 1 час в секундах
+        # Ждем до следующей суммаризации
+        await asyncio.sleep(SUMMARIZATION_INTERVAL)
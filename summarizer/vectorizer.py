@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+import logging
+import re
+import time
+import zlib
+from functools import lru_cache
+
+import database as db
+from summarizer import nlp
+from message_batch import counts_matrix
+from config import VECTORIZER_N_FEATURES, VECTORIZER_REFRESH_INTERVAL
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# Стеммеры по языкам (создаются при первом использовании)
+stemmers = {}
+
+@lru_cache(maxsize=100000)
+def stem(word, language='russian'):
+    """Приведение слова к основе (результаты кэшируются)"""
+    if language not in stemmers:
+        from nltk.stem.snowball import SnowballStemmer
+        stemmers[language] = SnowballStemmer(language)
+
+    return stemmers[language].stem(word)
+
+def term_id(term):
+    """Номер термина в хэшированном пространстве признаков"""
+    return zlib.crc32(term.encode('utf-8')) % VECTORIZER_N_FEATURES
+
+class IncrementalVectorizer:
+    """
+    Долгоживущий TF-IDF векторизатор на хэшированном пространстве терминов
+
+    Не требует обучения: номер термина - хэш его основы, а документные частоты
+    хранятся в SQLite и обновляются при получении каждого сообщения.
+    """
+
+    def __init__(self, refresh_interval=VECTORIZER_REFRESH_INTERVAL):
+        self.refresh_interval = refresh_interval
+        self.documents = 0
+        self.frequencies = None
+        self.loaded_at = 0
+
+    def tokenize(self, text, language='russian'):
+        """
+        Нормализация и токенизация текста
+
+        Args:
+            text (str): Текст сообщения
+            language (str): Язык текста (для стоп-слов и стеммера)
+
+        Returns:
+            list: Основы слов без стоп-слов, ссылок и пунктуации
+        """
+        text = (text or '').lower().replace('ё', 'е')
+        text = re.sub(r'https?://\S+|t\.me/\S+', ' ', text)
+
+        stop_words = nlp.get_stop_words(language)
+        return [
+            stem(word, language) for word in re.findall(r'\b\w\w+\b', text)
+            if word not in stop_words and not word.isdigit()
+        ]
+
+    def term_counts(self, text):
+        """
+        Подсчет терминов текста в хэшированном пространстве
+
+        Текст проходит ту же предобработку, что и при получении сообщения
+        (очистка, определение языка, стеммер и стоп-слова этого языка),
+        поэтому векторы совпадают с сохраненными и с документными частотами.
+
+        Args:
+            text (str): Текст сообщения
+
+        Returns:
+            dict: Номер термина -> количество вхождений
+        """
+        # Импорт внутри функции: модуль предобработки сам использует этот векторизатор
+        from summarizer.preprocessing import preprocess_text, document_counts
+
+        return document_counts(preprocess_text(text))
+
+    def learn(self, counts):
+        """Учет нового документа в документных частотах (в памяти и в базе данных)"""
+        if not counts:
+            return
+
+        db.update_document_frequencies(list(counts))
+
+        if self.frequencies is not None:
+            for index in counts:
+                self.frequencies[index] += 1
+            self.documents += 1
+
+    def refresh(self, force=False):
+        """Загрузка документных частот из базы данных, если они устарели"""
+        import numpy as np
+
+        if not force and self.frequencies is not None and time.time() - self.loaded_at < self.refresh_interval:
+            return
+
+        documents, frequencies = db.get_document_frequencies()
+
+        self.frequencies = np.zeros(VECTORIZER_N_FEATURES, dtype=np.int64)
+        if frequencies:
+            indices, values = zip(*frequencies.items())
+            self.frequencies[list(indices)] = values
+        self.documents = documents
+        self.loaded_at = time.time()
+
+    def weight(self, counts):
+        """
+        Построение L2-нормированных TF-IDF векторов по матрице частот терминов
+
+        Args:
+            counts: Матрица частот терминов (scipy.sparse), не изменяется
+
+        Returns:
+            scipy.sparse.csr_matrix: Матрица документов (строки нормированы по L2)
+        """
+        import numpy as np
+        from scipy import sparse
+
+        self.refresh()
+
+        matrix = sparse.csr_matrix(counts, dtype=np.float64, copy=True)
+
+        # Сглаженный IDF, как в TfidfVectorizer
+        idf = np.log((1 + self.documents) / (1 + self.frequencies[matrix.indices])) + 1
+        matrix.data *= idf
+
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        matrix = sparse.diags(1 / norms) @ matrix
+
+        return matrix.tocsr()
+
+    def transform_counts(self, counts_list):
+        """
+        Построение L2-нормированных TF-IDF векторов по подсчитанным терминам
+
+        Args:
+            counts_list (list): Словари "номер термина -> количество" для каждого документа
+
+        Returns:
+            scipy.sparse.csr_matrix: Матрица документов (строки нормированы по L2)
+        """
+        return self.weight(counts_matrix(counts_list))
+
+    def transform(self, texts):
+        """Векторизация текстов без обновления документных частот"""
+        return self.transform_counts([self.term_counts(text) for text in texts])
+
+def counts_to_json(counts):
+    """Преобразование подсчета терминов в формат для хранения в messages.vector_representation"""
+    return {'indices': list(counts.keys()), 'counts': list(counts.values())}
+
+def vectorize_for_storage(text, counts=None):
+    """
+    Векторизация сообщения при получении: обновляет документные частоты
+    и возвращает представление для сохранения в messages.vector_representation
+
+    Args:
+        text (str): Текст сообщения
+        counts (dict): Уже подсчитанные термины (если текст токенизирован при предобработке)
+
+    Returns:
+        dict: Разреженный вектор частот терминов или None в случае ошибки
+    """
+    try:
+        if counts is None:
+            counts = vectorizer.term_counts(text)
+        vectorizer.learn(counts)
+        return counts_to_json(counts)
+
+    except Exception as e:
+        logger.error(f"Ошибка при векторизации сообщения: {e}")
+        return None
+
+def vectorize_messages(batch):
+    """
+    TF-IDF матрица для пакета сообщений: сохраненные частоты терминов используются
+    повторно, отсутствующие вычисляются по тексту
+
+    Args:
+        batch (MessageBatch): Пакет сообщений
+
+    Returns:
+        scipy.sparse.csr_matrix: Матрица сообщений (строки нормированы по L2)
+    """
+    from scipy import sparse
+
+    counts = batch.vectors
+    if batch.missing:
+        rows = list(batch.missing)
+        computed = counts_matrix([vectorizer.term_counts(batch.texts[row]) for row in rows])
+        placement = sparse.csr_matrix(
+            ([1.0] * len(rows), (rows, list(range(len(rows))))), shape=(len(batch), len(rows))
+        )
+        counts = counts + placement @ computed
+
+    return vectorizer.weight(counts)
+
+# Общий векторизатор процесса
+vectorizer = IncrementalVectorizer()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import logging
+import time
+from collections import deque
+from datetime import datetime, timezone
+
+import database as db
+from summarizer.minhash import band_buckets, estimate_similarity, get_signatures, signature_from_bytes
+from config import DEDUP_WINDOW_HOURS, WINDOW_SIMILARITY_THRESHOLD
+
+# Настройка логирования
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+class RollingWindow:
+    """
+    Скользящее окно доставленных сообщений: сигнатуры MinHash за последние
+    DEDUP_WINDOW_HOURS часов и суммаризации, в которые они вошли
+
+    Кандидаты в почти-дубликаты берутся из индекса LSH в базе данных (корзины
+    записываются при получении сообщения) и отбираются среди сообщений окна.
+    """
+
+    def __init__(self, hours=DEDUP_WINDOW_HOURS, threshold=WINDOW_SIMILARITY_THRESHOLD):
+        self.ttl = hours * 60 * 60
+        self.threshold = threshold
+        self.entries = deque()  # (время добавления, ID сообщения) в порядке добавления
+        self.signatures = {}  # ID сообщения -> сигнатура
+        self.deliveries = {}  # ID сообщения -> {ID пользователя: ID суммаризации}
+        self.last_summary_id = 0  # ID последней загруженной из базы суммаризации
+
+    def add(self, message_id, signature, deliveries, added_at=None):
+        """
+        Добавление доставленного сообщения в окно
+
+        Args:
+            message_id (int): ID сообщения
+            signature: Сигнатура MinHash сообщения
+            deliveries (dict): ID пользователя -> ID суммаризации, в которую вошло сообщение
+            added_at (float): Время доставки (unix time), по умолчанию - текущее
+        """
+        if message_id in self.signatures:
+            self.deliveries[message_id].update(deliveries)
+            return
+
+        self.entries.append((added_at if added_at is not None else time.time(), message_id))
+        self.signatures[message_id] = signature
+        self.deliveries[message_id] = dict(deliveries)
+
+    def evict(self, now=None):
+        """Удаление из окна сообщений старше DEDUP_WINDOW_HOURS"""
+        deadline = (now if now is not None else time.time()) - self.ttl
+
+        while self.entries and self.entries[0][0] < deadline:
+            _, message_id = self.entries.popleft()
+            self.signatures.pop(message_id, None)
+            self.deliveries.pop(message_id, None)
+
+    def find_deliveries(self, signatures):
+        """
+        Поиск уже доставленных суммаризаций с почти-дубликатами группы
+
+        Args:
+            signatures (list): Сигнатуры сообщений группы
+
+        Returns:
+            dict: ID пользователя -> ID суммаризации, которую он уже получил
+        """
+        self.evict()
+
+        if not self.signatures:
+            return {}
+
+        # Один запрос к индексу на всю группу; сообщения вне окна отбрасываются
+        candidates = db.find_lsh_candidates([bucket for signature in signatures for bucket in band_buckets(signature)])
+        candidates = [message_id for message_id in candidates if message_id in self.signatures]
+
+        deliveries = {}
+        for signature in signatures:
+            for message_id in candidates:
+                if estimate_similarity(signature, self.signatures[message_id]) >= self.threshold:
+                    for user_id, summary_id in self.deliveries[message_id].items():
+                        deliveries.setdefault(user_id, summary_id)
+
+        return deliveries
+
+    def refresh(self):
+        """
+        Загрузка из базы данных суммаризаций, созданных после последней загрузки
+
+        При первом вызове окно восстанавливается за DEDUP_WINDOW_HOURS часов, затем
+        загружаются только новые суммаризации: так процесс видит доставки других
+        процессов-суммаризаторов.
+        """
+        try:
+            summaries = db.get_summaries_since(hours=self.ttl // 3600, after_summary_id=self.last_summary_id)
+            if not summaries:
+                return
+
+            message_ids = {message_id for summary in summaries for message_id in summary['source_messages']}
+            signatures = db.get_message_signatures(list(message_ids))
+
+            for summary in summaries:
+                created_at = datetime.strptime(summary['created_at'], '%Y-%m-%d %H:%M:%S')
+                added_at = created_at.replace(tzinfo=timezone.utc).timestamp()
+
+                for message_id in summary['source_messages']:
+                    if message_id in signatures:
+                        self.add(
+                            message_id,
+                            signature_from_bytes(signatures[message_id]),
+                            {summary['user_id']: summary['summary_id']},
+                            added_at
+                        )
+
+                self.last_summary_id = max(self.last_summary_id, summary['summary_id'])
+
+            logger.info(f"Окно дедупликации: загружено {len(summaries)} суммаризаций, {len(self.signatures)} сообщений в окне")
+
+        except Exception as e:
+            logger.error(f"Ошибка при загрузке окна дедупликации: {e}")
+
+def find_delivered(batch):
+    """
+    Поиск пользователей, которые уже получили суммаризацию с почти-дубликатами сообщений
+
+    Args:
+        batch (MessageBatch): Сообщения группы
+
+    Returns:
+        dict: ID пользователя -> ID суммаризации
+    """
+    delivered_window.refresh()
+    return delivered_window.find_deliveries(list(get_signatures(batch).values()))
+
+def remember_delivered(batch, deliveries):
+    """
+    Добавление сообщений группы в окно после доставки
+
+    Args:
+        batch (MessageBatch): Сообщения группы
+        deliveries (dict): ID пользователя -> ID суммаризации
+    """
+    # Сообщения без сигнатуры в базе (сохраненные до появления индекса) добавляются
+    # в индекс LSH, иначе окна процессов не найдут их повторы
+    for message_id, signature in get_signatures(batch, index_missing=True).items():
+        delivered_window.add(message_id, signature, deliveries)
+
+# Общее окно доставленных сообщений процесса
+delivered_window = RollingWindow()
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database as db
+
+@pytest.fixture
+def database(tmp_path, monkeypatch):
+    """Чистая база данных в отдельном каталоге (путь к базе в config относительный)"""
+    monkeypatch.chdir(tmp_path)
+    db.init_db()
+    return tmp_path
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Закрытие кластеров, сообщения которых арендованы разными пакетами
+"""
+import asyncio
+import sqlite3
+
+import pytest
+
+import database as db
+from summarizer import summarizer
+from summarizer.clustering import close_clusters
+
+TIMEOUT = 600
+
+@pytest.fixture
+def clusters(database, monkeypatch):
+    """Кластер из трех сообщений и кластер из одного сообщения, все сообщения в очереди"""
+    monkeypatch.setattr(summarizer, 'CROSS_BATCH_DEDUP_MODE', 'off')
+
+    channel_id = db.add_channel(1, "Канал", "@channel")
+    texts = [
+        "Центральный банк повысил ключевую ставку до двадцати процентов годовых.",
+        "Банк России поднял ключевую ставку до двадцати процентов.",
+        "Ключевая ставка выросла до двадцати процентов по решению банка.",
+        "Марсоход обнаружил следы древнего озера в кратере и передал снимки.",
+    ]
+    message_ids = [
+        db.add_message(channel_id, text, '2026-01-01 00:00:00', None, number)
+        for number, text in enumerate(texts, start=1)
+    ]
+
+    story, revision = db.create_cluster(message_ids[0], '{}', db.get_cluster_revision())
+    for size, message_id in enumerate(message_ids[1:3], start=2):
+        revision = db.add_message_to_cluster(story, message_id, '{}', size, revision)
+    other, revision = db.create_cluster(message_ids[3], '{}', revision)
+
+    db.enqueue_tasks('summarize', message_ids)
+    return {'story': story, 'other': other, 'message_ids': message_ids}
+
+def statuses():
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    rows = conn.execute('SELECT cluster_id, status FROM clusters').fetchall()
+    conn.close()
+    return dict(rows)
+
+def queued():
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    rows = conn.execute(
+        "SELECT payload, lease_owner, attempts FROM work_queue WHERE queue = 'summarize' ORDER BY task_id"
+    ).fetchall()
+    conn.close()
+    return [(int(payload), lease_owner, attempts) for payload, lease_owner, attempts in rows]
+
+def test_cluster_split_across_two_leases_is_closed_once_whole(clusters):
+    first, second, third, unrelated = clusters['message_ids']
+
+    tasks_a = db.lease_tasks('summarize', 'worker-a', TIMEOUT, limit=2)
+    tasks_b = db.lease_tasks('summarize', 'worker-b', TIMEOUT, limit=1)
+    assert [task['payload'] for task in tasks_b] == [third]
+
+    # Третье сообщение кластера у другого процесса: кластер не закрывается,
+    # задачи первого пакета возвращаются в очередь без учета попытки
+    assert close_clusters(tasks_a, 'worker-a', TIMEOUT) == []
+    assert statuses() == {clusters['story']: 'open', clusters['other']: 'open'}
+    assert queued() == [(first, None, 0), (second, None, 0), (third, 'worker-b', 1), (unrelated, None, 0)]
+
+    # Второй процесс арендует остальные сообщения кластера и закрывает его целиком;
+    # кластер, сообщений которого нет в пакете, остается открытым
+    tasks = close_clusters(tasks_b, 'worker-b', TIMEOUT)
+    assert sorted(task['payload'] for task in tasks) == [first, second, third]
+    assert statuses() == {clusters['story']: 'closed', clusters['other']: 'open'}
+    assert queued() == [(first, 'worker-b', 1), (second, 'worker-b', 1), (third, 'worker-b', 1), (unrelated, None, 0)]
+
+def test_batch_limit_does_not_split_cluster(clusters, monkeypatch):
+    monkeypatch.setattr(summarizer, 'SUMMARIZATION_MESSAGE_LIMIT', 2)
+
+    summaries = asyncio.run(summarizer.process_new_messages())
+
+    # Одна суммаризация на весь кластер, хотя в пакет помещаются два сообщения
+    assert len(summaries) == 1
+    assert statuses() == {clusters['story']: 'closed', clusters['other']: 'open'}
+    assert queued() == [(clusters['message_ids'][3], None, 0)]
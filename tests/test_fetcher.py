@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Постраничное получение сообщений канала с фиктивным клиентом Telethon
+"""
+import asyncio
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from telethon.tl.types import MessageMediaPhoto
+
+import database as db
+from channel_manager import fetcher
+from channel_manager.session_pool import SessionPool
+from summarizer import clustering
+from config import NEW_CHANNEL_BACKFILL_LIMIT
+
+TOPICS = ['ставка', 'погода', 'выборы', 'нефть', 'футбол', 'космос', 'биржа', 'наука']
+
+class FakeMessage:
+    """Сообщение канала с полями, которые читает сборщик"""
+
+    def __init__(self, message_id):
+        self.id = message_id
+        self.text = f"Новость {message_id}: {TOPICS[message_id % len(TOPICS)]} и подробности номер {message_id}."
+        self.media = None
+        self.chat = type('Chat', (), {'username': 'fake_channel'})()
+        self.date = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=message_id)
+
+class FakeChannelClient:
+    """
+    Фиктивный клиент Telethon с историей канала из count сообщений
+
+    fail_after - после выдачи стольких сообщений итерация обрывается ConnectionError.
+    """
+
+    def __init__(self, count):
+        self.messages = [FakeMessage(message_id) for message_id in range(1, count + 1)]
+        self.fail_after = None
+        self.downloads = []
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self):
+        pass
+
+    async def is_user_authorized(self):
+        return True
+
+    async def get_entity(self, username):
+        return username
+
+    async def __call__(self, request):
+        return None
+
+    async def get_messages(self, entity, limit=None, **kwargs):
+        return self.messages[::-1][:limit]
+
+    async def iter_messages(self, entity, min_id=0, reverse=False, **kwargs):
+        assert reverse, "сборщик должен читать историю от курсора по возрастанию ID"
+        for served, message in enumerate(message for message in self.messages if message.id > min_id):
+            if self.fail_after is not None and served >= self.fail_after:
+                raise ConnectionError("соединение разорвано")
+            yield message
+
+    async def download_media(self, message, file):
+        self.downloads.append(message.id)
+        with open(file, 'wb') as output:
+            output.write(b'jpeg')
+        return file
+
+@pytest.fixture
+def channel(database, monkeypatch):
+    """Канал с фиктивным клиентом на 10 000 сообщений"""
+    client = FakeChannelClient(10000)
+    pool = SessionPool(['fake_session'], client_factory=lambda session_name: client, retry_interval=0)
+    monkeypatch.setattr(fetcher, 'session_pool', pool)
+    # Онлайн-кластеризация проверяется отдельно, здесь проверяется только постраничное чтение
+    monkeypatch.setattr(fetcher, 'ONLINE_CLUSTERING_ENABLED', False)
+
+    channel_id = db.add_channel(1, 'Канал', '@fake_channel')
+    return channel_id, client
+
+def fetch(channel_id):
+    channel = db.get_channel_by_id(channel_id)
+    return asyncio.run(fetcher.fetch_new_messages(channel_id, channel['channel_url'], channel['last_checked_message_id']))
+
+def stored_telegram_ids(channel_id):
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    rows = conn.execute(
+        'SELECT telegram_message_id FROM messages WHERE channel_id = ? ORDER BY telegram_message_id', (channel_id,)
+    ).fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
+def queued_message_ids():
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    rows = conn.execute("SELECT payload FROM work_queue WHERE queue = 'summarize'").fetchall()
+    conn.close()
+    return sorted(int(row[0]) for row in rows)
+
+def stored_message_ids():
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    rows = conn.execute('SELECT message_id FROM messages ORDER BY message_id').fetchall()
+    conn.close()
+    return [row[0] for row in rows]
+
+def test_new_channel_backfill_is_capped(channel):
+    channel_id, client = channel
+
+    fetched = fetch(channel_id)
+
+    assert len(fetched) == NEW_CHANNEL_BACKFILL_LIMIT
+    assert stored_telegram_ids(channel_id) == list(range(10001 - NEW_CHANNEL_BACKFILL_LIMIT, 10001))
+    assert db.get_channel_by_id(channel_id)['last_checked_message_id'] == 10000
+
+def test_catch_up_pages_through_all_messages_without_gaps(channel):
+    channel_id, client = channel
+    db.update_last_checked_message_id(channel_id, 1)
+
+    fetched = fetch(channel_id)
+
+    assert len(fetched) == 9999
+    assert stored_telegram_ids(channel_id) == list(range(2, 10001))
+    assert queued_message_ids() == stored_message_ids()
+    assert db.get_channel_by_id(channel_id)['last_checked_message_id'] == 10000
+
+    # Повторный опрос ничего не добавляет
+    assert fetch(channel_id) == []
+
+def test_connection_loss_resumes_from_last_complete_page(channel):
+    channel_id, client = channel
+    db.update_last_checked_message_id(channel_id, 9000)
+
+    # Соединение рвется посреди третьей страницы
+    client.fail_after = 250
+    assert len(fetch(channel_id)) == 200
+    assert db.get_channel_by_id(channel_id)['last_checked_message_id'] == 9200
+
+    client.fail_after = None
+    fetch(channel_id)
+
+    assert stored_telegram_ids(channel_id) == list(range(9001, 10001))
+    assert queued_message_ids() == stored_message_ids()
+
+def test_failed_page_commit_does_not_duplicate_messages(channel, monkeypatch):
+    channel_id, client = channel
+    db.update_last_checked_message_id(channel_id, 9500)
+
+    # Постановка в очередь и продвижение курсора второй страницы не удаются
+    # (например, база заблокирована): сообщения страницы уже сохранены
+    complete_fetch_page = db.complete_fetch_page
+    calls = []
+
+    def flaky_complete_fetch_page(*args):
+        calls.append(args)
+        if len(calls) == 2:
+            raise sqlite3.OperationalError("database is locked")
+        return complete_fetch_page(*args)
+
+    monkeypatch.setattr(db, 'complete_fetch_page', flaky_complete_fetch_page)
+    fetch(channel_id)
+    assert db.get_channel_by_id(channel_id)['last_checked_message_id'] == 9600
+    assert len(stored_telegram_ids(channel_id)) == 200
+
+    # Страница получена повторно: сообщения не дублируются и каждое ставится в очередь один раз
+    fetch(channel_id)
+
+    assert stored_telegram_ids(channel_id) == list(range(9501, 10001))
+    assert queued_message_ids() == stored_message_ids()
+    assert db.get_channel_by_id(channel_id)['last_checked_message_id'] == 10000
+
+def count_rows(query):
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    value = conn.execute(query).fetchone()[0]
+    conn.close()
+    return value
+
+def test_refetched_page_completes_derived_data_of_stored_messages(channel, monkeypatch):
+    channel_id, client = channel
+    monkeypatch.setattr(fetcher, 'ONLINE_CLUSTERING_ENABLED', True)
+    monkeypatch.setattr(clustering, 'online_clusterer', clustering.OnlineClusterer())
+    db.update_last_checked_message_id(channel_id, 9990)
+
+    # Обработка обрывается на пятом сообщении после сохранения его токенов,
+    # но до индекса почти-дубликатов и кластера
+    index_message = fetcher.index_message
+    calls = []
+
+    def flaky_index_message(*args):
+        calls.append(args)
+        if len(calls) == 5:
+            raise sqlite3.OperationalError("database is locked")
+        return index_message(*args)
+
+    monkeypatch.setattr(fetcher, 'index_message', flaky_index_message)
+    fetch(channel_id)
+    assert db.get_channel_by_id(channel_id)['last_checked_message_id'] == 9990
+    assert len(stored_telegram_ids(channel_id)) == 5
+    assert count_rows('SELECT COUNT(*) FROM message_signatures') == 4
+
+    fetch(channel_id)
+
+    message_ids = stored_message_ids()
+    assert stored_telegram_ids(channel_id) == list(range(9991, 10001))
+    assert queued_message_ids() == message_ids
+    assert sorted(db.get_message_tokens(message_ids)) == message_ids
+    assert sorted(db.get_message_clusters(message_ids)) == message_ids
+    assert count_rows('SELECT COUNT(*) FROM message_signatures') == 10
+
+    # Каждое сообщение учтено в документных частотах и в размере кластера один раз
+    assert db.get_document_frequencies()[0] == 10
+    assert count_rows('SELECT SUM(size) FROM clusters') == 10
+
+def test_media_is_downloaded_by_pool_client(channel):
+    channel_id, client = channel
+    db.update_last_checked_message_id(channel_id, 9990)
+    client.messages[-1].media = MessageMediaPhoto()
+
+    fetched = fetch(channel_id)
+
+    assert client.downloads == [10000]
+    media_files = fetched[-1]['media_files']
+    assert [media['type'] for media in media_files] == ['photo']
+    assert db.get_media_for_message(fetched[-1]['message_id'])[0]['local_path'] == media_files[0]['path']
+
+def test_existing_database_gets_telegram_message_id_column(database):
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    conn.execute('DROP INDEX idx_messages_telegram')
+    conn.execute('ALTER TABLE messages DROP COLUMN telegram_message_id')
+    conn.commit()
+    conn.close()
+
+    db.init_db()
+
+    assert db.add_message(1, 'текст', '2026-01-01 00:00:00', telegram_message_id=7) is not None
+    assert db.add_message(1, 'текст', '2026-01-01 00:00:00', telegram_message_id=7) is None
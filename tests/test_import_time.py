@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+Проверка быстрого запуска: импорт точек входа не загружает тяжелые
+NLP-зависимости (они загружаются лениво в рабочих процессах суммаризации)
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Пакеты, которые не должны загружаться при импорте точек входа
+HEAVY_MODULES = ('numpy', 'scipy', 'nltk', 'sklearn')
+
+# Токен правильного формата: бот создается при импорте main, но к Telegram не обращается
+FAKE_BOT_TOKEN = '123456:' + 'A' * 35
+
+def run_python(tmp_path, *args):
+    """Запуск интерпретатора в пустом каталоге с кодом приложения в PYTHONPATH"""
+    env = dict(os.environ, PYTHONPATH=ROOT, BOT_TOKEN=FAKE_BOT_TOKEN)
+    return subprocess.run(
+        [sys.executable, *args], cwd=tmp_path, env=env,
+        capture_output=True, text=True, timeout=120
+    )
+
+@pytest.mark.parametrize('module', ['main', 'scheduler'])
+def test_entry_point_does_not_load_heavy_modules(tmp_path, module):
+    code = (
+        f"import sys, {module}; "
+        f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+    )
+    result = run_python(tmp_path, '-c', code)
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == '', f"при импорте {module} загружены: {result.stdout.strip()}"
+
+def test_import_time_report_has_no_heavy_modules(tmp_path):
+    # Отчет -X importtime: "import time: self [us] | cumulative | imported package"
+    result = run_python(tmp_path, '-X', 'importtime', '-c', 'import main')
+
+    assert result.returncode == 0, result.stderr
+    imported = {
+        line.rsplit('|', 1)[-1].strip().split('.')[0]
+        for line in result.stderr.splitlines() if line.startswith('import time:')
+    }
+    assert not imported & set(HEAVY_MODULES)
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+Политики хранения устаревших данных и перевод базы в режим инкрементальной очистки
+"""
+import asyncio
+import os
+import sqlite3
+import time
+
+import pytest
+
+import database as db
+import retention
+from summarizer.minhash import index_message
+from summarizer.preprocessing import preprocess_text, store_document
+
+OLD = 400  # Возраст устаревших строк в днях (больше любого срока хранения)
+
+@pytest.fixture
+def legacy_database(tmp_path, monkeypatch):
+    """База, созданная до включения инкрементальной очистки"""
+    monkeypatch.chdir(tmp_path)
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    conn.execute('CREATE TABLE legacy (value TEXT)')
+    conn.commit()
+    conn.close()
+
+    db.init_db()
+    assert db.get_database_size()['auto_vacuum'] == 0
+    return tmp_path
+
+def test_retention_job_does_not_vacuum_legacy_database(legacy_database, monkeypatch):
+    def full_vacuum():
+        raise AssertionError("полный VACUUM во время работы процессов")
+
+    monkeypatch.setattr(db, 'enable_incremental_vacuum', full_vacuum)
+
+    assert asyncio.run(retention.run_retention()) is not None
+    assert db.get_database_size()['auto_vacuum'] == 0
+
+def test_offline_command_enables_incremental_vacuum(legacy_database):
+    retention.enable_vacuum()
+    assert db.get_database_size()['auto_vacuum'] == 2
+
+    # Повторный запуск ничего не делает
+    retention.enable_vacuum()
+    assert db.get_database_size()['auto_vacuum'] == 2
+
+def test_new_database_uses_incremental_vacuum(database):
+    assert db.get_database_size()['auto_vacuum'] == 2
+
+def execute(query, params=()):
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    rows = conn.execute(query, params).fetchall()
+    conn.commit()
+    conn.close()
+    return rows
+
+def make_old(table, key_column, keys, date_column='created_at'):
+    """Перенос даты строк на OLD дней назад"""
+    for key in keys:
+        execute(
+            f"UPDATE {table} SET {date_column} = datetime('now', ?) WHERE {key_column} = ?",
+            (f'-{OLD} days', key)
+        )
+
+def ids(query):
+    return sorted(row[0] for row in execute(query))
+
+def add_message(channel_id, number, processed=True):
+    """Сообщение со всеми производными данными и файлом изображения на диске"""
+    text = f"Новость номер {number}: подробности события и комментарии очевидцев."
+    message_id = db.add_message(channel_id, text, '2026-01-01 00:00:00', None, number)
+    store_document(message_id, preprocess_text(text))
+    index_message(message_id, text)
+
+    path = os.path.join('media', 'photos', f"photo_{message_id}.jpg")
+    with open(path, 'wb') as output:
+        output.write(b'jpeg')
+    db.add_media(message_id, 'photo', f"https://t.me/channel/{number}", path)
+
+    if processed:
+        execute('UPDATE messages SET processed = TRUE WHERE message_id = ?', (message_id,))
+    return message_id
+
+@pytest.fixture
+def aged(database, monkeypatch):
+    """Устаревшие и свежие строки всех таблиц, которые очищаются по политикам хранения"""
+    monkeypatch.setattr(retention, 'RETENTION_BATCH_SIZE', 2)
+    monkeypatch.setattr(retention, 'RETENTION_BATCH_PAUSE', 0)
+    os.makedirs(os.path.join('media', 'photos'), exist_ok=True)
+
+    channel_id = db.add_channel(1, "Канал", "@channel")
+    rows = {
+        'old': [add_message(channel_id, number) for number in range(1, 6)],
+        'new': add_message(channel_id, 6),
+        'unprocessed': add_message(channel_id, 7, processed=False),
+        'open_cluster': add_message(channel_id, 8),
+        'closed_cluster': add_message(channel_id, 9),
+    }
+    make_old('messages', 'message_id', rows['old'] + [rows['unprocessed'], rows['open_cluster'], rows['closed_cluster']])
+
+    revision = db.get_cluster_revision()
+    rows['open'], revision = db.create_cluster(rows['open_cluster'], '{}', revision)
+    rows['closed'], revision = db.create_cluster(rows['closed_cluster'], '{}', revision)
+    execute("UPDATE clusters SET status = 'closed' WHERE cluster_id = ?", (rows['closed'],))
+
+    # Суммаризации: доставленные (задачи доставки подтверждены) и ожидающая доставки
+    rows['delivered_old'] = db.add_group_summaries([1], "старая", [rows['new']])[1]
+    rows['pending_old'] = db.add_group_summaries([1], "ожидает доставки", [rows['new']])[1]
+    rows['delivered_new'] = db.add_group_summaries([1], "свежая", [rows['new']])[1]
+    execute(
+        "DELETE FROM work_queue WHERE queue = 'deliver' AND payload IN (?, ?)",
+        (str(rows['delivered_old']), str(rows['delivered_new']))
+    )
+    make_old('summaries', 'summary_id', [rows['delivered_old'], rows['pending_old']])
+
+    db.add_cached_summary('old', "старая")
+    db.add_cached_summary('new', "свежая")
+    make_old('summary_cache', 'cache_key', ['old'])
+
+    execute("INSERT INTO work_queue_dead (task_id, queue, payload, attempts) VALUES (1, 'summarize', '1', 5)")
+    execute("INSERT INTO work_queue_dead (task_id, queue, payload, attempts) VALUES (2, 'summarize', '2', 5)")
+    make_old('work_queue_dead', 'task_id', [1], 'failed_at')
+
+    db.set_fsm_state('old', 'AddChannelStates:waiting_for_channel_url', time.time() - 2 * retention.FSM_STATE_TTL)
+    db.set_fsm_state('new', 'AddChannelStates:waiting_for_channel_url', time.time())
+
+    # Файлы без записей в базе: старый удаляется, недавний мог только что скачаться
+    for name, age in (('orphan_old.jpg', 2 * retention.RETENTION_ORPHAN_FILE_AGE), ('orphan_new.jpg', 0)):
+        path = os.path.join('media', 'photos', name)
+        with open(path, 'wb') as output:
+            output.write(b'jpeg')
+        os.utime(path, (time.time() - age, time.time() - age))
+
+    return rows
+
+def test_retention_removes_exactly_the_expired_rows(aged):
+    report = asyncio.run(retention.run_retention())
+
+    kept = sorted([aged['new'], aged['unprocessed'], aged['open_cluster']])
+    assert ids('SELECT message_id FROM messages') == kept
+    for table in ('message_tokens', 'message_signatures', 'media'):
+        assert ids(f'SELECT message_id FROM {table}') == kept
+    assert ids('SELECT DISTINCT message_id FROM lsh_buckets') == kept
+    assert ids('SELECT message_id FROM cluster_members') == [aged['open_cluster']]
+
+    # Закрытый кластер без сообщений удаляется, открытый остается
+    assert ids('SELECT cluster_id FROM clusters') == [aged['open']]
+
+    # Файлы удаленных сообщений и старые файлы без записей удаляются с диска
+    assert sorted(os.listdir(os.path.join('media', 'photos'))) == sorted(
+        [f"photo_{message_id}.jpg" for message_id in kept] + ['orphan_new.jpg']
+    )
+
+    assert ids('SELECT summary_id FROM summaries') == sorted([aged['pending_old'], aged['delivered_new']])
+    assert ids('SELECT cache_key FROM summary_cache') == ['new']
+    assert ids('SELECT task_id FROM work_queue_dead') == [2]
+    assert ids('SELECT storage_key FROM fsm_storage') == ['new']
+
+    assert report['deleted'] == {
+        'messages': 6, 'media': 0, 'clusters': 1, 'summaries': 1,
+        'summary_cache': 1, 'work_queue_dead': 1, 'fsm_storage': 1
+    }
+    assert report['files'] == 7
+
+def test_messages_are_deleted_in_limited_batches(aged, monkeypatch):
+    # Одна транзакция удаляет не больше limit сообщений, начиная с самых ранних
+    count, paths = db.delete_old_messages(retention.MESSAGE_RETENTION_DAYS, 2)
+    assert count == 2
+    assert sorted(paths) == [os.path.join('media', 'photos', f"photo_{message_id}.jpg") for message_id in aged['old'][:2]]
+    assert aged['old'][2] in ids('SELECT message_id FROM messages')
+
+    # Очистка повторяет пакеты, пока пакет заполнен целиком
+    batches = []
+    delete_old_messages = db.delete_old_messages
+
+    def counted_delete_old_messages(days, limit):
+        count, paths = delete_old_messages(days, limit)
+        batches.append(count)
+        return count, paths
+
+    monkeypatch.setattr(db, 'delete_old_messages', counted_delete_old_messages)
+    asyncio.run(retention.apply_policy(retention.RETENTION_POLICIES[0][1]))
+
+    assert batches == [2, 2, 0]
+    assert ids('SELECT message_id FROM messages') == sorted([aged['new'], aged['unprocessed'], aged['open_cluster']])
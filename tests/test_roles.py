@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+Все роли (сборщики двух частей каналов, два суммаризатора, доставка) в отдельных
+процессах с общей базой данных и фиктивным Telegram
+"""
+import asyncio
+import json
+import multiprocessing
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import database as db
+from channel_manager.session_pool import ring_hash
+
+# Сообщения фиктивного Telegram: username канала -> [[ID сообщения, текст], ...]
+TELEGRAM_FILE = 'fake_telegram.json'
+
+STORY_X = "Центральный банк неожиданно повысил ключевую ставку до двадцати процентов годовых после заседания совета директоров."
+STORY_Y = "Марсоход обнаружил следы древнего озера в кратере и передал на Землю подробные снимки осадочных пород."
+UNIQUE_A = "Сборная по хоккею проиграла финал чемпионата мира в серии буллитов после упорного овертайма."
+UNIQUE_B = "Синоптики обещают аномальную жару и грозы в выходные на всей территории центрального региона."
+UNIQUE_C = "Новый музей современного искусства открылся в старом заводском корпусе на набережной реки."
+
+class FakeMessage:
+    """Сообщение канала с полями, которые читает сборщик"""
+
+    def __init__(self, message_id, text):
+        self.id = message_id
+        self.text = text
+        self.media = None
+        self.date = datetime(2026, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=message_id)
+
+class FakeTelegramClient:
+    """Фиктивный клиент Telethon: история каналов читается из общего файла теста"""
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self):
+        pass
+
+    async def is_user_authorized(self):
+        return True
+
+    async def get_entity(self, username):
+        return username
+
+    async def __call__(self, request):
+        return None
+
+    def history(self, username):
+        with open(TELEGRAM_FILE, encoding='utf-8') as file:
+            return [FakeMessage(message_id, text) for message_id, text in json.load(file).get(username, [])]
+
+    async def get_messages(self, entity, limit=None, **kwargs):
+        return self.history(entity)[::-1][:limit]
+
+    async def iter_messages(self, entity, min_id=0, reverse=False, **kwargs):
+        for message in self.history(entity):
+            if message.id > min_id:
+                yield message
+
+class FakeBot:
+    """Фиктивный бот: отправленные сообщения сохраняются в списке"""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send_message(self, chat_id, text):
+        self.sent.append([chat_id, text])
+
+def role_worker(role, shard_index, commands, results):
+    """
+    Процесс с ролью role: каждая команда из commands выполняет один цикл роли,
+    результат цикла возвращается через results
+    """
+    from channel_manager import fetcher
+    from channel_manager.manager import update_all_channels
+    from channel_manager.session_pool import SessionPool
+    from summarizer.summarizer import process_new_messages
+    from summarizer.pool import shutdown_pool
+    from bot.delivery import deliver_summaries
+
+    client = FakeTelegramClient()
+    fetcher.session_pool = SessionPool(['fake_session'], client_factory=lambda session_name: client, retry_interval=0)
+    loop = asyncio.new_event_loop()
+
+    try:
+        while commands.get() is not None:
+            if role == 'fetcher':
+                results.put(loop.run_until_complete(update_all_channels(shard_index, 2)))
+            elif role == 'summarizer':
+                results.put(len(loop.run_until_complete(process_new_messages())))
+            else:
+                bot = FakeBot()
+                loop.run_until_complete(deliver_summaries(bot))
+                results.put(bot.sent)
+    finally:
+        shutdown_pool()
+        loop.close()
+
+class Role:
+    """Процесс с ролью и очередями команд и результатов"""
+
+    def __init__(self, context, role, shard_index=0):
+        self.commands = context.Queue()
+        self.results = context.Queue()
+        self.process = context.Process(target=role_worker, args=(role, shard_index, self.commands, self.results))
+        self.process.start()
+
+    def run(self):
+        self.commands.put(True)
+
+    def result(self):
+        return self.results.get(timeout=180)
+
+    def stop(self):
+        self.commands.put(None)
+        self.process.join(timeout=60)
+
+def run_all(*roles):
+    """Один цикл ролей одновременно"""
+    for role in roles:
+        role.run()
+    return [role.result() for role in roles]
+
+def publish(posts):
+    """Публикация сообщений в фиктивном Telegram: username -> список текстов"""
+    try:
+        with open(TELEGRAM_FILE, encoding='utf-8') as file:
+            history = json.load(file)
+    except FileNotFoundError:
+        history = {}
+
+    for username, texts in posts.items():
+        messages = history.setdefault(username, [])
+        for text in texts:
+            messages.append([len(messages) + 1, text])
+
+    with open(TELEGRAM_FILE, 'w', encoding='utf-8') as file:
+        json.dump(history, file, ensure_ascii=False)
+
+def channel_for_shard(shard_index, taken):
+    """Username канала, который попадает в часть shard_index из двух"""
+    for number in range(100):
+        username = f"news_{number}"
+        if username not in taken and ring_hash(f"@{username}") % 2 == shard_index:
+            taken.add(username)
+            return username
+
+def message_clusters(texts):
+    """Кластеры (ID, статус) сообщений с текстом из texts"""
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    rows = conn.execute(f'''
+    SELECT m.message_id, c.cluster_id, c.status FROM messages m
+    JOIN cluster_members cm ON cm.message_id = m.message_id
+    JOIN clusters c ON c.cluster_id = cm.cluster_id
+    WHERE m.message_text IN ({', '.join('?' for _ in texts)})
+    ''', texts).fetchall()
+    conn.close()
+    return {row[0]: (row[1], row[2]) for row in rows}
+
+def queue_sizes():
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    sizes = (
+        conn.execute('SELECT COUNT(*) FROM work_queue').fetchone()[0],
+        conn.execute('SELECT COUNT(*) FROM work_queue_dead').fetchone()[0]
+    )
+    conn.close()
+    return sizes
+
+@pytest.fixture
+def roles(database):
+    context = multiprocessing.get_context('spawn')
+    started = {
+        'fetchers': [Role(context, 'fetcher', 0), Role(context, 'fetcher', 1)],
+        'summarizers': [Role(context, 'summarizer'), Role(context, 'summarizer')],
+        'delivery': Role(context, 'delivery')
+    }
+
+    yield started
+
+    for role in started['fetchers'] + started['summarizers'] + [started['delivery']]:
+        role.stop()
+        if role.process.is_alive():
+            role.process.terminate()
+
+def test_roles_share_clusters_and_deliver_each_story_once(roles):
+    fetchers, summarizers, delivery = roles['fetchers'], roles['summarizers'], roles['delivery']
+
+    # Пользователь 1 подписан на каналы обеих частей, пользователь 2 - на отдельный канал
+    taken = set()
+    channel_a, channel_d = channel_for_shard(0, taken), channel_for_shard(0, taken)
+    channel_b, channel_c = channel_for_shard(1, taken), channel_for_shard(1, taken)
+    for user_id, username in [(1, channel_a), (1, channel_b), (2, channel_c), (1, channel_d)]:
+        db.add_channel(user_id, username, f"@{username}")
+
+    # Цикл 0: второй суммаризатор обрабатывает первое сообщение и загружает окно доставок
+    publish({channel_c: [UNIQUE_C]})
+    run_all(*fetchers)
+    assert run_all(summarizers[1]) == [1]
+
+    # Цикл 1: история X публикуется в каналах разных частей
+    publish({channel_a: [STORY_X, UNIQUE_A], channel_b: [STORY_X, UNIQUE_B]})
+    run_all(*fetchers)
+
+    story_x = message_clusters([STORY_X])
+    assert len(story_x) == 2
+    assert len({cluster for cluster, status in story_x.values()}) == 1
+
+    assert run_all(summarizers[0]) == [3]
+
+    # Цикл 2: сборщики дополняют кластеры после закрытия кластеров суммаризатором
+    publish({channel_a: [STORY_Y], channel_b: [STORY_Y], channel_d: [STORY_X]})
+    run_all(*fetchers)
+
+    clusters = message_clusters([STORY_X, STORY_Y])
+    new_clusters = {message_id: cluster for message_id, cluster in clusters.items() if message_id not in story_x}
+    assert len(new_clusters) == 3
+    assert all(status == 'open' for cluster, status in new_clusters.values())
+    assert len(db.get_stale_clusters()) == 2
+
+    # Повтор истории X обрабатывает другой суммаризатор: он видит доставку первого
+    assert run_all(summarizers[1]) == [1]
+
+    sent, = run_all(delivery)
+
+    user_1 = [text for user_id, text in sent if user_id == 1]
+    assert sum('ключевую ставку' in text for text in user_1) == 1
+    assert sum('Марсоход' in text for text in user_1) == 1
+    assert len(user_1) == 4
+    assert [text for user_id, text in sent if user_id == 2] == [UNIQUE_C]
+
+    assert queue_sizes() == (0, 0)
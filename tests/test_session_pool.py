@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Пул сессий Telethon с фиктивными клиентами
+"""
+import asyncio
+import threading
+
+from telethon import errors
+
+from channel_manager.session_pool import SessionPool
+
+class FakeTelegramClient:
+    """
+    Фиктивный клиент Telethon: подключение и авторизация без сети
+
+    Запросы через get_entity завершаются успешно, пока не заданы flood_wait
+    (ответ FloodWaitError) или broken (ConnectionError). Клиент запоминает цикл
+    событий, в котором подключен, и не работает в другом цикле, как и клиент Telethon.
+    """
+
+    def __init__(self, session_name):
+        self.session_name = session_name
+        self.loop = None
+        self.flood_wait = 0
+        self.broken = False
+        self.requests = 0
+
+    async def connect(self):
+        if self.broken:
+            raise ConnectionError(f"{self.session_name} недоступен")
+        self.loop = asyncio.get_running_loop()
+
+    async def disconnect(self):
+        assert self.loop is asyncio.get_running_loop(), "клиент отключается не в своем цикле событий"
+        self.loop = None
+
+    async def is_user_authorized(self):
+        return True
+
+    async def get_entity(self, username):
+        assert self.loop is asyncio.get_running_loop(), "клиент используется не в своем цикле событий"
+        self.requests += 1
+        if self.broken:
+            raise ConnectionError(f"{self.session_name} недоступен")
+        if self.flood_wait:
+            raise errors.FloodWaitError(request=None, capture=self.flood_wait)
+        return username
+
+def make_pool(accounts, retry_interval=60):
+    """Пул из accounts аккаунтов; созданные клиенты сохраняются в pool.fake_clients (все клиенты сессии по порядку)"""
+    clients = {}
+
+    def factory(session_name):
+        client = FakeTelegramClient(session_name)
+        clients.setdefault(session_name, []).append(client)
+        return client
+
+    pool = SessionPool([f"account{index}" for index in range(accounts)], client_factory=factory,
+                       retry_interval=retry_interval)
+    pool.fake_clients = clients
+    return pool
+
+async def assign(pool, sources):
+    """Запрос каждого источника через назначенный ему клиент; возвращает источник -> имя сессии"""
+    result = {}
+    for source in sources:
+        session_name, client = await pool.get_client(source)
+        if client is None:
+            result[source] = None
+            continue
+        try:
+            await client.get_entity(source)
+            result[source] = session_name
+        except errors.FloodWaitError as e:
+            pool.report_flood_wait(session_name, e.seconds)
+            result[source] = None
+        except ConnectionError as e:
+            await pool.report_failure(session_name, e)
+            result[source] = None
+    return result
+
+SOURCES = [f"channel{index}" for index in range(1000)]
+
+def moved(before, after):
+    """Источники, назначенные другому аккаунту"""
+    return {source for source in before if before[source] != after[source]}
+
+def owned_by(assignment, session_name):
+    return {source for source, owner in assignment.items() if owner == session_name}
+
+def test_sources_are_spread_evenly():
+    pool = make_pool(4)
+
+    asyncio.run(assign(pool, SOURCES))
+
+    # Отклонение нагрузки аккаунта от средней не больше 20%
+    average = len(SOURCES) / 4
+    for load in pool.get_load().values():
+        assert abs(load['sources'] - average) <= 0.2 * average
+
+def test_flood_wait_moves_only_that_accounts_sources():
+    pool = make_pool(4)
+
+    async def scenario():
+        initial = await assign(pool, SOURCES)
+
+        # FloodWait на первом аккаунте: его источники переходят к остальным
+        pool.fake_clients['account0'][0].flood_wait = 1
+        await assign(pool, owned_by(initial, 'account0'))
+        pool.fake_clients['account0'][0].flood_wait = 0
+        after_flood = await assign(pool, SOURCES)
+
+        # После ожидания источники возвращаются к исходному аккаунту
+        await asyncio.sleep(1.1)
+        restored = await assign(pool, SOURCES)
+        return initial, after_flood, restored
+
+    initial, after_flood, restored = asyncio.run(scenario())
+
+    assert moved(initial, after_flood) == owned_by(initial, 'account0')
+    assert not owned_by(after_flood, 'account0')
+    assert None not in after_flood.values()
+    assert restored == initial
+    assert pool.get_load()['account0']['flood_waits'] == 1
+
+def test_failed_account_sources_move_and_load_stays_balanced():
+    pool = make_pool(4, retry_interval=60)
+
+    async def scenario():
+        initial = await assign(pool, SOURCES)
+
+        # Сбой соединения второго аккаунта: клиент отключается, аккаунт исключается на retry_interval
+        pool.fake_clients['account1'][0].broken = True
+        await assign(pool, owned_by(initial, 'account1'))
+        return initial, await assign(pool, SOURCES)
+
+    initial, after_failure = asyncio.run(scenario())
+
+    assert moved(initial, after_failure) == owned_by(initial, 'account1')
+    assert None not in after_failure.values()
+
+    load = pool.get_load()
+    assert load['account1']['failures'] == 1 and not load['account1']['available']
+
+    # Источники отказавшего аккаунта расходятся по оставшимся в пределах допуска
+    average = len(SOURCES) / 3
+    for session_name in ('account0', 'account2', 'account3'):
+        assert abs(len(owned_by(after_failure, session_name)) - average) <= 0.25 * average
+
+def test_clients_are_reconnected_in_new_event_loop():
+    pool = make_pool(2)
+    sources = [f"channel{index}" for index in range(20)]
+
+    async def concurrent_assign():
+        return await asyncio.gather(*(assign(pool, [source]) for source in sources))
+
+    # Роль fetcher вызывает asyncio.run для каждого запуска: клиенты и блокировка прошлого цикла не используются
+    first = asyncio.run(concurrent_assign())
+
+    async def assign_and_close():
+        result = await concurrent_assign()
+        await pool.close()
+        return result
+
+    second = asyncio.run(assign_and_close())
+
+    assert first == second
+    assert all(len(clients) == 2 for clients in pool.fake_clients.values())
+    assert all(clients[-1].loop is None for clients in pool.fake_clients.values())
+
+def test_close_from_bot_loop_disconnects_clients_in_fetcher_loop():
+    # Роль all: сборщик работает в своем потоке с постоянным циклом, а пул закрывается из цикла бота
+    pool = make_pool(2)
+    fetcher_loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=fetcher_loop.run_forever, daemon=True)
+    thread.start()
+
+    try:
+        assigned = asyncio.run_coroutine_threadsafe(assign(pool, ['channel1', 'channel2']), fetcher_loop).result(5)
+        assert None not in assigned.values()
+
+        asyncio.run(pool.close())
+
+        assert all(client.loop is None for clients in pool.fake_clients.values() for client in clients)
+    finally:
+        fetcher_loop.call_soon_threadsafe(fetcher_loop.stop)
+        thread.join(5)
+        fetcher_loop.close()
@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Хранилище состояний FSM в SQLite, общее для нескольких процессов бота
+"""
+import asyncio
+import time
+
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+
+import database as db
+from bot.storage import SQLiteStorage
+
+KEY = StorageKey(bot_id=1, chat_id=100, user_id=100)
+
+class AddChannel(StatesGroup):
+    waiting_for_url = State()
+
+def test_state_written_by_one_process_is_read_by_another(database):
+    # Два процесса бота за одним балансировщиком: у каждого свой экземпляр хранилища
+    first, second = SQLiteStorage(), SQLiteStorage()
+
+    async def scenario():
+        assert await second.get_state(KEY) is None
+
+        await first.set_state(KEY, AddChannel.waiting_for_url)
+        await first.update_data(KEY, {'url': '@channel'})
+        assert await second.get_state(KEY) == AddChannel.waiting_for_url.state
+        assert await second.get_data(KEY) == {'url': '@channel'}
+
+        await second.set_state(KEY, None)
+        await second.set_data(KEY, {})
+        return await first.get_state(KEY), await first.get_data(KEY)
+
+    assert asyncio.run(scenario()) == (None, {})
+
+def test_stale_state_is_reset(database):
+    storage = SQLiteStorage(state_ttl=60)
+    storage_key = storage.make_key(KEY)
+    db.set_fsm_state(storage_key, AddChannel.waiting_for_url.state, time.time() - 120)
+    db.set_fsm_data(storage_key, {'url': '@old'}, time.time() - 120)
+
+    async def scenario():
+        assert await storage.get_state(KEY) is None
+
+        # Новое состояние не наследует данные устаревшей записи
+        db.set_fsm_data(storage_key, {'url': '@old'}, time.time() - 120)
+        await storage.set_state(KEY, AddChannel.waiting_for_url)
+        return await storage.get_state(KEY), await storage.get_data(KEY)
+
+    assert asyncio.run(scenario()) == (AddChannel.waiting_for_url.state, {})
+    assert db.get_fsm_record(storage_key) is not None
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Ранжирование предложений и обработка пакета сообщений суммаризатором при сбое посреди пакета
+"""
+import asyncio
+import heapq
+import sqlite3
+from collections import Counter
+
+import pytest
+
+import database as db
+from summarizer import summarizer
+from summarizer.preprocessing import preprocess_text
+from summarizer.summarizer import summarize_text
+
+TEXTS = [
+    "Центральный банк неожиданно повысил ключевую ставку до двадцати процентов годовых.",
+    "Марсоход обнаружил следы древнего озера в кратере и передал подробные снимки.",
+]
+
+# Группа сообщений об одной истории для проверки ранжирования предложений
+CORPUS = [
+    "Центральный банк повысил ключевую ставку до двадцати процентов. Решение совета директоров банка "
+    "стало неожиданностью для рынка. Аналитики ждали сохранения ставки.",
+    "Ключевая ставка выросла впервые за полгода. Банк объяснил решение ускорением инфляции. "
+    "Рубль укрепился после объявления решения банка.",
+    "Рынок акций упал после повышения ставки. Инвесторы продают акции банков и застройщиков. "
+    "Ипотека может подорожать уже в следующем месяце.",
+    "Синоптики обещают грозы в выходные. Погода не повлияет на решение банка.",
+]
+
+def reference_summary(texts, sentences_count):
+    """Прежний алгоритм: вес каждого предложения считается в цикле по его словам"""
+    documents = [preprocess_text(text) for text in texts]
+    sentences = [sentence for document in documents for sentence in document['sentences']]
+    sentence_tokens = [tokens for document in documents for tokens in document['tokens']]
+
+    word_frequencies = Counter(token for tokens in sentence_tokens for token in tokens)
+    max_frequency = max(word_frequencies.values())
+
+    sentence_scores = {}
+    for index, (sentence, tokens) in enumerate(zip(sentences, sentence_tokens)):
+        if len(sentence.split()) >= 30:
+            continue
+        for token in tokens:
+            sentence_scores[index] = sentence_scores.get(index, 0) + word_frequencies[token] / max_frequency
+
+    summary_indices = sorted(heapq.nlargest(sentences_count, sentence_scores, key=sentence_scores.get))
+    return " ".join(sentences[index] for index in summary_indices)
+
+def test_summary_keeps_top_sentences_in_original_order():
+    assert summarize_text(CORPUS, 3).split(". ") == [
+        "Центральный банк повысил ключевую ставку до двадцати процентов",
+        "Решение совета директоров банка стало неожиданностью для рынка",
+        "Рубль укрепился после объявления решения банка.",
+    ]
+    assert summarize_text(CORPUS, 5).split(". ") == [
+        "Центральный банк повысил ключевую ставку до двадцати процентов",
+        "Решение совета директоров банка стало неожиданностью для рынка",
+        "Банк объяснил решение ускорением инфляции",
+        "Рубль укрепился после объявления решения банка",
+        "Погода не повлияет на решение банка.",
+    ]
+
+@pytest.mark.parametrize('sentences_count', [1, 2, 3, 4, 5, 6, 8, 10])
+def test_matrix_scoring_matches_per_sentence_scoring(sentences_count):
+    assert summarize_text(CORPUS, sentences_count) == reference_summary(CORPUS, sentences_count)
+
+@pytest.fixture
+def queued_messages(database, monkeypatch):
+    """Два несвязанных сообщения разных пользователей в очереди суммаризации"""
+    monkeypatch.setattr(summarizer, 'CROSS_BATCH_DEDUP_MODE', 'off')
+
+    message_ids = []
+    for user_id, text in enumerate(TEXTS, start=1):
+        channel_id = db.add_channel(user_id, f"Канал {user_id}", f"@channel_{user_id}")
+        message_ids.append(db.add_message(channel_id, text, '2026-01-01 00:00:00', None, 1))
+
+    db.enqueue_tasks('summarize', message_ids)
+    return message_ids
+
+def expire_leases():
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    conn.execute('UPDATE work_queue SET lease_expires_at = 0')
+    conn.commit()
+    conn.close()
+
+def queued(queue):
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    rows = conn.execute('SELECT payload FROM work_queue WHERE queue = ?', (queue,)).fetchall()
+    conn.close()
+    return sorted(int(row[0]) for row in rows)
+
+def summaries_by_user():
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    rows = conn.execute('SELECT user_id, summary_id FROM summaries ORDER BY summary_id').fetchall()
+    conn.close()
+    return rows
+
+def test_failure_mid_batch_neither_loses_nor_duplicates_summaries(queued_messages, monkeypatch):
+    add_group_summaries = db.add_group_summaries
+    calls = []
+
+    def flaky_add_group_summaries(*args, **kwargs):
+        calls.append(args)
+        if len(calls) == 2:
+            raise sqlite3.OperationalError("database is locked")
+        return add_group_summaries(*args, **kwargs)
+
+    monkeypatch.setattr(db, 'add_group_summaries', flaky_add_group_summaries)
+    assert asyncio.run(summarizer.process_new_messages()) == []
+
+    # Первая группа сохранена вместе с задачей доставки
+    saved = summaries_by_user()
+    assert len(saved) == 1
+    assert queued('deliver') == [saved[0][1]]
+
+    # Повторная обработка пакета создает суммаризацию только для второй группы
+    expire_leases()
+    assert len(asyncio.run(summarizer.process_new_messages())) == 1
+
+    saved = summaries_by_user()
+    assert sorted(user_id for user_id, summary_id in saved) == [1, 2]
+    assert queued('deliver') == sorted(summary_id for user_id, summary_id in saved)
+    assert queued('summarize') == []
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""
+Создание общего клиента Telethon при одновременных первых вызовах
+"""
+import asyncio
+
+import pytest
+
+from bot import utils
+
+class FakeTelegramClient:
+    """Фиктивный клиент Telethon с медленным запуском"""
+
+    created = []
+    fail = False
+
+    def __init__(self, *args):
+        self.started = False
+        self.start_calls = 0
+        FakeTelegramClient.created.append(self)
+
+    async def start(self):
+        self.start_calls += 1
+        if self.fail:
+            raise ConnectionError("нет соединения")
+        await asyncio.sleep(0.01)
+        self.started = True
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    FakeTelegramClient.created = []
+    FakeTelegramClient.fail = False
+    monkeypatch.setattr(utils, 'TelegramClient', FakeTelegramClient)
+    monkeypatch.setattr(utils, 'clients', {})
+    monkeypatch.setattr(utils, 'client_locks', {})
+
+async def lookup_many():
+    return await asyncio.gather(*(utils.get_telethon_client() for _ in range(10)))
+
+def test_concurrent_calls_start_client_once(fake_client):
+    clients = asyncio.run(lookup_many())
+
+    assert len(FakeTelegramClient.created) == 1
+    assert FakeTelegramClient.created[0].start_calls == 1
+    assert all(client is FakeTelegramClient.created[0] and client.started for client in clients)
+
+def test_failed_start_is_retried(fake_client):
+    FakeTelegramClient.fail = True
+    assert asyncio.run(utils.get_telethon_client()) is None
+    assert not utils.clients
+
+    FakeTelegramClient.fail = False
+    assert asyncio.run(utils.get_telethon_client()).started
+
+def test_each_event_loop_starts_its_own_client(fake_client):
+    # Роль all: бот и сборщик работают в разных циклах событий, а asyncio.run
+    # каждый раз создает новый цикл
+    first = asyncio.run(lookup_many())
+    second = asyncio.run(lookup_many())
+
+    assert len(FakeTelegramClient.created) == 2
+    assert all(client is FakeTelegramClient.created[0] for client in first)
+    assert all(client is FakeTelegramClient.created[1] and client.started for client in second)
+
+    # Клиенты и блокировки завершенных циклов удаляются при запуске клиента в новом цикле
+    asyncio.run(utils.get_telethon_client())
+    assert len(utils.clients) == 1 and len(utils.client_locks) == 1
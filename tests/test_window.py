@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Поиск повторов доставленных сообщений по индексу LSH в базе данных и
+привязка повторов к доставленным суммаризациям
+"""
+import json
+import sqlite3
+import threading
+import time
+
+import database as db
+from summarizer.minhash import band_buckets, compute_signature, index_message
+from summarizer.window import RollingWindow
+
+ORIGINAL = "Центральный банк неожиданно повысил ключевую ставку до двадцати процентов годовых после заседания совета директоров."
+REPOST = "Центральный банк неожиданно повысил ключевую ставку до двадцати процентов годовых после заседания совета директоров!!! Подписывайтесь"
+OTHER = "Марсоход обнаружил следы древнего озера в кратере и передал на Землю подробные снимки осадочных пород."
+
+def deliver(text, user_id=1):
+    """Сообщение, полученное сборщиком и доставленное пользователю user_id"""
+    channel_id = db.add_channel(user_id, "Канал", "@channel")
+    message_id = db.add_message(channel_id, text, '2026-01-01 00:00:00', None)
+    index_message(message_id, text)
+    summary_ids = db.add_group_summaries([user_id], text, [message_id])
+    return message_id, summary_ids[user_id]
+
+def test_repost_from_earlier_batch_is_found_by_persisted_index(database):
+    message_id, summary_id = deliver(ORIGINAL)
+    deliver(OTHER)
+
+    repost = compute_signature(REPOST)
+    assert message_id in db.find_lsh_candidates(band_buckets(repost))
+
+    # Окно нового процесса восстанавливается из базы и находит доставку
+    window = RollingWindow()
+    window.refresh()
+    assert window.find_deliveries([repost]) == {1: summary_id}
+    assert window.find_deliveries([compute_signature("Сборная по хоккею проиграла финал чемпионата мира.")]) == {}
+
+def test_evicted_delivery_is_not_returned(database):
+    deliver(ORIGINAL)
+
+    window = RollingWindow(hours=1)
+    window.refresh()
+    window.evict(now=time.time() + 2 * 60 * 60)
+
+    assert window.find_deliveries([compute_signature(REPOST)]) == {}
+
+def source_messages(summary_id):
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    row = conn.execute('SELECT source_messages FROM summaries WHERE summary_id = ?', (summary_id,)).fetchone()
+    conn.close()
+    return json.loads(row[0])
+
+def test_concurrent_attaches_do_not_lose_messages(database):
+    message_id, summary_id = deliver(ORIGINAL)
+    channel_id = db.add_channel(2, "Канал", "@other")
+    reposts = [db.add_message(channel_id, REPOST, '2026-01-01 00:00:00', None) for _ in range(16)]
+
+    # Суммаризаторы одновременно привязывают свои повторы к одной суммаризации
+    threads = [
+        threading.Thread(target=db.add_group_summaries, args=([], None, [repost]), kwargs={'attach_to': [summary_id]})
+        for repost in reposts
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(source_messages(summary_id)) == [message_id] + reposts
+
+def test_group_tasks_are_acknowledged_with_attach(database):
+    message_id, summary_id = deliver(ORIGINAL)
+    repost = db.add_message(db.add_channel(2, "Канал", "@other"), REPOST, '2026-01-01 00:00:00', None)
+    db.enqueue_tasks('summarize', [repost])
+    task = db.lease_tasks('summarize', 'worker', 600)[0]
+
+    # Задачу подтверждает только владелец аренды
+    db.add_group_summaries([], None, [repost], attach_to=[summary_id], task_ids=[task['task_id']], owner='other')
+    assert db.lease_tasks('summarize', 'worker', 600) == []
+    assert db.ack_tasks([task['task_id']], 'worker') == 1
+
+    db.enqueue_tasks('summarize', [repost])
+    task = db.lease_tasks('summarize', 'worker', 600)[0]
+    db.add_group_summaries([], None, [repost], attach_to=[summary_id], task_ids=[task['task_id']], owner='worker')
+
+    assert db.ack_tasks([task['task_id']], 'worker') == 0
+    assert source_messages(summary_id) == [message_id, repost]
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Общие функции инструментов замера: синтетические новости на русском языке,
+перцентили и пиковое потребление памяти
+"""
+import random
+import resource
+
+SUBJECTS = [
+    "Центральный банк", "Правительство", "Министерство финансов", "Сборная по хоккею",
+    "Городская администрация", "Крупнейший автопроизводитель", "Марсоход", "Совет директоров",
+    "Синоптики", "Новый музей", "Госдума", "Региональный оператор", "Нефтяная компания",
+    "Аналитики биржи", "Университет", "Профсоюз учителей"
+]
+ACTIONS = [
+    "неожиданно объявил", "сообщил", "опроверг", "утвердил", "представил", "отложил",
+    "подтвердил", "раскритиковал", "обсудил", "запустил", "отменил", "поддержал"
+]
+LETTERS = "абвгдежзиклмнопрстуфхцчшэюя"
+
+# Имена собственные и редкие слова: без них сообщения разных историй слишком похожи
+LEXICON = [
+    "".join(random.Random(index).choices(LETTERS, k=4 + index % 6))
+    for index in range(5000)
+]
+
+def make_sentence(generator):
+    """Одно предложение новости: шаблонное начало и редкие слова"""
+    return f"{generator.choice(SUBJECTS)} {generator.choice(ACTIONS)} {' '.join(generator.sample(LEXICON, 9))}."
+
+def make_texts(count, seed=0, repeat_share=0.3, sentences=(2, 5)):
+    """
+    Синтетические тексты сообщений: часть сообщений повторяет уже опубликованные
+    истории (как перепосты в разных каналах) с одним измененным предложением
+
+    Args:
+        count (int): Количество текстов
+        seed (int): Начальное значение генератора
+        repeat_share (float): Доля сообщений-повторов
+        sentences (tuple): Минимальное и максимальное число предложений в сообщении
+
+    Returns:
+        list: Тексты сообщений
+    """
+    generator = random.Random(seed)
+    stories = []
+    texts = []
+
+    for _ in range(count):
+        if stories and generator.random() < repeat_share:
+            story = list(generator.choice(stories))
+            story[generator.randrange(len(story))] = make_sentence(generator)
+        else:
+            story = [make_sentence(generator) for _ in range(generator.randint(*sentences))]
+            stories.append(story)
+        texts.append(" ".join(story))
+
+    return texts
+
+def make_corpus(size_bytes, seed=0):
+    """Тексты сообщений общим объемом не меньше size_bytes байт в UTF-8"""
+    texts = []
+    total = 0
+    while total < size_bytes:
+        chunk = make_texts(1000, seed + len(texts))
+        texts.extend(chunk)
+        total += sum(len(text.encode('utf-8')) for text in chunk)
+    return texts
+
+def percentile(values, fraction):
+    """Перцентиль отсортированного списка"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def peak_rss_mb():
+    """Пиковый объем резидентной памяти текущего процесса в МБ (ru_maxrss в Linux - в КБ)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
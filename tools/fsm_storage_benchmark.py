@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Операции get/set состояния FSM в SQLiteStorage и MemoryStorage aiogram
+
+Выполняет set_state и get_state для заданного числа пользователей с
+несколькими одновременными задачами и выводит количество операций в секунду.
+Для каждого хранилища выводится также наибольшая задержка цикла событий:
+запросы SQLiteStorage выполняются в потоке и не должны его блокировать.
+
+Пример:
+    python tools/fsm_storage_benchmark.py --operations 5000 --users 1000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+
+STATES = ['AddChannelStates:waiting_for_channel_url', None]
+
+async def probe_lag(stop, interval=0.001):
+    """Наибольшая задержка пробуждения цикла событий относительно interval"""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        worst = max(worst, time.perf_counter() - started - interval)
+    return worst
+
+async def run_operations(operation, operations, keys, concurrency):
+    """Выполнение operations операций над ключами пользователей в concurrency задачах"""
+    queue = asyncio.Queue()
+    for number in range(operations):
+        queue.put_nowait(number)
+
+    async def worker():
+        while not queue.empty():
+            number = queue.get_nowait()
+            await operation(keys[number % len(keys)], number)
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(probe_lag(stop))
+    await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    return operations / elapsed, await probe
+
+async def measure(storage, operations, users, concurrency):
+    keys = [StorageKey(bot_id=1, chat_id=user_id, user_id=user_id) for user_id in range(1, users + 1)]
+
+    async def set_state(key, number):
+        await storage.set_state(key, STATES[number % len(STATES)])
+
+    async def get_state(key, number):
+        await storage.get_state(key)
+
+    set_rate, set_lag = await run_operations(set_state, operations, keys, concurrency)
+    get_rate, get_lag = await run_operations(get_state, operations, keys, concurrency)
+    await storage.close()
+
+    return set_rate, get_rate, max(set_lag, get_lag)
+
+def main():
+    parser = argparse.ArgumentParser(description="Операции get/set состояния FSM в SQLiteStorage и MemoryStorage")
+    parser.add_argument('--operations', type=int, default=5000, help="Количество операций каждого вида")
+    parser.add_argument('--users', type=int, default=1000, help="Количество пользователей (ключей)")
+    parser.add_argument('--concurrency', type=int, default=50, help="Количество одновременных задач")
+    args = parser.parse_args()
+
+    # Временная база данных для SQLiteStorage
+    os.chdir(tempfile.mkdtemp())
+    import database as db
+    from bot.storage import SQLiteStorage
+    db.init_db()
+
+    for name, storage in (('memory', MemoryStorage()), ('sqlite', SQLiteStorage())):
+        set_rate, get_rate, lag = asyncio.run(measure(storage, args.operations, args.users, args.concurrency))
+        print(
+            f"{name}: set_state {set_rate:.0f} оп/с, get_state {get_rate:.0f} оп/с, "
+            f"наибольшая задержка цикла событий {lag * 1000:.1f} мс"
+        )
+
+if __name__ == "__main__":
+    main()
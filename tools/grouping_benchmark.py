@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Масштабирование группировки похожих сообщений
+
+Для пакетов разного размера замеряет время и пиковый объем памяти (tracemalloc,
+отдельным прогоном, чтобы трассировка не искажала время):
+- dense - прежний алгоритм (плотная матрица сходства n x n и двойной цикл),
+  только для пакетов не больше --dense-limit;
+- blocked - similarity_adjacency (блочное умножение) и group_by_adjacency;
+- lsh - find_similar_messages с кандидатами из индекса MinHash/LSH.
+
+Пример:
+    python tools/grouping_benchmark.py --sizes 1000 10000 100000 --dense-limit 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import make_texts
+
+def dense_groups(matrix, message_ids, threshold):
+    """Прежняя группировка: плотная матрица сходства и двойной цикл"""
+    similarity = (matrix @ matrix.T).toarray()
+
+    processed = set()
+    groups = []
+    for i in range(len(message_ids)):
+        if i in processed:
+            continue
+        group = [message_ids[i]]
+        processed.add(i)
+        for j in range(i + 1, len(message_ids)):
+            if j not in processed and similarity[i, j] >= threshold:
+                group.append(message_ids[j])
+                processed.add(j)
+        groups.append(group)
+    return groups
+
+def timed(func, *args):
+    """Время выполнения и количество групп"""
+    started = time.perf_counter()
+    groups = func(*args)
+    return time.perf_counter() - started, len(groups)
+
+def peak_memory(func, *args):
+    """Пиковый объем памяти, выделенной при выполнении, МБ"""
+    tracemalloc.start()
+    try:
+        func(*args)
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Масштабирование группировки похожих сообщений")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000], help="Размеры пакетов")
+    parser.add_argument('--dense-limit', type=int, default=5000, help="Наибольший пакет для прежнего алгоритма")
+    args = parser.parse_args()
+
+    # Временная база данных: сигнатуры и документные частоты читаются из нее
+    os.chdir(tempfile.mkdtemp())
+    import database as db
+    from message_batch import MessageBatch
+    from summarizer.deduplicator import (
+        get_backend, similarity_adjacency, group_by_adjacency, find_similar_messages
+    )
+    db.init_db()
+
+    backend = get_backend()
+    for size in args.sizes:
+        texts = make_texts(size, seed=size)
+        batch = MessageBatch.from_messages([
+            {'message_id': message_id, 'channel_id': 1, 'message_text': text}
+            for message_id, text in enumerate(texts, start=1)
+        ])
+        message_ids = batch.ids.tolist()
+        matrix = backend.encode(batch)
+
+        runs = [
+            ('lsh', find_similar_messages, batch),
+            ('blocked', lambda: group_by_adjacency(similarity_adjacency(matrix, backend.threshold), message_ids)),
+        ]
+        if size <= args.dense_limit:
+            runs.append(('dense', dense_groups, matrix, message_ids, backend.threshold))
+
+        for mode, func, *func_args in runs:
+            elapsed, groups = timed(func, *func_args)
+            memory = peak_memory(func, *func_args)
+            print(f"{mode}: сообщений {size}, групп {groups}, время {elapsed:.2f} с, пиковая память {memory:.0f} МБ")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Иерархическая и плоская суммаризация групп разного размера
+
+Для каждой группы сообщений замеряет время суммаризации через пул рабочих
+процессов и пиковый объем памяти Python (tracemalloc) при выполнении тех же
+задач в текущем процессе: flat - одна задача на всю группу, hierarchical -
+summarize_hierarchical с порциями по SUMMARIZATION_FAN_IN.
+
+Пример:
+    python tools/hierarchical_benchmark.py --sizes 10 100 1000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import make_texts
+
+async def summarize_flat(texts, sentences_count):
+    from summarizer.summarizer import summarize_message_groups
+    return (await summarize_message_groups([texts], sentences_count))[0]
+
+async def summarize_large(texts, sentences_count):
+    from summarizer.summarizer import summarize_hierarchical
+    return await summarize_hierarchical(texts, sentences_count)
+
+async def run_inline(func, *args):
+    """Замена run_in_pool: задача выполняется в текущем процессе"""
+    return func(*args)
+
+async def measure_latency(summarize, texts, sentences_count):
+    started = time.perf_counter()
+    await summarize(texts, sentences_count)
+    return time.perf_counter() - started
+
+async def measure_memory(summarize, texts, sentences_count):
+    """Пиковый объем памяти Python при выполнении задач в текущем процессе, МБ"""
+    from summarizer import summarizer
+
+    run_in_pool = summarizer.run_in_pool
+    summarizer.run_in_pool = run_inline
+    tracemalloc.start()
+    try:
+        await summarize(texts, sentences_count)
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+        summarizer.run_in_pool = run_in_pool
+
+async def run(sizes, sentences_count):
+    from config import SUMMARIZATION_FAN_IN
+    from summarizer.pool import warm_up_pool, shutdown_pool
+    from summarizer.summarizer import summarize_text
+
+    # Прогрев рабочих процессов и текущего процесса (для замера памяти)
+    await warm_up_pool()
+    await summarize_large(make_texts(100), sentences_count)
+    summarize_text(make_texts(10), sentences_count)
+
+    print(f"fan_in={SUMMARIZATION_FAN_IN}, предложений в суммаризации: {sentences_count}")
+    try:
+        for size in sizes:
+            texts = make_texts(size, seed=size)
+            for mode, summarize in [('flat', summarize_flat), ('hierarchical', summarize_large)]:
+                latency = await measure_latency(summarize, texts, sentences_count)
+                memory = await measure_memory(summarize, texts, sentences_count)
+                print(f"{mode}: сообщений {size}, время {latency * 1000:.0f} мс, пиковая память {memory:.1f} МБ")
+    finally:
+        shutdown_pool()
+
+def main():
+    parser = argparse.ArgumentParser(description="Иерархическая и плоская суммаризация групп разного размера")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000], help="Размеры групп")
+    parser.add_argument('--sentences', type=int, default=5, help="Количество предложений в суммаризации")
+    args = parser.parse_args()
+
+    # Временная база данных: документные частоты читаются из нее
+    os.chdir(tempfile.mkdtemp())
+    import database as db
+    db.init_db()
+
+    asyncio.run(run(args.sizes, args.sentences))
+
+if __name__ == "__main__":
+    main()
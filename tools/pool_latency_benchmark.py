@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+Задержка команд бота во время цикла суммаризации
+
+Выполняет группировку похожих сообщений и суммаризацию групп на синтетическом
+пакете: inline - в цикле событий, как до переноса вычислений в пул, и pool -
+через пул рабочих процессов. Пока идет цикл, фоновая задача имитирует команды
+бота и измеряет, на сколько цикл событий задерживает их выполнение.
+
+Пример:
+    python tools/pool_latency_benchmark.py --messages 5000 --interval 0.02
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import make_texts, percentile
+
+async def command_probe(interval, lags, stop):
+    """Имитация команд бота: задержка каждого пробуждения сверх interval"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+async def cycle_inline(batch):
+    """Цикл суммаризации в цикле событий"""
+    from summarizer.deduplicator import find_similar_messages
+    from summarizer.summarizer import summarize_groups
+
+    groups = find_similar_messages(batch)
+    return summarize_groups([batch.select(group).texts for group in groups])
+
+async def cycle_pool(batch):
+    """Цикл суммаризации в пуле рабочих процессов"""
+    from summarizer.deduplicator import find_similar_messages
+    from summarizer.pool import run_in_pool
+    from summarizer.summarizer import summarize_message_groups
+
+    groups = await run_in_pool(find_similar_messages, batch)
+    return await summarize_message_groups([batch.select(group).texts for group in groups])
+
+async def measure(cycle, batch, interval):
+    """Время цикла и задержки команд бота во время цикла"""
+    lags = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(command_probe(interval, lags, stop))
+    await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    summaries = await cycle(batch)
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await probe
+    lags.sort()
+    return elapsed, len(summaries), lags
+
+async def run(messages, interval, modes):
+    from message_batch import MessageBatch
+    from summarizer.pool import warm_up_pool, shutdown_pool
+
+    texts = make_texts(messages)
+    batch = MessageBatch.from_messages([
+        {'message_id': message_id, 'channel_id': 1, 'message_text': text}
+        for message_id, text in enumerate(texts, start=1)
+    ])
+
+    # Прогрев: импорт зависимостей в основном процессе и запуск рабочих процессов
+    await cycle_inline(batch.take(range(10)))
+    await warm_up_pool()
+
+    try:
+        for mode in modes:
+            cycle = cycle_inline if mode == 'inline' else cycle_pool
+            elapsed, groups, lags = await measure(cycle, batch, interval)
+            print(
+                f"{mode}: сообщений {messages}, групп {groups}, цикл {elapsed:.2f} с; "
+                f"задержка команд, мс: p50={percentile(lags, 0.5) * 1000:.1f} "
+                f"p95={percentile(lags, 0.95) * 1000:.1f} max={(lags[-1] if lags else 0) * 1000:.1f} "
+                f"(замеров {len(lags)})"
+            )
+    finally:
+        shutdown_pool()
+
+def main():
+    parser = argparse.ArgumentParser(description="Задержка команд бота во время цикла суммаризации")
+    parser.add_argument('--messages', type=int, default=5000, help="Количество сообщений в пакете")
+    parser.add_argument('--interval', type=float, default=0.02, help="Интервал между командами, с")
+    parser.add_argument('--modes', nargs='+', choices=['inline', 'pool'], default=['inline', 'pool'],
+                        help="Режимы выполнения")
+    args = parser.parse_args()
+
+    # Временная база данных: сигнатуры и документные частоты читаются из нее
+    os.chdir(tempfile.mkdtemp())
+    import database as db
+    db.init_db()
+
+    asyncio.run(run(args.messages, args.interval, args.modes))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""
+Пакетное сравнение текстов и попарные вызовы calculate_text_similarity
+
+Сравнивает M запросов с N кандидатами: в цикле по парам через
+calculate_text_similarity, одним вызовом similarity_matrix по текстам и
+одним вызовом по заранее векторизованным кандидатам. Проверяет, что
+результаты совпадают.
+
+Пример:
+    python tools/similarity_benchmark.py --queries 10 --candidates 200
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import make_texts
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+def main():
+    parser = argparse.ArgumentParser(description="Пакетное сравнение текстов и попарные вызовы")
+    parser.add_argument('--queries', type=int, default=10, help="Количество запросов")
+    parser.add_argument('--candidates', type=int, default=200, help="Количество кандидатов")
+    args = parser.parse_args()
+
+    # Временная база данных: документные частоты читаются из нее
+    os.chdir(tempfile.mkdtemp())
+    import numpy as np
+    import database as db
+    from summarizer.deduplicator import calculate_text_similarity, get_backend, similarity_matrix
+    db.init_db()
+
+    texts = make_texts(args.queries + args.candidates)
+    queries, candidates = texts[:args.queries], texts[args.queries:]
+
+    # Прогрев: загрузка векторизатора и зависимостей
+    calculate_text_similarity(queries[0], candidates[0])
+
+    def pairwise():
+        return np.array([[calculate_text_similarity(query, candidate) for candidate in candidates] for query in queries])
+
+    loop_time, expected = timed(pairwise)
+    batch_time, scores = timed(similarity_matrix, queries, candidates)
+
+    encoded = get_backend().encode_texts(candidates)
+    encoded_time, encoded_scores = timed(similarity_matrix, queries, encoded)
+
+    pairs = args.queries * args.candidates
+    print(f"Пар: {pairs}")
+    print(f"calculate_text_similarity в цикле: {loop_time * 1000:.0f} мс ({loop_time / pairs * 1e6:.0f} мкс на пару)")
+    print(f"similarity_matrix по текстам: {batch_time * 1000:.1f} мс (в {loop_time / batch_time:.0f} раз быстрее)")
+    print(f"similarity_matrix по векторам кандидатов: {encoded_time * 1000:.1f} мс (в {loop_time / encoded_time:.0f} раз быстрее)")
+    print(f"Наибольшее расхождение: {max(np.abs(scores - expected).max(), np.abs(encoded_scores - expected).max()):.2e}")
+
+if __name__ == "__main__":
+    main()
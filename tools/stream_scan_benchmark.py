@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+"""
+Пиковая память потокового чтения большой выборки
+
+Заполняет временную базу сообщениями и читает их в отдельных процессах:
+stream - частями через database.iter_rows, fetchall - одним fetchall(),
+как до перехода на потоковое чтение. Для каждого режима выводит время
+и пиковый объем резидентной памяти процесса.
+
+Пример:
+    python tools/stream_scan_benchmark.py --rows 1000000
+"""
+import argparse
+import os
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import make_texts, peak_rss_mb
+
+QUERY = 'SELECT message_id, channel_id, message_text, message_date FROM messages'
+
+def fill_database(rows):
+    """Заполнение базы rows сообщениями (тексты повторяются блоками по 1000)"""
+    import database as db
+
+    db.init_db()
+    texts = make_texts(1000)
+
+    conn = sqlite3.connect(db.DATABASE_NAME)
+    for start in range(0, rows, 10000):
+        conn.executemany(
+            'INSERT INTO messages (channel_id, message_text, message_date) VALUES (?, ?, ?)',
+            [
+                (number % 100, texts[number % len(texts)], '2026-01-01 00:00:00')
+                for number in range(start, min(rows, start + 10000))
+            ]
+        )
+        conn.commit()
+    conn.close()
+
+def scan(mode):
+    """Чтение всех сообщений в текущем процессе"""
+    import database as db
+
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    total = 0
+
+    if mode == 'stream':
+        for rows in db.iter_rows(QUERY):
+            total += len(rows)
+    else:
+        conn = db.get_read_connection()
+        total = len(conn.execute(QUERY).fetchall())
+        conn.close()
+
+    print(
+        f"{mode}: строк {total}, время {time.perf_counter() - started:.1f} с, "
+        f"пиковая память {peak_rss_mb():.0f} МБ (до чтения {baseline:.0f} МБ)"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Пиковая память потокового чтения большой выборки")
+    parser.add_argument('--rows', type=int, default=1000000, help="Количество сообщений")
+    parser.add_argument('--scan', choices=['stream', 'fetchall'], help="Только прочитать базу в текущем каталоге")
+    args = parser.parse_args()
+
+    if args.scan:
+        scan(args.scan)
+        return
+
+    os.chdir(tempfile.mkdtemp())
+    started = time.perf_counter()
+    fill_database(args.rows)
+    print(f"База заполнена за {time.perf_counter() - started:.0f} с")
+
+    # Каждый режим - в отдельном процессе, чтобы пиковая память не накапливалась
+    for mode in ['stream', 'fetchall']:
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--scan', mode], check=True)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""
+Скорость ранжирования предложений при суммаризации
+
+Сравнивает прежний алгоритм (вес каждого предложения считается в цикле по словам,
+токенизация NLTK при каждом вызове) с матричным summarize_text на синтетическом
+русском корпусе, разбитом на группы сообщений. summarize_text замеряется дважды:
+с предобработкой текста в том же вызове и по документам, предобработанным при
+получении сообщений (как в рабочем цикле).
+
+Пример:
+    python tools/summarize_benchmark.py --size-mb 10 --group-size 20
+"""
+import argparse
+import heapq
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmark import make_corpus
+
+def baseline_summary(texts, sentences_count=5):
+    """Прежний алгоритм суммаризации (до перехода на матрицу "предложение x термин")"""
+    from summarizer.nlp import sent_tokenize, word_tokenize, get_stop_words
+
+    stop_words = get_stop_words('russian')
+    combined_text = "\n\n".join(text for text in texts if text)
+    if len(combined_text.split()) < 10:
+        return combined_text
+
+    sentences = sent_tokenize(combined_text)
+    if len(sentences) <= sentences_count:
+        return combined_text
+
+    clean_text = re.sub(r'[^\w\s]', '', combined_text.lower())
+    word_frequencies = Counter(word for word in word_tokenize(clean_text) if word not in stop_words)
+    max_frequency = max(word_frequencies.values()) if word_frequencies else 1
+
+    sentence_scores = {}
+    for index, sentence in enumerate(sentences):
+        if len(sentence.split()) >= 30:
+            continue
+        for word in word_tokenize(sentence.lower()):
+            if word in word_frequencies:
+                sentence_scores[index] = sentence_scores.get(index, 0) + word_frequencies[word] / max_frequency
+
+    summary_indices = sorted(heapq.nlargest(sentences_count, sentence_scores, key=sentence_scores.get))
+    return " ".join(sentences[index] for index in summary_indices)
+
+def timed(func, groups, sentences_count):
+    """Время суммаризации всех групп и результаты"""
+    started = time.perf_counter()
+    summaries = [func(group, sentences_count) for group in groups]
+    return time.perf_counter() - started, summaries
+
+def main():
+    parser = argparse.ArgumentParser(description="Скорость ранжирования предложений при суммаризации")
+    parser.add_argument('--size-mb', type=float, default=10, help="Объем корпуса, МБ")
+    parser.add_argument('--group-size', type=int, default=20, help="Количество сообщений в группе")
+    parser.add_argument('--sentences', type=int, default=5, help="Количество предложений в суммаризации")
+    args = parser.parse_args()
+
+    from summarizer.nlp import load_nltk_resources
+    from summarizer.preprocessing import preprocess_text
+    from summarizer.summarizer import summarize_text
+
+    load_nltk_resources()
+
+    texts = make_corpus(int(args.size_mb * 1024 * 1024))
+    groups = [texts[i:i + args.group_size] for i in range(0, len(texts), args.group_size)]
+    size_mb = sum(len(text.encode('utf-8')) for text in texts) / 1024 / 1024
+    print(f"Корпус: {size_mb:.1f} МБ, сообщений {len(texts)}, групп {len(groups)}")
+
+    baseline_time, _ = timed(baseline_summary, groups, args.sentences)
+    print(f"Прежний алгоритм: {baseline_time:.1f} с ({size_mb / baseline_time:.2f} МБ/с)")
+
+    matrix_time, _ = timed(summarize_text, groups, args.sentences)
+    print(f"summarize_text с предобработкой: {matrix_time:.1f} с ({size_mb / matrix_time:.2f} МБ/с)")
+
+    started = time.perf_counter()
+    documents = [[preprocess_text(text) for text in group] for group in groups]
+    preprocess_time = time.perf_counter() - started
+
+    ranking_time, _ = timed(summarize_text, documents, args.sentences)
+    print(
+        f"summarize_text по предобработанным документам: {ranking_time:.1f} с "
+        f"({size_mb / ranking_time:.2f} МБ/с; предобработка при получении {preprocess_time:.1f} с)"
+    )
+
+if __name__ == "__main__":
+    main()
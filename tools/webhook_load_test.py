@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Нагрузочный тест сервера вебхука
+
+Отправляет синтетические обновления на локальный сервер (BOT_MODE=webhook)
+и выводит пропускную способность (обновлений в секунду) и задержку ответа.
+
+С --local сервер вебхука запускается в этом же процессе с временной базой
+данных и тестовым обработчиком, который читает и записывает состояние FSM в
+SQLiteStorage. Сервер подтверждает обновление до обработки, поэтому в этом
+режиме дополнительно выводятся количество обработанных обновлений в секунду и
+задержка обработчика (от отправки обновления до завершения обработчика).
+
+Пример:
+    python tools/webhook_load_test.py --url http://127.0.0.1:8080/webhook --updates 5000 --concurrency 50
+    python tools/webhook_load_test.py --local --updates 5000 --concurrency 50 --handler-delay 0.01
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import aiohttp
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import WEBHOOK_PORT, WEBHOOK_PATH, WEBHOOK_SECRET
+from bot.webhook import SECRET_HEADER
+
+def make_update(update_id, text, users):
+    """Синтетическое обновление с текстовым сообщением от одного из users пользователей"""
+    user_id = 1000000 + update_id % users
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': 'Load'},
+            'text': text
+        }
+    }
+
+def percentile(values, fraction):
+    """Перцентиль отсортированного списка"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+async def run(url, updates, concurrency, text, users, secret, sent=None):
+    """
+    Отправка обновлений с заданным числом одновременных запросов
+
+    sent - словарь, в который записывается время отправки каждого обновления
+    """
+    headers = {SECRET_HEADER: secret} if secret else {}
+    queue = asyncio.Queue()
+    for update_id in range(1, updates + 1):
+        queue.put_nowait(update_id)
+
+    latencies = []
+    errors = 0
+
+    async def worker(session):
+        nonlocal errors
+        while not queue.empty():
+            update_id = queue.get_nowait()
+            started = time.perf_counter()
+            if sent is not None:
+                sent[update_id] = started
+            try:
+                async with session.post(url, json=make_update(update_id, text, users), headers=headers) as response:
+                    await response.read()
+                    if response.status != 200:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    async with aiohttp.ClientSession() as session:
+        await asyncio.gather(*[worker(session) for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    print(f"Обновлений: {updates}, одновременных запросов: {concurrency}, ошибок: {errors}")
+    print(f"Пропускная способность: {updates / elapsed:.0f} обновлений/с")
+    print(
+        "Задержка ответа, мс: "
+        f"p50={percentile(latencies, 0.5) * 1000:.1f} "
+        f"p95={percentile(latencies, 0.95) * 1000:.1f} "
+        f"p99={percentile(latencies, 0.99) * 1000:.1f}"
+    )
+
+async def run_local(updates, concurrency, text, users, handler_delay):
+    """Нагрузка на сервер вебхука, запущенный в этом процессе с тестовым обработчиком"""
+    from aiogram import Bot, Dispatcher, Router
+    from aiogram.fsm.context import FSMContext
+    from aiohttp import web
+
+    # Временная база данных для SQLiteStorage
+    os.chdir(tempfile.mkdtemp())
+    import database as db
+    from bot.storage import SQLiteStorage
+    from bot.webhook import create_webhook_app
+    db.init_db()
+
+    sent = {}
+    handled = {}
+    finished = asyncio.Event()
+    router = Router()
+
+    @router.message()
+    async def handle(message, state: FSMContext):
+        # Типичная работа обработчика диалога: чтение и запись состояния FSM
+        data = await state.get_data()
+        await state.update_data(count=data.get('count', 0) + 1)
+        if handler_delay:
+            await asyncio.sleep(handler_delay)
+
+        handled[message.message_id] = time.perf_counter()
+        if len(handled) == updates:
+            finished.set()
+
+    dp = Dispatcher(storage=SQLiteStorage())
+    dp.include_router(router)
+    # Обработчик не обращается к Bot API, токен нужен только для создания объекта бота
+    bot = Bot(token='123456:' + 'A' * 35)
+
+    runner = web.AppRunner(create_webhook_app(dp, bot, path='/webhook'))
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+
+    try:
+        await run(f"http://127.0.0.1:{port}/webhook", updates, concurrency, text, users, WEBHOOK_SECRET, sent)
+        await asyncio.wait_for(finished.wait(), timeout=max(60, updates * (handler_delay + 0.01)))
+    except asyncio.TimeoutError:
+        print(f"Обработано только {len(handled)} из {updates} обновлений")
+    finally:
+        await runner.cleanup()
+        await bot.session.close()
+
+    if not handled:
+        return
+
+    elapsed = max(handled.values()) - min(sent.values())
+    latencies = sorted(handled[update_id] - sent[update_id] for update_id in handled)
+    print(f"Обработано: {len(handled) / elapsed:.0f} обновлений/с")
+    print(
+        "Задержка обработчика, мс: "
+        f"p50={percentile(latencies, 0.5) * 1000:.1f} "
+        f"p95={percentile(latencies, 0.95) * 1000:.1f} "
+        f"p99={percentile(latencies, 0.99) * 1000:.1f}"
+    )
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест сервера вебхука")
+    parser.add_argument('--url', default=f"http://127.0.0.1:{WEBHOOK_PORT}{WEBHOOK_PATH}", help="Адрес вебхука")
+    parser.add_argument('--updates', type=int, default=1000, help="Количество обновлений")
+    parser.add_argument('--concurrency', type=int, default=20, help="Количество одновременных запросов")
+    parser.add_argument('--text', default="load test", help="Текст сообщений")
+    parser.add_argument('--users', type=int, default=100, help="Количество разных отправителей")
+    parser.add_argument('--secret', default=WEBHOOK_SECRET, help="Секрет вебхука")
+    parser.add_argument('--local', action='store_true', help="Запустить сервер вебхука в этом процессе с тестовым обработчиком")
+    parser.add_argument('--handler-delay', type=float, default=0.0, help="Время ожидания ввода-вывода в тестовом обработчике в секундах")
+    args = parser.parse_args()
+
+    if args.local:
+        asyncio.run(run_local(args.updates, args.concurrency, args.text, args.users, args.handler_delay))
+    else:
+        asyncio.run(run(args.url, args.updates, args.concurrency, args.text, args.users, args.secret))
+
+if __name__ == "__main__":
+    main()